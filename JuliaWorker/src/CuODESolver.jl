@@ -3,6 +3,7 @@ module CuODESolver
 using ..JuliaWorker
 using ..LinearConvolution
 using ..Activation
+using ..ResultFrame
 include("SocketLogger.jl")
 
 using CUDA           # Add CUDA.jl for GPU support
@@ -35,26 +36,22 @@ function f!(du, u, p, t)
     return nothing
 end
 
-function process_and_generate_image(z, n, m, wsocket)
+function process_and_generate_image(z, n, m, wsocket, task_id="")
     # Ensure input is on CPU (z should already be Array after Array(sol[end]))
     out_l = reshape(z, n, m)
 
-    # Use broadcast for GPU/CPU compatibility
-    out_l .= Activation.safe_activation.(out_l)
-    
-    # Calculate extrema on GPU if input was CuArray
-    min_val, max_val = extrema(out_l)
-    out_l .= (out_l .- min_val) ./ (max_val - min_val)
-    out_l .= clamp.(out_l, 0.0, 1.0) .* 255
+    # Threshold like ODESolver so both backends produce the same image
+    out_l .= ifelse.(isnan.(out_l) .| isinf.(out_l), 0.0, ifelse.(out_l .> 0, 255.0, 0.0))
     
     try
-        binary_image = Gray.(out_l ./ 255)
+        # The state is width x height like the input matrix; transpose back to image space
+        binary_image = permutedims(Gray.(out_l ./ 255))
         io = IOBuffer()
         FileIO.save(Stream(format"PNG", io), binary_image)
         binary_data = take!(io)
-        img_base64 = base64encode(binary_data)
-        WebSockets.write(wsocket, "data:image/png;base64,$img_base64")
-        cleanup_memory!(binary_image, binary_data, img_base64, io)
+        image_packet = result_frame(task_id, binary_data)
+        WebSockets.write(wsocket, image_packet)
+        cleanup_memory!(binary_image, binary_data, image_packet, io)
     catch e
         WebSockets.write(wsocket, "Image processing error: $e")
     end
@@ -74,7 +71,7 @@ function cleanup_memory!(vars...)
     GC.gc(true)
 end
 
-function solve_ode(socket_conn, image::Matrix{Float64}, Ib::Float64, tempA::Matrix{Float64}, tempB::Matrix{Float64}, t_span::Vector{Float64}, initial_condition::Float64, wsocket)
+function solve_ode(socket_conn, image::Matrix{Float64}, Ib::Float64, tempA::Matrix{Float64}, tempB::Matrix{Float64}, t_span::Vector{Float64}, initial_condition::Float64, wsocket; task_id::AbstractString="")
     SocketLogger.write_log_to_socket(socket_conn, "Starting ODE solver...\n")
     WebSockets.write(wsocket, "Started ODE solver...")
     
@@ -106,7 +103,7 @@ function solve_ode(socket_conn, image::Matrix{Float64}, Ib::Float64, tempA::Matr
     WebSockets.write(wsocket, "ODE solved")
 
     # Transfer result back to CPU for image processing
-    process_and_generate_image(Array(sol[end]), n, m, wsocket)
+    process_and_generate_image(Array(sol[end]), n, m, wsocket, task_id)
     
     # Explicit memory cleanup
     CUDA.reclaim()
@@ -3,6 +3,7 @@ module ODESolver
 using ..JuliaWorker
 using ..LinearConvolution
 using ..Activation
+using ..ResultFrame
 include("SocketLogger.jl")
 
 using LoopVectorization
@@ -66,7 +67,7 @@ function cleanup_memory!(vars...)
     GC.gc(true)
 end
 
-function process_and_generate_image(z, n, m, wsocket)
+function process_and_generate_image(z, n, m, wsocket, task_id="")
     out_l = reshape(z, n, m)
 
     # Threshold values and check for NaN/Inf
@@ -79,17 +80,13 @@ function process_and_generate_image(z, n, m, wsocket)
         # Convert to image
         binary_image = Gray.(clamped_out ./ 255)
 
-        # First step: Fix horizontal mirroring by flipping the original image
-        # This reverses the order of columns (horizontal flip)
-        unmirrored_image = reverse(binary_image, dims=2)
-
-        # Now rotate the unmirrored image
-        # We'll use rotl90 instead of imrotate to avoid interpolation issues
-        rotated_image = rotl90(unmirrored_image)
+        # The state is width x height (see RedisQueueWatcher.decode_task) and was convolved
+        # with the templates transposed the same way, so transposing it gives image space
+        rotated_image = permutedims(binary_image)
 
         # Verify rotated image validity
         if any(isnan, rotated_image) || any(isinf, rotated_image)
-            WebSockets.write(wsocket, "Invalid pixel values after rotation")
+            WebSockets.write(wsocket, "Image processing error: invalid pixel values after rotation")
             return
         end
 
@@ -97,19 +94,18 @@ function process_and_generate_image(z, n, m, wsocket)
         io_rotated = IOBuffer()
         FileIO.save(Stream(format"PNG", io_rotated), rotated_image)
         binary_data = take!(io_rotated)
-        img_base64 = base64encode(binary_data)
-        image_packet = "data:image/png;base64,$img_base64"
+        image_packet = result_frame(task_id, binary_data)
 
-        # Send the image
+        # Send the PNG bytes as one binary frame, no base64 round trip
         WebSockets.write(wsocket, image_packet)
-        cleanup_memory!(binary_image, rotated_image, binary_data, img_base64, image_packet, io_rotated)
+        cleanup_memory!(binary_image, rotated_image, binary_data, image_packet, io_rotated)
     catch e
         WebSockets.write(wsocket, "Image processing error: $e")
         cleanup_memory!(z, out_l)
     end
 end
 
-function solve_ode(socket_conn, image::Matrix{Float64}, Ib::Float64, tempA::Matrix{Float64}, tempB::Matrix{Float64}, t_span::Vector{Float64}, initial_condition::Float64, wsocket)
+function solve_ode(socket_conn, image::Matrix{Float64}, Ib::Float64, tempA::Matrix{Float64}, tempB::Matrix{Float64}, t_span::Vector{Float64}, initial_condition::Float64, wsocket; task_id::AbstractString="")
     SocketLogger.write_log_to_socket(socket_conn, "Starting ODE solver...\n")
     WebSockets.write(wsocket, "Started ODE solver...")
     # Kezdeti allapotok elokeszitese
@@ -144,7 +140,7 @@ function solve_ode(socket_conn, image::Matrix{Float64}, Ib::Float64, tempA::Matr
     WebSockets.write(wsocket, "ODE solved")
 
     # Process results
-    process_and_generate_image(sol[end], n, m, wsocket)
+    process_and_generate_image(sol[end], n, m, wsocket, task_id)
 
     # Cleanup memory
     cleanup_memory!(prob, sol, Bu, z0, image_normalized, params)
@@ -71,6 +71,111 @@ function cleanup(redis_client, socket_conn)
     end
 end
 
+# Binary task layout written by utils/task_codec.py (little endian):
+# magic(4) version(1) dtype(1) reserved(2) height(4) width(4) meta_len(4), meta JSON, pixels
+const TASK_MAGIC = b"CNNT"
+const TASK_HEADER_SIZE = 20
+
+read_u32(bytes, offset) = Int(ltoh(reinterpret(UInt32, bytes[offset:offset+3])[1]))
+
+function decode_task(stored_data)
+    bytes = Vector{UInt8}(codeunits(stored_data))
+    if length(bytes) < TASK_HEADER_SIZE || bytes[1:4] != TASK_MAGIC
+        # Legacy JSON task with the image as nested row lists
+        processed_data = JSON.parse(stored_data)
+        image = [Float64.(row) for row in processed_data["image"]]
+        return hcat(image...), processed_data
+    end
+
+    version = bytes[5]
+    version == 0x01 || error("Unsupported task format version: $version")
+    bytes[6] == 0x01 || error("Unsupported task dtype code: $(bytes[6])")
+
+    height = read_u32(bytes, 9)
+    width = read_u32(bytes, 13)
+    meta_len = read_u32(bytes, 17)
+    meta_end = TASK_HEADER_SIZE + meta_len
+    processed_data = JSON.parse(String(bytes[TASK_HEADER_SIZE+1:meta_end]))
+
+    # Row-major pixels reshaped column-major give the same width x height layout as hcat(rows...)
+    pixels = view(bytes, meta_end+1:meta_end+height*width)
+    return Float64.(reshape(pixels, width, height)), processed_data
+end
+
+# Ends a task that will not produce a result. The server recognises the prefix,
+# releases the task's single-flight claim and passes the error to its clients
+const TASK_ERROR_PREFIX = "Image processing error"
+
+function report_task_error(socket_conn, task_id, message)
+    SocketLogger.write_log_to_socket(socket_conn, "$message\n")
+    try
+        SocketLogger.send_progress(socket_conn, String(task_id), "$TASK_ERROR_PREFIX: $message")
+    catch e
+        @warn "Task error report failed: $e"
+    end
+end
+
+# "socket" sends progress and results over the framed control connection,
+# "websocket" opens a WebSocket to the server for every task as before
+result_transport() = get(ENV, "WORKER_RESULT_TRANSPORT", "socket")
+
+function run_solver(socket_conn, image_matrix, Ib, feedbackA_matrix, controlB_matrix, t_span, initialCondition, sink, task_id)
+    SocketLogger.write_log_to_socket(socket_conn, "Processing task...\n")
+    if CUDA.functional() && CUDA.has_cuda_gpu()
+        SocketLogger.write_log_to_socket(socket_conn, "CUDA is functional AND has gpu connected! \n")
+        # num_gpus = CUDA.devices()
+        CuODESolver.solve_ode(socket_conn,image_matrix, Ib, feedbackA_matrix, controlB_matrix, t_span, initialCondition, sink; task_id=task_id)
+    else
+        if !CUDA.functional()    
+            SocketLogger.write_log_to_socket(socket_conn, "CUDA is NOT functional! \n")
+        end
+        if !CUDA.has_cuda_gpu()
+            SocketLogger.write_log_to_socket(socket_conn, "There is no CUDA-capable GPU available! \n")
+        end
+        ODESolver.solve_ode(socket_conn, image_matrix, Ib, feedbackA_matrix, controlB_matrix, t_span, initialCondition, sink; task_id=task_id)
+    end
+end
+
+# Identity and load reported to the server's worker registry
+const WORKER_ID = Ref("")
+const in_flight = Set{String}()
+const avg_solve_ms = Ref(0.0)
+
+worker_queue() = "queue:worker:$(WORKER_ID[])"
+
+function record_solve_time(elapsed_ms)
+    # Exponential moving average, seeded with the first solve
+    avg_solve_ms[] = avg_solve_ms[] == 0.0 ? elapsed_ms : 0.8 * avg_solve_ms[] + 0.2 * elapsed_ms
+end
+
+function report_capacity(socket_conn)
+    try
+        SocketLogger.send_capacity(socket_conn, JSON.json(Dict(
+            "worker_id" => WORKER_ID[],
+            "slots" => 1,
+            "in_flight" => collect(in_flight),
+            "avg_solve_ms" => avg_solve_ms[]
+        )))
+    catch e
+        @warn "Capacity report failed: $e"
+    end
+end
+
+function send_heartbeats(socket_conn, interval=5.0, capacity_every=6)
+    beats = 0
+    while !JuliaWorker.global_interrupt_flag[]
+        try
+            SocketLogger.send_heartbeat(socket_conn)
+        catch e
+            @warn "Heartbeat failed: $e"
+        end
+        # A full report now and then re-registers the worker if the server evicted it
+        beats += 1
+        beats % capacity_every == 0 && report_capacity(socket_conn)
+        sleep(interval)
+    end
+end
+
 function manage_workers(queue_name, socket_conn)
     while true
         num_tasks = Redis.llen(queue_name)
@@ -100,7 +205,11 @@ function watch_redis_queue(redis_client, queue_name, socket_conn)
         end
     end
     
+    WORKER_ID[] = get(ENV, "WORKER_ID", "$(gethostname())-$(getpid())")
+    report_capacity(socket_conn)
+
     @async manage_workers(queue_name, socket_conn)
+    @async send_heartbeats(socket_conn)
 
     try
         while !JuliaWorker.global_interrupt_flag[]
@@ -111,85 +220,85 @@ function watch_redis_queue(redis_client, queue_name, socket_conn)
                     redis_client = create_redis_connection(socket_conn)
                 end
                 # Wait for a task from the queue (with a short timeout)
-                result = Redis.blpop(redis_client, queue_name, 1)  # 1 second timeout
+                # Tasks the server placed on this worker's own queue come first
+                result = Redis.blpop(redis_client, [worker_queue(), queue_name], 1)  # 1 second timeout
                 
                 if result !== nothing
                     _, task_id = result  # Assuming result contains a tuple where the second element is a UUID
                     
                     SocketLogger.write_log_to_socket(socket_conn, "Received task ID for Redis: $task_id\n")
                     
-                    # Retrieve the stored data using the key format "task:data:$task_id"
-                    stored_data = Redis.get(redis_client, "task:data:$task_id")
+                    task_key = String(task_id)
+                    push!(in_flight, task_key)
+                    report_capacity(socket_conn)
+                    started = time()
+                    try
+                        # Retrieve the stored data using the key format "task:data:$task_id"
+                        stored_data = Redis.get(redis_client, "task:data:$task_id")
                     
-                    if stored_data !== nothing
-                        SocketLogger.write_log_to_socket(socket_conn, "Retrieved stored data! \n")
-                        try
-                            processed_data = JSON.parse(stored_data)
-                    
-                            # Convert the image and controlB arrays to Float64
-                            image = [Float64.(row) for row in processed_data["image"]]
-                            controlB = [Float64.(row) for row in processed_data["controlB"]]
-                            feedbackA = [Float64.(row) for row in processed_data["feedbackA"]]
-                            t_span = convert(Vector{Float64}, processed_data["t_span"])
-                            Ib = Float64(processed_data["Ib"])
-                            initialCondition = Float64(processed_data["initialCondition"])
+                        if stored_data !== nothing
+                            SocketLogger.write_log_to_socket(socket_conn, "Retrieved stored data! \n")
+                            try
+                                image_matrix, processed_data = decode_task(stored_data)
                     
-                            # Ensure the arrays are matrices
-                            image_matrix = hcat(image...)  # Convert to a matrix
-                            controlB_matrix = hcat(controlB...)  # Convert to a matrix
-                            feedbackA_matrix = hcat(feedbackA...)
+                                # Convert the controlB arrays to Float64
+                                controlB = [Float64.(row) for row in processed_data["controlB"]]
+                                feedbackA = [Float64.(row) for row in processed_data["feedbackA"]]
+                                t_span = convert(Vector{Float64}, processed_data["t_span"])
+                                Ib = Float64(processed_data["Ib"])
+                                initialCondition = Float64(processed_data["initialCondition"])
                     
-                            # Open WebSocket connection using the port from processed_data
-                            websocket_url = processed_data["websocket"]
-                            SocketLogger.write_log_to_socket(socket_conn, "Attempting to connect to WebSocket: $websocket_url\n")
+                                # Rows become columns: the templates are transposed like the
+                                # width x height image, so the convolution matches image space
+                                controlB_matrix = hcat(controlB...)  # Convert to a matrix
+                                feedbackA_matrix = hcat(feedbackA...)
                     
-                            # Open the WebSocket connection with error handling
-                            try
-                                WebSockets.open(websocket_url) do ws
-                                    SocketLogger.write_log_to_socket(socket_conn, "Connected to client socket! \n")
+                                if result_transport() == "socket"
+                                    # Progress and the result share the long-lived control connection
                                     try
-                                        WebSockets.write(ws, "Connection happened!")
+                                        sink = SocketLogger.TaskSink(socket_conn, String(task_id))
+                                        run_solver(socket_conn, image_matrix, Ib, feedbackA_matrix, controlB_matrix, t_span, initialCondition, sink, String(task_id))
                                     catch e
-                                        SocketLogger.write_log_to_socket(socket_conn, "Error writing to WebSocket: $e\n")
-                                        return  # Exit the WebSockets.open block
+                                        report_task_error(socket_conn, task_id, "Error processing task: $e")
                                     end
+                                    continue
+                                end
 
-                                    try
-                                        SocketLogger.write_log_to_socket(socket_conn, "Processing task...\n")
-                                        if CUDA.functional() && CUDA.has_cuda_gpu()
-                                            SocketLogger.write_log_to_socket(socket_conn, "CUDA is functional AND has gpu connected! \n")
-                                            # num_gpus = CUDA.devices()
-                                            CuODESolver.solve_ode(socket_conn,image_matrix, Ib, feedbackA_matrix, controlB_matrix, t_span, initialCondition, ws)
-                                            
-                                        else
-                                            if !CUDA.functional()    
-                                                SocketLogger.write_log_to_socket(socket_conn, "CUDA is NOT functional! \n")
-                                            end
-                                            if !CUDA.has_cuda_gpu()
-                                                SocketLogger.write_log_to_socket(socket_conn, "There is no CUDA-capable GPU available! \n")
-                                            end
-                                            ODESolver.solve_ode(socket_conn, image_matrix, Ib, feedbackA_matrix, controlB_matrix, t_span, initialCondition, ws)
+                                # Open WebSocket connection using the port from processed_data
+                                websocket_url = processed_data["websocket"]
+                                SocketLogger.write_log_to_socket(socket_conn, "Attempting to connect to WebSocket: $websocket_url\n")
+                    
+                                # Open the WebSocket connection with error handling
+                                try
+                                    WebSockets.open(websocket_url) do ws
+                                        SocketLogger.write_log_to_socket(socket_conn, "Connected to client socket! \n")
+                                        try
+                                            WebSockets.write(ws, "Connection happened!")
+                                        catch e
+                                            report_task_error(socket_conn, task_id, "Error writing to WebSocket: $e")
+                                            return  # Exit the WebSockets.open block
                                         end
 
-                                        # Log processed task
-                                        # processed = JSON.json(ode_result)
-                                        # try
-                                        #     WebSockets.write(ws, processed)
-                                        #     # SocketLogger.write_log_to_socket(socket_conn, "Processed task: $processed\n")
-                                        # catch e
-                                        #     SocketLogger.write_log_to_socket(socket_conn, "Error sending processed task to client: $e\n")
-                                        # end
-                                    catch e
-                                        SocketLogger.write_log_to_socket(socket_conn, "Error processing task: $e\n")
+                                        try
+                                            run_solver(socket_conn, image_matrix, Ib, feedbackA_matrix, controlB_matrix, t_span, initialCondition, ws, String(task_id))
+                                        catch e
+                                            report_task_error(socket_conn, task_id, "Error processing task: $e")
+                                        end
                                     end
+                                catch e
+                                    report_task_error(socket_conn, task_id, "Error connecting to client socket: $e")
+                                    # Optionally, retry the WebSocket connection here
                                 end
                             catch e
-                                SocketLogger.write_log_to_socket(socket_conn, "Error connecting to client socket: $e\n")
-                                # Optionally, retry the WebSocket connection here
+                                report_task_error(socket_conn, task_id, "Error parsing stored data: $e")
                             end
-                        catch e
-                            SocketLogger.write_log_to_socket(socket_conn, "Error parsing stored data: $e\n")
+                        else
+                            report_task_error(socket_conn, task_id, "Stored data of the task is missing")
                         end
+                    finally
+                        delete!(in_flight, task_key)
+                        record_solve_time((time() - started) * 1000)
+                        report_capacity(socket_conn)
                     end
                 end
                 
@@ -0,0 +1,25 @@
+module ResultFrame
+
+export result_frame
+
+# Binary WebSocket result frame, mirrored by utils/result_frame.py:
+#   magic "CNNR" | version u8 | frame type u8 | encoding u8 | level u8 | task_id length u16
+#   | task_id (utf-8) | encoded result bytes
+# Integers are little endian. Workers always solve at full resolution (level 0);
+# only the server's progressive previews use other levels. The Python relay
+# forwards the frame as is.
+const MAGIC = Vector{UInt8}("CNNR")
+const VERSION = 0x01
+const FRAME_IMAGE = 0x01
+const ENCODING_PNG = 0x01
+const LEVEL_FULL = 0x00
+
+function result_frame(task_id::AbstractString, payload::Vector{UInt8})
+    task_bytes = Vector{UInt8}(task_id)
+    io = IOBuffer(sizehint=length(MAGIC) + 6 + length(task_bytes) + length(payload))
+    write(io, MAGIC, VERSION, FRAME_IMAGE, ENCODING_PNG, LEVEL_FULL, htol(UInt16(length(task_bytes))))
+    write(io, task_bytes, payload)
+    return take!(io)
+end
+
+end
@@ -1,13 +1,45 @@
 module SocketLogger
 using Sockets
+using WebSockets
 
-export connect_to_python_socket, write_log_to_socket, connect_to_python_socket_easy
+export connect_to_python_socket, write_log_to_socket, connect_to_python_socket_easy,
+       send_progress, send_result, send_heartbeat, send_capacity, TaskSink
+
+# Framed control protocol, mirrored by utils/control_protocol.py:
+# the connection opens with "CNNC" + version, then every message is
+#   payload length u32 | message type u8 | payload   (little endian)
+const PREAMBLE = vcat(Vector{UInt8}("CNNC"), UInt8[0x01])
+const MSG_LOG = 0x01
+const MSG_PROGRESS = 0x02
+const MSG_RESULT = 0x03
+const MSG_HEARTBEAT = 0x04
+const MSG_CAPACITY = 0x05
+
+# Solver tasks and the queue watcher share one connection; each message is
+# assembled first and handed to the socket in a single write so it is never interleaved
+const write_lock = ReentrantLock()
+
+function write_message(s::IO, message_type::UInt8, payload::Vector{UInt8})
+    io = IOBuffer(sizehint=5 + length(payload))
+    write(io, htol(UInt32(length(payload))), message_type, payload)
+    message = take!(io)
+    lock(write_lock) do
+        write(s, message)
+        flush(s)
+    end
+end
+
+function send_hello(s::IO)
+    write(s, PREAMBLE)
+    flush(s)
+    return s
+end
 
 function connect_to_python_socket(host::String, port::Int,  max_attempts::Int=5, retry_delay::Float64=4.0)
     for attempt in 1:max_attempts
         try
             sock = Sockets.connect(host, port)
-            return sock
+            return send_hello(sock)
         catch e
             if isa(e, Base.IOError) && attempt < max_attempts
                 @warn "Connection attempt $attempt failed. Retrying in $retry_delay seconds..."
@@ -23,7 +55,7 @@ function connect_to_python_socket_easy(host::String, port::Int)
     try
         sock = connect(host, port)
         println("Type of sock: ", typeof(sock))
-        return sock
+        return send_hello(sock)
         # println("Connected successfully!")
         # write(sock, "Hello from Julia!")
         # close(sock)
@@ -33,8 +65,33 @@ function connect_to_python_socket_easy(host::String, port::Int)
 end
 
 function write_log_to_socket(s::IO, log_message::String)
-    write(s, log_message)
-    flush(s)
+    write_message(s, MSG_LOG, Vector{UInt8}(log_message))
 end
 
+function send_progress(s::IO, task_id::AbstractString, text::AbstractString)
+    task_bytes = Vector{UInt8}(task_id)
+    io = IOBuffer()
+    write(io, htol(UInt16(length(task_bytes))), task_bytes, text)
+    write_message(s, MSG_PROGRESS, take!(io))
+end
+
+# frame is a binary result frame built by ResultFrame.result_frame
+send_result(s::IO, frame::Vector{UInt8}) = write_message(s, MSG_RESULT, frame)
+
+send_heartbeat(s::IO) = write_message(s, MSG_HEARTBEAT, UInt8[])
+
+function send_capacity(s::IO, capacity_json::AbstractString)
+    write_message(s, MSG_CAPACITY, Vector{UInt8}(capacity_json))
+end
+
+# Stands in for a task's WebSocket: the solvers keep calling WebSockets.write,
+# and text goes out as progress, bytes as the result, over the control connection
+struct TaskSink
+    conn::IO
+    task_id::String
+end
+
+WebSockets.write(sink::TaskSink, text::AbstractString) = send_progress(sink.conn, sink.task_id, text)
+WebSockets.write(sink::TaskSink, frame::Vector{UInt8}) = send_result(sink.conn, frame)
+
 end
\ No newline at end of file
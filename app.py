@@ -1,7 +1,11 @@
+import os
 import signal
+import time
 import asyncio
+import multiprocessing
 from server.async_server import AsyncServer
-from config.config import load_config
+from config.config import load_config, load_web_workers_config, load_log_config
+from utils.async_logger import truncate_log
 from contextlib import suppress
 
 async def shutdown_servers(servers, loop, sig=None):
@@ -43,7 +47,7 @@ async def shutdown_servers(servers, loop, sig=None):
     except Exception as e:
         print(f"Error stopping loop: {e}")
 
-async def main():
+async def main(worker_index=0, reuse_port=False):
     # Load configuration
     host, port1, port2, port3, julia_port1, julia_port2, julia_port3, redis_port, redis_host = load_config()
     
@@ -51,7 +55,8 @@ async def main():
     servers = [
         # AsyncServer(host, port1, julia_port1, redis_host, redis_port),
         # AsyncServer(host, port2, julia_port2, redis_host, redis_port),
-        AsyncServer(host, port3, julia_port3, redis_host, redis_port)
+        AsyncServer(host, port3, julia_port3, redis_host, redis_port,
+                    reuse_port=reuse_port, control_owner=worker_index == 0, clear_log=not reuse_port)
     ]
     
     # Get event loop
@@ -81,13 +86,13 @@ async def main():
         # Shutdown servers
         await shutdown_servers(servers, loop)
 
-def run():
+def run(worker_index=0, reuse_port=False):
     """Wrapper function to handle the asyncio.run() context"""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     
     try:
-        loop.run_until_complete(main())
+        loop.run_until_complete(main(worker_index, reuse_port))
     except KeyboardInterrupt:
         print("\nReceived keyboard interrupt")
     except Exception as e:
@@ -106,5 +111,70 @@ def run():
             loop.close()
             print("Shutdown complete")
 
+def run_workers(count, shutdown_timeout):
+    """
+    Fork `count` front-end processes that share the HTTP port via SO_REUSEPORT.
+
+    Worker 0 also owns the Julia control port. The log file is cleared here,
+    once, so no worker truncates lines another has already written.
+    SIGINT/SIGTERM/SIGHUP on the launcher are forwarded to every worker as
+    SIGTERM; if one worker dies on its own the rest are shut down too, so the
+    group always stops together.
+    """
+    # Reset the shared log once, before any worker has written to it
+    try:
+        truncate_log(load_log_config()[0])
+    except OSError as e:
+        print(f"Could not clear the log file: {e}")
+
+    ctx = multiprocessing.get_context('fork')
+    processes = [
+        ctx.Process(target=run, args=(index, True), name=f'cnn-web-{index}')
+        for index in range(count)
+    ]
+    for process in processes:
+        process.start()
+    print(f"Started {count} front-end workers: {[p.pid for p in processes]}")
+
+    stopping = False
+
+    def stop_workers():
+        for process in processes:
+            if process.is_alive():
+                with suppress(ProcessLookupError):
+                    os.kill(process.pid, signal.SIGTERM)
+
+    def signal_handler(sig, frame):
+        nonlocal stopping
+        print(f'Launcher received exit signal {signal.Signals(sig).name}...')
+        stopping = True
+        stop_workers()
+
+    for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal_handler)
+
+    while any(process.is_alive() for process in processes):
+        for process in processes:
+            process.join(timeout=0.5)
+            if not stopping and not process.is_alive():
+                print(f"Worker {process.name} exited with code {process.exitcode}, stopping the others...")
+                stopping = True
+                stop_workers()
+        if stopping:
+            break
+
+    deadline = time.monotonic() + shutdown_timeout
+    for process in processes:
+        process.join(timeout=max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            print(f"Worker {process.name} did not stop in time, killing it")
+            process.kill()
+            process.join()
+    print("All front-end workers stopped")
+
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    workers, shutdown_timeout = load_web_workers_config()
+    if workers > 1:
+        run_workers(workers, shutdown_timeout)
+    else:
+        run()
\ No newline at end of file
@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 import os
 import socket
+import tempfile
 
 def load_worker_config():
     load_dotenv()
@@ -21,6 +22,125 @@ def load_config():
     redis_port = int(os.environ.get('REDIS_PORT', 6379))
     return host, port1,port2, port3, julia_port1,julia_port2,julia_port3, redis_port, redis_host
 
+def load_redis_pool_config():
+    max_connections = int(os.environ.get('REDIS_MAX_CONNECTIONS', 32))
+    pool_timeout = float(os.environ.get('REDIS_POOL_TIMEOUT', 5.0))
+    health_check_interval = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
+    return max_connections, pool_timeout, health_check_interval
+
+def load_task_format():
+    # 'binary' stores tasks as header + raw pixels, 'json' keeps the legacy nested lists
+    task_format = os.environ.get('TASK_FORMAT', 'binary').lower()
+    if task_format not in ('binary', 'json'):
+        raise ValueError(f"Unsupported TASK_FORMAT: {task_format}")
+    return task_format
+
+def load_local_solver_config():
+    # 'fallback' solves in-process only without Redis, 'small' also takes small images, 'off' disables it
+    mode = os.environ.get('LOCAL_SOLVER', 'fallback').lower()
+    if mode not in ('fallback', 'small', 'off'):
+        raise ValueError(f"Unsupported LOCAL_SOLVER: {mode}")
+    max_pixels = int(os.environ.get('LOCAL_SOLVER_MAX_PIXELS', 256 * 256))
+    workers = int(os.environ.get('LOCAL_SOLVER_WORKERS', 2))
+    return mode, max_pixels, workers
+
+def load_result_cache_config():
+    max_entries = int(os.environ.get('RESULT_CACHE_SIZE', 256))
+    ttl = int(os.environ.get('RESULT_CACHE_TTL', 3600))
+    return max_entries, ttl
+
+def load_batch_config():
+    return int(os.environ.get('BATCH_MAX_IMAGES', 64))
+
+def load_upload_config():
+    return int(os.environ.get('UPLOAD_MAX_BYTES', 64 * 1024 * 1024))
+
+def load_ingest_config():
+    # Threads for decode/hash/encode work and how many jobs may wait for them
+    workers = int(os.environ.get('INGEST_WORKERS', min(4, os.cpu_count() or 1)))
+    max_pending = int(os.environ.get('INGEST_MAX_PENDING', 64))
+    return workers, max_pending
+
+def load_web_workers_config():
+    # Number of front-end processes sharing the HTTP port through SO_REUSEPORT
+    workers = int(os.environ.get('WEB_WORKERS', 1))
+    shutdown_timeout = float(os.environ.get('WEB_WORKERS_SHUTDOWN_TIMEOUT', 10.0))
+    return workers, shutdown_timeout
+
+def load_log_config():
+    path = os.environ.get('LOG_FILE', 'server_logs.txt')
+    level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    queue_size = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    max_bytes = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    backup_count = int(os.environ.get('LOG_BACKUP_COUNT', 3))
+    return path, level, queue_size, max_bytes, backup_count
+
+def load_frame_stream_config():
+    # Frames kept per video stream (approximate, trimmed on append) and the idle expiry of the stream
+    maxlen = int(os.environ.get('STREAM_FRAME_MAXLEN', 64))
+    ttl = int(os.environ.get('STREAM_FRAME_TTL', 60))
+    return maxlen, ttl
+
+def load_worker_registry_config():
+    # Seconds without a heartbeat before a worker is evicted, and how often front-ends reload the registry
+    heartbeat_timeout = float(os.environ.get('WORKER_HEARTBEAT_TIMEOUT', 15))
+    refresh_interval = float(os.environ.get('WORKER_REGISTRY_REFRESH', 1.0))
+    return heartbeat_timeout, refresh_interval
+
+def load_scheduler_config():
+    # Weighted share of worker starts per priority class, pixels per scheduling cost unit,
+    # tasks a worker queue may hold beyond its free slots, and seconds between dispatch rounds
+    weights = {
+        'interactive': int(os.environ.get('SCHED_INTERACTIVE_WEIGHT', 4)),
+        'bulk': int(os.environ.get('SCHED_BULK_WEIGHT', 1)),
+    }
+    cost_unit = int(os.environ.get('SCHED_COST_UNIT', 65536))
+    prefetch = int(os.environ.get('SCHED_PREFETCH', 1))
+    poll_interval = float(os.environ.get('SCHED_POLL_INTERVAL', 0.05))
+    return weights, cost_unit, prefetch, poll_interval
+
+def load_admission_config():
+    # Dispatch backlog at which new tasks are refused, per-client requests per second and burst,
+    # and the longest Retry-After handed out
+    max_backlog = int(os.environ.get('ADMISSION_MAX_BACKLOG', 500))
+    client_rate = float(os.environ.get('ADMISSION_CLIENT_RATE', 5))
+    client_burst = int(os.environ.get('ADMISSION_CLIENT_BURST', 20))
+    max_retry_after = int(os.environ.get('ADMISSION_MAX_RETRY_AFTER', 60))
+    return max_backlog, client_rate, client_burst, max_retry_after
+
+def load_tiling_config():
+    # Tile edge length, feedback interactions per unit time the halo covers, where tile
+    # memory maps are kept, the largest image accepted on /tasks/tiled, the largest encoded
+    # (image/*) one, which is decoded in memory, and seconds a job may take to solve
+    tile_size = int(os.environ.get('TILE_SIZE', 1024))
+    halo_per_time = float(os.environ.get('TILE_HALO_PER_TIME', 2.0))
+    tile_dir = os.environ.get('TILE_DIR', os.path.join(tempfile.gettempdir(), 'cnn_tiles'))
+    max_pixels = int(os.environ.get('TILE_MAX_PIXELS', 4 * 1024 ** 3))
+    decode_max_pixels = int(os.environ.get('TILE_DECODE_MAX_PIXELS', 64 * 1024 ** 2))
+    timeout = float(os.environ.get('TILE_JOB_TIMEOUT', 3600))
+    return tile_size, halo_per_time, tile_dir, max_pixels, decode_max_pixels, timeout
+
+def load_progressive_config():
+    # Largest preview solved in-process for progressive tasks, in pixels, and how many previews
+    # may wait for or run on the local solver before further ones are skipped
+    max_pixels = int(os.environ.get('PREVIEW_MAX_PIXELS', 256 * 256))
+    max_pending = int(os.environ.get('PREVIEW_MAX_PENDING', 4))
+    return max_pixels, max_pending
+
+def load_single_flight_config():
+    # Seconds an identical submission attaches to the in-flight task computing it; 0 disables
+    return int(os.environ.get('SINGLE_FLIGHT_TTL', 600))
+
+def load_progress_config():
+    # Solver progress messages relayed per task and second; 0 relays every message
+    return float(os.environ.get('PROGRESS_MAX_RATE', 4))
+
+def load_frame_dedup_config():
+    # Mean absolute difference (0-255) below which a stream frame counts as a duplicate; 0 disables
+    threshold = float(os.environ.get('STREAM_DEDUP_THRESHOLD', 0))
+    size = int(os.environ.get('STREAM_DEDUP_SIZE', 32))
+    return threshold, size
+
 def load_clients_config():
     # Get port range from environment variables
     PORT_START = int(os.getenv("CLIENT_WS_PORT_START", 40001))
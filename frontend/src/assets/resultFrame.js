@@ -0,0 +1,27 @@
+// resultFrame.js - Parser for the binary result frames sent over the task WebSocket
+// Layout (little endian, see utils/result_frame.py):
+//   "CNNR" | version u8 | frame type u8 | encoding u8 | level u8 | task id length u16 | task id | payload
+// level is 0 for the full resolution result and n for a preview at 1/2^n of the input size.
+const HEADER_SIZE = 10;
+const FRAME_TYPES = { 1: 'image' };
+const MIME_TYPES = { 1: 'image/png' };
+
+export function parseResultFrame(buffer) {
+  const view = new DataView(buffer);
+  if (buffer.byteLength < HEADER_SIZE) {
+    throw new Error('Result frame is shorter than its header');
+  }
+  const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+  if (magic !== 'CNNR' || view.getUint8(4) !== 1) {
+    throw new Error('Not a result frame');
+  }
+  const taskIdLength = view.getUint16(8, true);
+  const payloadOffset = HEADER_SIZE + taskIdLength;
+  return {
+    taskId: new TextDecoder().decode(new Uint8Array(buffer, HEADER_SIZE, taskIdLength)),
+    type: FRAME_TYPES[view.getUint8(5)] || 'unknown',
+    mimeType: MIME_TYPES[view.getUint8(6)] || 'application/octet-stream',
+    level: view.getUint8(7),
+    payload: new Uint8Array(buffer, payloadOffset),
+  };
+}
@@ -4,6 +4,7 @@ import UploadButton from '../components/UploadButton';
 import MatrixVisualizer from '../components/MatrixVisualizer';
 import ImageViewer from '../components/ImageViewer';
 import { modeOptions } from "../assets/settings";
+import { parseResultFrame } from "../assets/resultFrame";
 import './PhotoCNN.module.css';
 
 function isLocalhost() {
@@ -47,12 +48,58 @@ function PhotoCNN() {
     setSelectedMode(e.target.value);
   };
 
+  const showOutputImage = (blob, mimeType) => {
+    const endTime = Date.now();
+    const processingTime = (endTime - startTime()) / 1000; // Convert to seconds
+    setElapsedTime(processingTime / 60); // Convert seconds to minutes
+
+    // Create a meaningful filename with the processing mode
+    const modeName = selectedMode().replace('_', '-');
+    const currentDate = new Date().toISOString().replace(/[:.]/g, '-').substring(0, 19);
+    const fileName = `processed-${modeName}-${currentDate}`;
+
+    const url = URL.createObjectURL(blob);
+
+    setOutputImage(url);
+    setLogMessages(prev => [...prev, `Successfully created and set image URL with filename: ${fileName}`]);
+    
+    // Show notification about successful image processing with the filename
+    setProcessingStage('Complete');
+    setImageNotification(`Image processing complete: ${fileName} (${processingTime.toFixed(2)} seconds)`);
+    setProcessingDetails(prev => ({
+      ...prev,
+      mimeType,
+      fileName,
+      processingTime: processingTime.toFixed(2),
+      mode: selectedMode()
+    }));
+    setShowProcessingNotification(true);
+  };
+
   const handleWebSocketMessage = async (event) => {
     try {
       console.log('Raw WebSocket message:', event.data);
   
       let message = event.data;
   
+      // Images arrive as binary result frames
+      if (message instanceof ArrayBuffer) {
+        const frame = parseResultFrame(message);
+        setLogMessages(prev => [...prev, `Binary ${frame.type} frame for task ${frame.taskId} (level ${frame.level})`]);
+        if (frame.level > 0) {
+          // Progressive preview: show it until the full resolution result replaces it
+          if (processingStage() !== 'Complete') {
+            setOutputImage(URL.createObjectURL(new Blob([frame.payload], { type: frame.mimeType })));
+            setProcessingStage('Preview');
+            setImageNotification(`Preview at 1/${2 ** frame.level} resolution, full result pending`);
+            setShowProcessingNotification(true);
+          }
+          return;
+        }
+        showOutputImage(new Blob([frame.payload], { type: frame.mimeType }), frame.mimeType);
+        return;
+      }
+  
       // Check if the message is a string starting with "WebSocket"
       if (typeof message === 'string' && message.startsWith('WebSocket')) {
         setLogMessages(prev => [...prev, `Info message: ${message}`]);
@@ -80,9 +127,6 @@ function PhotoCNN() {
       switch (type) {
         case 'image':
           if (typeof payload === 'string' && payload.startsWith('data:image/')) {
-            const endTime = Date.now();
-            const processingTime = (endTime - startTime()) / 1000; // Convert to seconds
-            setElapsedTime(processingTime / 60); // Convert seconds to minutes
             setLogMessages(prev => [...prev, 'Valid image data format detected']);
   
             try {
@@ -97,28 +141,7 @@ function PhotoCNN() {
                 byteArray[i] = byteCharacters.charCodeAt(i);
               }
   
-              // Create a meaningful filename with the processing mode
-              const modeName = selectedMode().replace('_', '-');
-              const currentDate = new Date().toISOString().replace(/[:.]/g, '-').substring(0, 19);
-              const fileName = `processed-${modeName}-${currentDate}`;
-  
-              const blob = new Blob([byteArray], { type: mimeType });
-              const url = URL.createObjectURL(blob);
-  
-              setOutputImage(url);
-              setLogMessages(prev => [...prev, `Successfully created and set image URL with filename: ${fileName}`]);
-              
-              // Show notification about successful image processing with the filename
-              setProcessingStage('Complete');
-              setImageNotification(`Image processing complete: ${fileName} (${processingTime.toFixed(2)} seconds)`);
-              setProcessingDetails(prev => ({
-                ...prev,
-                mimeType,
-                fileName,
-                processingTime: processingTime.toFixed(2),
-                mode: selectedMode()
-              }));
-              setShowProcessingNotification(true);
+              showOutputImage(new Blob([byteArray], { type: mimeType }), mimeType);
             } catch (blobError) {
               setLogMessages(prev => [...prev, `Error creating blob: ${blobError.message}`]);
               setImageNotification('Error processing image output');
@@ -265,6 +288,7 @@ function PhotoCNN() {
     const jsonData = {
       image: image(),
       mode: selectedMode(),
+      progressive: true,
     };
 
     try {
@@ -320,6 +344,7 @@ function PhotoCNN() {
         const wsUrl = jsonResponse.websocket_url;
 
         const socket = new WebSocket(wsUrl);
+        socket.binaryType = 'arraybuffer';
 
         socket.onopen = function(event) {
           console.log("WebSocket is open now.");
@@ -2,10 +2,52 @@ import json
 import uuid
 from aiohttp import web
 from utils.load_parameters import load_parameters_for_mode
+from utils.task_codec import build_task_meta, encode_task, encode_task_json
+from utils.result_cache import ResultCache
+from utils.ingest_pool import IngestPoolFull
+from utils.frame_stream import append_frame, frame_stream_key
+from utils.frame_admission import FrameAdmissionController
+from utils.frame_change import FrameChangeDetector
+from utils.result_frame import encode_result_frame, read_result_header, data_url_payload, payload_to_data_url
+from utils.image_pyramid import preview_level
+from utils.tiling import image_shape
+from utils.progress_coalescer import ProgressCoalescer, PROGRESS_PREFIX, ERROR_PREFIX
+from server.fair_scheduler import FairScheduler, TASK_INFO_KEY
+from server.stream_frame_processor import StreamFrameProcessor
 import gc
 import numpy as np
 import base64
+import time
 import cv2
+from contextlib import suppress
+
+
+def decode_image_data_url(image_field):
+    """
+    Decode a 'data:image/...;base64,' URL into a grayscale image.
+
+    Raises:
+        ValueError: If the field is not an image data URL or cannot be decoded
+    """
+    if not isinstance(image_field, str) or not image_field.startswith('data:image'):
+        raise ValueError("Invalid image format")
+    image_bytes = base64.b64decode(image_field[image_field.find(',') + 1:])
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("Image could not be decoded")
+    return image
+
+
+def client_identity(request):
+    """Identity fair sharing and rate limits are keyed on: the X-Client-Id header, else the peer address."""
+    return request.headers.get('X-Client-Id') or request.remote or 'unknown'
+
+
+def task_websocket_urls(task_id):
+    """Return the (worker, client) WebSocket URLs a task's result is delivered on."""
+    protocol = "ws"
+    return f"{protocol}://0.0.0.0:8082/ws/{task_id}", f"{protocol}://localhost:9000/ws/{task_id}"
+
 
 class ClientHandler:
     def __init__(self, server, request, task_id):
@@ -13,6 +55,8 @@ class ClientHandler:
         self.request = request
         self.task_id = task_id
         self.websocket = None
+        self.progress = ProgressCoalescer(self.relay_status, server.progress_interval)
+        self.started = False  # Whether a worker on this socket reported progress yet
 
         # Frame rate control parameters
         self.max_fps = 30  # Default max frames per second
@@ -21,6 +65,9 @@ class ClientHandler:
         self.skip_frames = False  # Whether to enable frame skipping
         self.frames_to_skip = 0  # Counter for frame skipping
         self.frame_skip_pattern = 0  # 0 = process every frame, 1 = every other frame, etc.
+        self.processing_threshold_ms = 100  # Target ingest to result latency for dynamic skipping
+        self.admission = None  # FrameAdmissionController while dynamic skipping is enabled
+        self.change_detector = FrameChangeDetector(server.frame_dedup_threshold, server.frame_dedup_size)
 
     # Add this method to update frame rate settings
     async def set_frame_rate(self, fps):
@@ -35,6 +82,10 @@ class ClientHandler:
             
         self.max_fps = fps
         self.frame_interval = 1.0 / self.max_fps
+        if self.admission is not None:
+            # The requested rate caps what the controller may admit
+            self.admission.set_max_fps(fps)
+            self.frame_interval = 1.0 / self.admission.fps
         
         # Log the change
         # self.log_to_file(f"Frame rate set to {fps} FPS")
@@ -47,6 +98,23 @@ class ClientHandler:
                 "frame_interval": self.frame_interval
             }))
 
+    async def set_dedup_threshold(self, threshold):
+        """
+        Set the change threshold below which stream frames are dropped as duplicates.
+        
+        Args:
+            threshold: Mean absolute pixel difference (0-255), 0 disables suppression
+        """
+        self.change_detector.threshold = max(0.0, float(threshold))
+        self.change_detector.reset()
+        
+        # Notify client about the changed settings
+        if self.websocket is not None:
+            await self.websocket.send_str(json.dumps({
+                "type": "settings",
+                "dedup_threshold": self.change_detector.threshold
+            }))
+
     async def handle_request(self, data):
 
         if self.request.headers.get('Upgrade', '').lower() == 'websocket':
@@ -62,9 +130,24 @@ class ClientHandler:
         print(f"New WebSocket connection from {self.request.remote}")
 
         try:
+            # Only messages for this socket's task are routed to it, from any front-end
+            await self.server.result_router.subscribe(self.task_id, self.websocket)
+
             # Send a welcome message to the client
             await self.websocket.send_str("WebSocket connection established!")
 
+            # A progressive task's preview may have been solved before the client connected
+            preview = self.server.previews.pop(self.task_id, None)
+            if preview is not None:
+                await self.websocket.send_bytes(preview)
+
+            # Deliver the result directly if the task was solved in-process
+            local_task = self.server.local_tasks.pop(self.task_id, None)
+            if local_task is not None:
+                await self.send_local_result(local_task)
+            elif self.server.redis_client is not None:
+                await self.send_finished_result()
+
             # Handle WebSocket messages
             async for msg in self.websocket:
                 if msg.type == web.WSMsgType.TEXT:
@@ -81,23 +164,37 @@ class ClientHandler:
                     except:
                         header, encoded = None, None
                     if header == ('data:image/png;base64'):
+                        # Workers predating binary result frames; clients only get images as binary
                         print("The png image is coming")
-                        # Handle the binary image URL
-                        for ws in self.server.connected_websockets:
-                            if ws is not self.websocket:  # Avoid sending the message back to the sender
-                                await ws.send_str(json.dumps({
-                                    "type": "image",
-                                    "data": image_data
-                                }))
-                                self.server.connected_websockets.remove(self.websocket)
+                        self.progress.discard()
+                        encoding, png = await self.server.ingest_pool.run(data_url_payload, image_data)
+                        frame = encode_result_frame(self.task_id, png, encoding=encoding)
+                        await self.server.result_router.publish(self.task_id, frame, exclude=self.websocket)
+                        cache_key = await self.server.results_cache.put_for_task(self.task_id, png)
+                        await self.server.observe_task_completion(self.task_id, cache_key)
+                    elif msg.data.startswith(PROGRESS_PREFIX) and not self.started:
+                        # Workers without the control connection only show they started by reporting progress
+                        self.started = True
+                        await self.server.mark_tasks_started([self.task_id])
+                        await self.progress.offer(msg.data)
+                    elif self.progress.interval > 0 and msg.data.startswith(PROGRESS_PREFIX):
+                        # Only the latest progress value is relayed, at most once per interval
+                        await self.progress.offer(msg.data)
                     else:
-                        # Send non-image messages as JSON
-                        for ws in self.server.connected_websockets:
-                            if ws is not self.websocket:  # Avoid sending the message back to the sender
-                                await ws.send_str(json.dumps({
-                                    "type": "status",
-                                    "message": msg.data  # e.g., "WebSocket connection established!"
-                                }))
+                        await self.relay_status(msg.data)
+                        if msg.data.startswith(ERROR_PREFIX):
+                            # No result follows; duplicates attached to this task must not wait for one
+                            self.progress.discard()
+                            await self.server.fail_task(self.task_id, msg.data)
+                elif msg.type == web.WSMsgType.BINARY:
+                    # Result frame from the worker: forward it untouched, decode only for the cache
+                    try:
+                        read_result_header(msg.data)
+                    except ValueError as e:
+                        print(f"Ignoring binary message on task {self.task_id}: {e}")
+                        continue
+                    self.progress.discard()
+                    await self.server.deliver_result_frame(self.task_id, msg.data, exclude=self.websocket)
                 elif msg.type == web.WSMsgType.ERROR:
                     print(f"WebSocket connection closed with error: {self.websocket.exception()}")
                     break  # Exit the message loop on error
@@ -106,11 +203,54 @@ class ClientHandler:
             print(f"Unexpected error in WebSocket handler: {e}")
         finally:
             # Clean up the WebSocket connection
-            self.server.connected_websockets.remove(self.websocket)
+            await self.server.close_progress(self.progress)
+            await self.server.result_router.unsubscribe(self.task_id, self.websocket)
+            self.server.connected_websockets.discard(self.websocket)
             print(f"WebSocket connection closed from {self.request.remote}")
             return self.websocket  # Always return the WebSocketResponse object
 
-    
+    async def relay_status(self, message):
+        """Send a worker's text message as JSON to the other subscribers of this task."""
+        await self.server.publish_status(self.task_id, message, exclude=self.websocket)
+
+    async def send_finished_result(self):
+        """
+        Send the cached result or the error of a task that ended before this socket connected.
+
+        Duplicates attached to an in-flight task may connect after its result
+        was pushed; they get it from the result cache instead.
+        """
+        finished_at, cache_key, error = await self.server.redis_client.hmget(
+            TASK_INFO_KEY.format(self.task_id), 'finished_at', 'cache_key', 'error')
+        if error is not None:
+            await self.websocket.send_str(json.dumps({
+                "type": "status",
+                "message": error.decode()
+            }))
+            return
+        if finished_at is None or cache_key is None:
+            return
+        png = await self.server.results_cache.get(cache_key.decode())
+        if png is not None:
+            await self.websocket.send_bytes(encode_result_frame(self.task_id, png))
+
+    async def send_local_result(self, local_task):
+        """Wait for an in-process solve or cache hit and send its binary result frame."""
+        if not local_task.done():
+            await self.websocket.send_str(json.dumps({
+                "type": "status",
+                "message": "Solving in-process"
+            }))
+        try:
+            image_data = await local_task
+        except Exception as e:
+            await self.websocket.send_str(json.dumps({
+                "type": "status",
+                "message": f"Image processing error: {e}"
+            }))
+            return
+        await self.websocket.send_bytes(image_data)
+
     async def handle_http(self, data):
         if data is None:
             raise ValueError("data is null or empty")
@@ -122,64 +262,46 @@ class ClientHandler:
         if params is None:
             raise ValueError("Parameters for mode not found")
 
-        # Handle HTTP POST request
-        if self.server.redis_client is None:
-            raise ValueError("Redis client is null")
-
-        # Process the data as needed (e.g., save the image)
-        task_id = str(uuid.uuid4())
-
-        # ✅ Initialize `image_data` to avoid UnboundLocalError
-        image_data = None  
-        width, height = None, None  # ✅ Initialize width & height
-        
         try:
-            image_data = data.get('image', '').encode()
-        
-            if image_data.startswith(b'data:image'):
-                # Find the base64 data
-                base64_start = image_data.find(b',') + 1
-                image_data = base64.b64decode(image_data[base64_start:])  # Decode from bytes
-
-                # Convert the byte data to a NumPy array
-                np_array = np.frombuffer(image_data, dtype=np.uint8)
-                image = cv2.imdecode(np_array, cv2.IMREAD_GRAYSCALE)
-
-                # Convert the image to a list for JSON serialization
-                data['image'] = image.tolist()  # Convert ndarray to list
-                data['feedbackA'] = params['A'].tolist()
-                data['controlB'] = params['B'].tolist()
-                data['t_span'] = params['t'].tolist()
-                data['Ib'] = params['Ib']
-                data['initialCondition'] = params['init']
-                data['mode'] = None
-
-            else:
-                return web.Response(status=400, text="Invalid image format")
-        
+            # base64 and PNG decoding run on the ingest pool, off the event loop
+            image = await self.server.ingest_pool.run(decode_image_data_url, data.pop('image', None))
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
+        except IngestPoolFull:
+            raise
         except Exception as e:
             return web.Response(status=500, text=f"Error processing image: {e}")
-        
-        finally:
-            # Clean up if necessary
-            if 'image_data' in locals():
-                del image_data
-            # del data, image_data, keep_original_size, selected_size, invert_size
 
+        try:
+            priority = FairScheduler.normalize_priority(data.get('priority'))
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
 
-        #protocol = "wss" if self.request.scheme == "https" else "ws"
-        protocol = "ws"
-        # Generate a WebSocket URL for the client to connect to later
-        websocket_url = f"{protocol}://0.0.0.0:8082/ws/{task_id}"
-        websocket_url_client = f"{protocol}://localhost:9000/ws/{task_id}"
-        data['websocket'] = websocket_url
-        # # Store the incoming JSON to Redis database as the key
-        await self.server.redis_client.set(f'task:data:{self.task_id}', json.dumps(data))
+        return await self.submit_image(image, params, data.get('mode'), priority, bool(data.get('progressive')))
 
-        # # Push task_id to task queue
-        await self.server.redis_client.lpush('queue:task_queue', self.task_id)
+    @property
+    def client_id(self):
+        return client_identity(self.request)
 
-        return web.json_response({
+    async def submit_image(self, image, params, mode, priority='interactive', progressive=False):
+        """
+        Route a decoded image to the result cache, the in-process solver or the Redis queue.
+
+        Args:
+            image: Decoded grayscale image
+            params: Template parameters for the mode
+            mode: Mode name the parameters were resolved from
+            priority: Scheduling class of the task, 'interactive' or 'bulk'
+            progressive: Also solve a downscaled preview in-process and send it first
+
+        Returns:
+            web.Response: JSON with the task id and the WebSocket URL for the result
+        """
+        task_id = self.task_id
+        # Generate a WebSocket URL for the client to connect to later
+        websocket_url, websocket_url_client = task_websocket_urls(task_id)
+
+        response = {
             'server_response': "All data received successfully!",
             'response_status': 200,
             'task_id': task_id,
@@ -189,7 +311,418 @@ class ClientHandler:
             'start':np.min(params['t']),
             'end':np.max(params['t']),
             'websocket_url': websocket_url_client  # Send back the WebSocket URL
+        }
+
+        cache_key = await self.server.ingest_pool.run(ResultCache.make_key, image, params)
+        cached = await self.server.results_cache.get(cache_key)
+        if cached is not None:
+            # Same pixels and template were solved before: answer without enqueueing
+            self.server.publish_local_result(task_id, cached, cache_key)
+            now = time.time()
+            await self.server.update_task_info(task_id, mode=mode or 'unknown', submitted_at=now, finished_at=now,
+                                               cache_key=cache_key)
+            response['cached'] = True
+            response['result'] = payload_to_data_url(cached)
+            return web.json_response(response)
+
+        solve_locally = self.server.should_solve_locally(image)
+        if not solve_locally and self.server.single_flight_ttl > 0:
+            owner = (await self.server.results_cache.claim([(cache_key, task_id)], self.server.single_flight_ttl))[0]
+            if owner != task_id:
+                # An identical task is in flight: attach to it instead of solving the same thing twice
+                self.server.tasks_coalesced.inc()
+                response['task_id'] = owner
+                response['websocket_url'] = task_websocket_urls(owner)[1]
+                response['coalesced'] = True
+                return web.json_response(response)
+
+        # Previews are best effort: skipped while the local solver already has enough of them waiting
+        if progressive and self.server.local_solver_mode != 'off' and self.server.preview_capacity:
+            preview = await self.server.ingest_pool.run(preview_level, image, self.server.preview_max_pixels)
+            if preview is not None:
+                level, preview_image = preview
+                if self.server.submit_preview(task_id, preview_image, params, level) is not None:
+                    response['preview'] = {'level': level, 'height': preview_image.shape[0],
+                                           'width': preview_image.shape[1]}
+
+        if solve_locally:
+            # Solve in-process; the result is sent once the client opens its WebSocket
+            self.server.submit_local_task(task_id, image, params, cache_key, mode)
+        else:
+            # Handle HTTP POST request
+            if self.server.redis_client is None:
+                raise ValueError("Redis client is null")
+
+            try:
+                task_blob = await self.server.ingest_pool.run(
+                    self.encode_task_blob, image, params, mode, websocket_url
+                )
+
+                # Store the task, put it on the client's sub-queue and bind its cache key in one round trip
+                async with self.server.redis_client.pipeline(transaction=True) as pipe:
+                    self.queue_task(pipe, task_id, task_blob, cache_key, mode, priority,
+                                    self.server.scheduler.task_cost(image.size))
+                    with self.server.redis_rtt.time(operation='enqueue_task'):
+                        await pipe.execute()
+            except Exception:
+                # Do not leave duplicates attached to a task that was never queued
+                with suppress(Exception):
+                    await self.server.results_cache.release(cache_key)
+                raise
+
+        return web.json_response(response)
+
+    async def handle_upload(self):
+        """
+        Accept raw image bytes without the base64 data URL and JSON wrapping.
+
+        The body is either the encoded image itself (application/octet-stream
+        or image/*, mode in the query string) or multipart/form-data with an
+        'image' file part and a 'mode' field. The body is read in chunks and
+        handed to cv2.imdecode without intermediate copies.
+        """
+        mode = self.request.query.get('mode')
+        priority = self.request.query.get('priority')
+        limit = self.server.upload_max_bytes
+
+        if self.request.content_type == 'multipart/form-data':
+            image_bytes = None
+            has_image = False
+            reader = await self.request.multipart()
+            async for part in reader:
+                if part.name == 'mode':
+                    mode = (await part.text()).strip()
+                elif part.name == 'priority':
+                    priority = (await part.text()).strip()
+                elif part.name == 'image':
+                    has_image = True
+                    image_bytes = await self._read_chunks(part.read_chunk, limit)
+                    if image_bytes is None:
+                        # Too large: answer 413 below without reading the rest of the body
+                        break
+            if not has_image:
+                return web.Response(status=400, text="Missing image part")
+        elif self.request.content_type == 'application/octet-stream' or self.request.content_type.startswith('image/'):
+            if self.request.content_length is not None and self.request.content_length > limit:
+                return web.Response(status=413, text=f"Upload exceeds {limit} bytes")
+            image_bytes = await self._read_chunks(self.request.content.readany, limit)
+        else:
+            return web.Response(status=415, text='Invalid content type')
+
+        if image_bytes is None:
+            return web.Response(status=413, text=f"Upload exceeds {limit} bytes")
+
+        if not mode:
+            raise ValueError("mode chosen is null or empty")
+
+        try:
+            priority = FairScheduler.normalize_priority(priority)
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
+
+        params = load_parameters_for_mode(mode)
+        if params is None:
+            raise ValueError("Parameters for mode not found")
+
+        image = await self.server.ingest_pool.run(
+            cv2.imdecode, np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE
+        )
+        del image_bytes
+        if image is None:
+            return web.Response(status=400, text="Image could not be decoded")
+
+        return await self.submit_image(image, params, mode, priority)
+
+    async def handle_tiled(self):
+        """
+        Accept an image too large for /tasks and solve it as tiles.
+
+        The body is either raw 8-bit grayscale pixels (application/octet-stream,
+        width and height in the query string), streamed straight into the
+        memory-mapped input, or an encoded image (image/*) of at most
+        upload_max_bytes and tile_decode_max_pixels that is decoded in memory
+        and copied into it; larger images must be sent raw. mode and
+        priority (bulk by default) come from the query string. The result is
+        announced on the task's WebSocket and served on /tasks/{id}/tiled.
+        """
+        query = self.request.query
+        mode = query.get('mode')
+        if not mode:
+            raise ValueError("mode chosen is null or empty")
+        params = load_parameters_for_mode(mode)
+        if params is None:
+            raise ValueError("Parameters for mode not found")
+        try:
+            priority = FairScheduler.normalize_priority(query.get('priority'), default='bulk')
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
+
+        content_type = self.request.content_type
+        if content_type == 'application/octet-stream':
+            try:
+                height, width = int(query['height']), int(query['width'])
+            except (KeyError, ValueError):
+                return web.Response(status=400, text="Raw uploads need integer width and height")
+            if height <= 0 or width <= 0:
+                return web.Response(status=400, text="width and height must be positive")
+            if height * width > self.server.tile_max_pixels:
+                return web.Response(status=413, text=f"Image exceeds {self.server.tile_max_pixels} pixels")
+            if self.request.content_length is not None and self.request.content_length != height * width:
+                return web.Response(status=400, text=f"Expected {height * width} bytes of pixels")
+
+            job = self.server.create_tiled_job(self.task_id, (height, width), params, mode)
+            pixels = job.input.reshape(-1)
+            received = 0
+            overflow = False
+            try:
+                async for chunk in self.request.content.iter_chunked(1024 * 1024):
+                    if received + len(chunk) > pixels.size:
+                        overflow = True
+                        break
+                    pixels[received:received + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+                    received += len(chunk)
+            except Exception:
+                # The upload broke off: nothing will finish this job
+                await self.server.discard_tiled_job(self.task_id)
+                raise
+            del pixels
+            if overflow or received != height * width:
+                await self.server.discard_tiled_job(self.task_id)
+                return web.Response(status=400, text=f"Expected {height * width} bytes of pixels")
+        elif content_type.startswith('image/'):
+            limit = self.server.upload_max_bytes
+            image_bytes = await self._read_chunks(self.request.content.readany, limit)
+            if image_bytes is None:
+                return web.Response(status=413, text=f"Upload exceeds {limit} bytes")
+            # Reject oversized images from the header, before the pixels are decoded
+            try:
+                height, width = await self.server.ingest_pool.run(image_shape, image_bytes)
+            except ValueError as e:
+                return web.Response(status=400, text=str(e))
+            # Decoding holds the whole image in memory, unlike raw uploads
+            limit = min(self.server.tile_max_pixels, self.server.tile_decode_max_pixels)
+            if height * width > limit:
+                return web.Response(
+                    status=413, text=f"Encoded images are limited to {limit} pixels; send larger ones as raw pixels")
+            image = await self.server.ingest_pool.run(
+                cv2.imdecode, np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE
+            )
+            del image_bytes
+            if image is None:
+                return web.Response(status=400, text="Image could not be decoded")
+            job = self.server.create_tiled_job(self.task_id, image.shape, params, mode)
+            job.input[:] = image
+            del image
+        else:
+            return web.Response(status=415, text='Invalid content type')
+
+        await job.start(self.client_id, priority)
+        _, websocket_url_client = task_websocket_urls(self.task_id)
+        return web.json_response({
+            'server_response': "All data received successfully!",
+            'response_status': 200,
+            'task_id': self.task_id,
+            'tiles': len(job.tiles),
+            'halo': job.halo,
+            'websocket_url': websocket_url_client,
+            'result_url': f'/tasks/{self.task_id}/tiled',
         })
+
+    @staticmethod
+    async def _read_chunks(read_chunk, limit):
+        """Read a body chunk by chunk into one buffer, or return None once it exceeds limit."""
+        buffer = bytearray()
+        while True:
+            chunk = await read_chunk()
+            if not chunk:
+                return buffer
+            if len(buffer) + len(chunk) > limit:
+                return None
+            buffer += chunk
+
+    def encode_task_blob(self, image, params, mode, websocket_url):
+        """Serialize a task in the configured task format (CPU bound, runs on the ingest pool)."""
+        meta = build_task_meta(params, mode=mode, websocket=websocket_url)
+        if self.server.task_format == 'json':
+            return encode_task_json(image, meta)
+        return encode_task(image, meta)
+
+    def queue_task(self, pipe, task_id, task_blob, cache_key, mode, priority, cost):
+        """
+        Add the commands that enqueue one task to a Redis pipeline.
+
+        Args:
+            pipe: Redis pipeline the commands are appended to
+            task_id: Id the task is stored and announced under
+            task_blob: Task encoded by encode_task_blob
+            cache_key: ResultCache key the result will be stored under
+            mode: Mode name, recorded for the per-mode duration metric
+            priority: Scheduling class, 'interactive' or 'bulk'
+            cost: Scheduling cost of the task, see FairScheduler.task_cost
+        """
+        pipe.set(f'task:data:{task_id}', task_blob)
+        # The scheduler moves it from the client's sub-queue to a worker queue
+        self.server.scheduler.queue_submit(pipe, task_id, self.client_id, priority, cost)
+        self.server.results_cache.queue_bind_task(pipe, task_id, cache_key)
+        self.server.queue_task_info(pipe, task_id, mode)
+
+    async def handle_batch(self, data):
+        """
+        Submit many images in one request.
+
+        The body is either {"mode": ..., "images": [data_url, ...]} or
+        {"images": [{"image": data_url, "mode": ...}, ...]}, where a per-image
+        mode overrides the top level one. An optional "priority" picks the
+        scheduling class, bulk by default. Images are decoded concurrently and
+        every queued task is written with a single pipelined round trip.
+
+        Returns:
+            web.Response: JSON with one entry per image, in request order
+        """
+        if data is None:
+            raise ValueError("data is null or empty")
+
+        images = data.get('images')
+        if not isinstance(images, list) or not images:
+            return web.Response(status=400, text="images must be a non-empty list")
+        if len(images) > self.server.batch_max_images:
+            return web.Response(status=413, text=f"At most {self.server.batch_max_images} images per batch")
+        try:
+            # Batches drain behind interactive requests unless they ask otherwise
+            priority = FairScheduler.normalize_priority(data.get('priority'), default='bulk')
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
+
+        items = []
+        for entry in images:
+            if isinstance(entry, dict):
+                items.append((entry.get('image'), entry.get('mode') or data.get('mode')))
+            else:
+                items.append((entry, data.get('mode')))
+
+        templates = {}
+        for _, mode in items:
+            if isinstance(mode, str) and mode and mode not in templates:
+                templates[mode] = load_parameters_for_mode(mode)
+
+        # A batch is decoded, hashed and encoded as many jobs as the pool has threads at a time,
+        # so it does not need the whole pending allowance to itself
+        chunk_size = self.server.ingest_pool.max_workers
+        decoded = await self.server.ingest_pool.map(
+            decode_image_data_url, [image_field for image_field, _ in items], chunk_size=chunk_size)
+
+        prepared = []
+        for (_, mode), image in zip(items, decoded):
+            params = templates.get(mode) if isinstance(mode, str) else None
+            if mode is not None and not isinstance(mode, str):
+                prepared.append({'error': "mode must be a string"})
+            elif params is None:
+                prepared.append({'error': f"Parameters for mode {mode!r} not found"})
+            elif isinstance(image, Exception):
+                prepared.append({'error': f"Error processing image: {image}"})
+            else:
+                prepared.append({
+                    'task_id': str(uuid.uuid4()),
+                    'mode': mode,
+                    'image': image,
+                    'params': params,
+                })
+
+        valid = [entry for entry in prepared if 'error' not in entry]
+        keys = await self.server.ingest_pool.map(
+            lambda entry: ResultCache.make_key(entry['image'], entry['params']), valid, chunk_size=chunk_size
+        )
+        for entry, cache_key in zip(valid, keys):
+            entry['cache_key'] = cache_key
+
+        cached = await self.server.results_cache.get_many([entry['cache_key'] for entry in valid])
+
+        tasks = []
+        to_queue = []
+        hits = []
+        for entry in prepared:
+            if 'error' in entry:
+                tasks.append({'error': entry['error']})
+                continue
+
+            task_id = entry['task_id']
+            websocket_url, websocket_url_client = task_websocket_urls(task_id)
+            task = {'task_id': task_id, 'mode': entry['mode'], 'websocket_url': websocket_url_client}
+            result = cached.get(entry['cache_key'])
+
+            if result is not None:
+                self.server.publish_local_result(task_id, result, entry['cache_key'])
+                hits.append(entry)
+                task['cached'] = True
+                task['result'] = payload_to_data_url(result)
+            elif self.server.should_solve_locally(entry['image']):
+                self.server.submit_local_task(task_id, entry['image'], entry['params'], entry['cache_key'],
+                                              entry['mode'])
+            elif self.server.redis_client is None:
+                task = {'error': "Redis client is null"}
+            else:
+                entry['websocket_url'] = websocket_url
+                to_queue.append((len(tasks), entry))
+            tasks.append(task)
+
+        if to_queue and self.server.single_flight_ttl > 0:
+            # Duplicates of in-flight tasks, including repeats within this batch, attach to the first one
+            owners = await self.server.results_cache.claim(
+                [(entry['cache_key'], entry['task_id']) for _, entry in to_queue], self.server.single_flight_ttl)
+            claimed = []
+            for (index, entry), owner in zip(to_queue, owners):
+                if owner == entry['task_id']:
+                    claimed.append((index, entry))
+                    continue
+                self.server.tasks_coalesced.inc()
+                tasks[index] = {'task_id': owner, 'mode': entry['mode'], 'coalesced': True,
+                                'websocket_url': task_websocket_urls(owner)[1]}
+            to_queue = claimed
+
+        if to_queue:
+            blobs = await self.server.ingest_pool.map(
+                lambda queued: self.encode_task_blob(
+                    queued[1]['image'], queued[1]['params'], queued[1]['mode'], queued[1]['websocket_url']
+                ),
+                to_queue,
+                chunk_size=chunk_size
+            )
+            try:
+                async with self.server.redis_client.pipeline(transaction=False) as pipe:
+                    for (index, entry), task_blob in zip(to_queue, blobs):
+                        if isinstance(task_blob, Exception):
+                            tasks[index] = {'error': f"Error encoding task: {task_blob}"}
+                            self.server.results_cache.queue_release(pipe, entry['cache_key'])
+                            continue
+                        self.queue_task(pipe, entry['task_id'], task_blob, entry['cache_key'], entry['mode'],
+                                        priority, self.server.scheduler.task_cost(entry['image'].size))
+                    with self.server.redis_rtt.time(operation='enqueue_batch'):
+                        await pipe.execute()
+            except Exception:
+                # Do not leave duplicates attached to tasks that were never queued
+                with suppress(Exception):
+                    async with self.server.redis_client.pipeline(transaction=False) as pipe:
+                        for _, entry in to_queue:
+                            self.server.results_cache.queue_release(pipe, entry['cache_key'])
+                        await pipe.execute()
+                raise
+
+        if hits and self.server.redis_client is not None:
+            # Cache hits are done at once; record them so GET /tasks/{id}/result serves them
+            now = time.time()
+            async with self.server.redis_client.pipeline(transaction=False) as pipe:
+                for entry in hits:
+                    self.server.queue_task_fields(pipe, entry['task_id'], mode=entry['mode'], submitted_at=now,
+                                                  finished_at=now, cache_key=entry['cache_key'])
+                await pipe.execute()
+
+        return web.json_response({
+            'server_response': "All data received successfully!",
+            'response_status': 200,
+            'task_ids': [task['task_id'] for task in tasks if 'task_id' in task],
+            'tasks': tasks
+        })
+
     async def handle_offer_ws(self, ws_client, ws_local, data):
         """
         Handle WebSocket connections for video streaming with frame rate control.
@@ -207,7 +740,14 @@ class ClientHandler:
         # Set frame rate if specified in data
         if 'fps' in data:
             await self.set_frame_rate(int(data['fps']))
+        if 'dedup_threshold' in data:
+            await self.set_dedup_threshold(data['dedup_threshold'])
+        if data.get('dynamic_frame_skipping'):
+            await self.enable_dynamic_frame_skipping(True, data.get('threshold_ms', self.processing_threshold_ms))
         
+        stream_config = None
+        reading_results = False
+        processor = None
         try:
             # Send confirmation to the client
             await self.websocket.send_str(json.dumps({
@@ -229,7 +769,9 @@ class ClientHandler:
                     'fps': self.max_fps
                 },
                 'active': True,
-                'client_ws': ws_client
+                'client_ws': ws_client,
+                'frame_stream': frame_stream_key(stream_id),
+                'frame_stream_maxlen': self.server.frame_stream_maxlen
             }
             
             await self.server.redis_client.set(
@@ -238,6 +780,10 @@ class ClientHandler:
             )
             
             frame_count = 0
+            await self.server.stream_results.subscribe(stream_id, self.forward_stream_results)
+            reading_results = True
+            processor = StreamFrameProcessor(self.server, stream_id, params)
+            processor.start()
             
             # Process incoming WebSocket messages (video frames)
             async for msg in self.websocket:
@@ -250,6 +796,15 @@ class ClientHandler:
                         if command.get('type') == 'settings' and 'fps' in command:
                             await self.set_frame_rate(int(command['fps']))
                             continue
+                        if command.get('type') == 'settings' and 'dynamic_frame_skipping' in command:
+                            await self.enable_dynamic_frame_skipping(
+                                bool(command['dynamic_frame_skipping']),
+                                command.get('threshold_ms', self.processing_threshold_ms)
+                            )
+                            continue
+                        if command.get('type') == 'settings' and 'dedup_threshold' in command:
+                            await self.set_dedup_threshold(command['dedup_threshold'])
+                            continue
                             
                         # Process other control messages
                         if command.get('type') == 'control':
@@ -278,6 +833,7 @@ class ClientHandler:
                     elapsed = current_time - self.last_frame_time
                     if elapsed < self.frame_interval:
                         # Too soon for next frame, skip it
+                        self.server.stream_frames.inc(outcome='throttled')
                         continue
                     
                     # Apply frame skipping pattern (if enabled)
@@ -288,23 +844,49 @@ class ClientHandler:
                     self.last_frame_time = current_time
                     frame_data = msg.data
                     
-                    # Store the frame in Redis with a timestamp
-                    timestamp = await self.server.redis_client.time()
-                    frame_key = f'stream:frame:{stream_id}:{timestamp[0]}.{timestamp[1]}'
+                    # Drop frames that barely changed since the last stored one; the
+                    # client keeps showing the result of that frame instead
+                    signature = None
+                    if self.change_detector.enabled:
+                        try:
+                            signature = await self.server.ingest_pool.run(self.change_detector.signature, frame_data)
+                        except IngestPoolFull:
+                            pass
+                        if self.change_detector.is_duplicate(signature):
+                            self.server.stream_frames.inc(outcome='duplicate')
+                            await self.websocket.send_str(json.dumps({
+                                "type": "frame_skipped",
+                                "reason": "duplicate",
+                                "frame_number": frame_count,
+                                "result_frame": self.change_detector.reference_frame
+                            }))
+                            continue
                     
-                    # Save the raw frame data
-                    await self.server.redis_client.set(frame_key, frame_data)
+                    # Timestamp the frame with the local monotonic clock instead of a Redis TIME call
+                    timestamp = f'{time.monotonic_ns() / 1e9:.6f}'
                     
-                    # Notify processors that a new frame is available
-                    await self.server.redis_client.publish(
-                        'channel:new_frame',
-                        json.dumps({
-                            'stream_id': stream_id,
-                            'frame_key': frame_key,
-                            'timestamp': f'{timestamp[0]}.{timestamp[1]}',
-                            'frame_number': frame_count
-                        })
-                    )
+                    # Append to the stream's capped ring buffer and notify processors in one round trip
+                    async with self.server.redis_client.pipeline(transaction=False) as pipe:
+                        append_frame(
+                            pipe, stream_id, frame_data, frame_count, timestamp,
+                            self.server.frame_stream_maxlen, self.server.frame_stream_ttl
+                        )
+                        pipe.publish(
+                            'channel:new_frame',
+                            json.dumps({
+                                'stream_id': stream_id,
+                                'frame_stream': frame_stream_key(stream_id),
+                                'timestamp': timestamp,
+                                'frame_number': frame_count
+                            })
+                        )
+                        with self.server.redis_rtt.time(operation='store_frame'):
+                            await pipe.execute()
+                    self.change_detector.keep(signature, frame_count)
+                    self.server.stream_frames.inc(outcome='stored')
+                    if self.admission is not None:
+                        self.admission.frame_stored(frame_count)
+                        await self.apply_admission()
                     
                 elif msg.type == web.WSMsgType.ERROR:
                     print(f"WebSocket connection closed with error: {self.websocket.exception()}")
@@ -314,17 +896,19 @@ class ClientHandler:
             print(f"Error in stream WebSocket handler: {e}")
         finally:
             # Clean up
+            if reading_results:
+                self.server.stream_results.unsubscribe(stream_id)
+            if processor is not None:
+                await processor.close()
             self.server.connected_websockets.remove(self.websocket)
             
-            # Mark stream as inactive in Redis
+            # Mark stream as inactive in Redis, reusing the config this handler wrote
             try:
-                config = await self.server.redis_client.get(f'stream:config:{stream_id}')
-                if config:
-                    config_data = json.loads(config)
-                    config_data['active'] = False
+                if stream_config is not None:
+                    stream_config['active'] = False
                     await self.server.redis_client.set(
                         f'stream:config:{stream_id}', 
-                        json.dumps(config_data)
+                        json.dumps(stream_config)
                     )
             except Exception as cleanup_error:
                 print(f"Error during cleanup: {cleanup_error}")
@@ -332,6 +916,46 @@ class ClientHandler:
             print(f"Streaming WebSocket connection closed from {self.request.remote}")
             return self.websocket
 
+    async def forward_stream_results(self, entries):
+        """
+        Relay processed frame results to the client and feed their latency to the admission controller.
+        
+        Args:
+            entries: (entry_id, fields) pairs read from the stream's result stream
+        """
+        for _, fields in entries:
+            frame_number = fields['frame_number']
+            result = fields.get('result', b'')
+            if isinstance(result, bytes):
+                # Results are PNG bytes; older producers wrote data URLs
+                result = result.decode() if result.startswith(b'data:') else payload_to_data_url(result)
+            latency_ms = None
+            if self.admission is not None:
+                latency_ms = self.admission.result_delivered(frame_number)
+            await self.websocket.send_str(json.dumps({
+                "type": "frame_result",
+                "frame_number": frame_number,
+                "latency_ms": latency_ms,
+                "data": result
+            }))
+        if self.admission is not None:
+            await self.apply_admission()
+
+    async def apply_admission(self):
+        """Let the admission controller re-evaluate the rate and report a change over the settings message."""
+        if not self.admission.update():
+            return
+        self.frame_interval = 1.0 / self.admission.fps
+        if self.websocket is not None:
+            await self.websocket.send_str(json.dumps({
+                "type": "settings",
+                "fps": self.max_fps,
+                "effective_fps": round(self.admission.fps, 1),
+                "frame_interval": self.frame_interval,
+                "latency_ms": None if self.admission.latency_ms is None else round(self.admission.latency_ms, 1),
+                "in_flight": self.admission.in_flight
+            }))
+
     # Add these methods for dynamic frame rate control
     async def set_frame_skip_pattern(self, pattern):
         """
@@ -361,6 +985,11 @@ class ClientHandler:
         """
         self.skip_frames = enabled
         self.processing_threshold_ms = threshold_ms
+        if enabled:
+            self.admission = FrameAdmissionController(target_ms=threshold_ms, max_fps=self.max_fps)
+        else:
+            self.admission = None
+            self.frame_interval = 1.0 / self.max_fps
         # self.log_to_file(f"Dynamic frame skipping {'enabled' if enabled else 'disabled'}")
         
         # Notify client about the changed settings
@@ -406,8 +1035,8 @@ class ClientHandler:
             protocol = "wss" if self.request.scheme == "https" else "ws"
             
             # Generate WebSocket URLs
-            websocket_url = f"{protocol}://0.0.0.0:8082/ws/{stream_id}"
-            websocket_url_client = f"{protocol}://{self.request.host}:9000/ws/{stream_id}"
+            websocket_url = f"{protocol}://0.0.0.0:8082/ws/stream/{stream_id}"
+            websocket_url_client = f"{protocol}://{self.request.host}:9000/ws/stream/{stream_id}"
             
             # Prepare stream configuration
             stream_config = {
@@ -420,19 +1049,20 @@ class ClientHandler:
                     'Ib': params['Ib'],
                     'initialCondition': params['init'],
                 },
-                'created_at': await self.server.redis_client.time(),
+                'created_at': time.time(),
                 'client_ws': websocket_url_client,
                 'server_ws': websocket_url
             }
             
-            # Store the stream configuration in Redis
-            await self.server.redis_client.set(
-                f'stream:config:{stream_id}', 
-                json.dumps(stream_config)
-            )
-            
-            # Add to the stream processing queue
-            await self.server.redis_client.lpush('queue:stream_queue', stream_id)
+            # Store the stream configuration and queue the stream atomically in one round trip
+            async with self.server.redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(
+                    f'stream:config:{stream_id}', 
+                    json.dumps(stream_config)
+                )
+                pipe.lpush('queue:stream_queue', stream_id)
+                with self.server.redis_rtt.time(operation='enqueue_stream'):
+                    await pipe.execute()
             
             # Log the successful setup
             # self.log_to_file(f"Stream setup successful, ID: {stream_id}")
@@ -0,0 +1,133 @@
+import math
+import time
+from server.fair_scheduler import FairScheduler
+from server.worker_registry import SHARED_QUEUE
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def full(self):
+        self._refill()
+        return self.tokens >= self.burst
+
+    def take(self, cost=1):
+        """
+        Take cost tokens if available.
+
+        A cost above burst is taken from a full bucket, which then stays in
+        debt until it has refilled, so it is admitted at the same average rate.
+
+        Returns:
+            0 when the tokens were taken, else the seconds until they will be available
+        """
+        self._refill()
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0
+        return (needed - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Decides before a request body is read whether the request is accepted.
+
+    Three checks run from cheapest to most specific: the ingest pool's
+    pending decode jobs, the number of tasks waiting to be dispatched
+    across all front-ends (client sub-queues plus the shared queue), and
+    a token bucket per client. A rejected request gets the reason and a
+    Retry-After in seconds; for a full backlog it is the time the
+    dispatcher needs to drain the excess at its observed rate. Buckets are
+    per process, so with WEB_WORKERS front-ends a client's effective rate
+    is up to WEB_WORKERS times client_rate.
+    """
+
+    MAX_BUCKETS = 4096  # idle, full buckets are dropped beyond this
+
+    def __init__(self, redis_client=None, ingest_pool=None, max_backlog=500, client_rate=5.0, client_burst=20,
+                 refresh_interval=0.5, max_retry_after=60):
+        self.redis_client = redis_client
+        self.ingest_pool = ingest_pool
+        self.max_backlog = max_backlog
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.refresh_interval = refresh_interval
+        self.max_retry_after = max_retry_after
+        self.buckets = {}
+        self.backlog = 0
+        self.drain_rate = 0.0
+        self._refreshed_at = 0.0
+
+    async def refresh(self):
+        """Reload the dispatch backlog and drain rate published by the scheduler."""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(FairScheduler.BACKLOG_KEY)
+            pipe.llen(SHARED_QUEUE)
+            pipe.get(FairScheduler.DRAIN_RATE_KEY)
+            waiting, shared, drain_rate = await pipe.execute()
+        self.backlog = max(0, int(waiting or 0)) + shared
+        self.drain_rate = float(drain_rate or 0.0)
+        self._refreshed_at = time.monotonic()
+
+    def _retry_after(self, seconds):
+        return min(self.max_retry_after, max(1, math.ceil(seconds)))
+
+    async def check(self, client_id, cost=1):
+        """
+        Args:
+            client_id: Identity the token bucket is kept for
+            cost: Tokens the request takes from the bucket
+
+        Returns:
+            None when the request is admitted, else (reason, retry_after_seconds)
+        """
+        if self.ingest_pool is not None and self.ingest_pool.pending >= self.ingest_pool.max_pending:
+            return 'ingest', 1
+
+        if self.redis_client is not None and self.max_backlog > 0:
+            if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                await self.refresh()
+            if self.backlog >= self.max_backlog:
+                excess = self.backlog - self.max_backlog + 1
+                if self.drain_rate > 0:
+                    return 'backlog', self._retry_after(excess / self.drain_rate)
+                return 'backlog', self.max_retry_after
+
+        return self.charge(client_id, cost)
+
+    def charge(self, client_id, cost):
+        """
+        Take cost tokens from the client's bucket and count cost more tasks in the backlog.
+
+        Used directly for the rest of a request whose size is only known once
+        its body was read, e.g. the images of a batch.
+
+        Returns:
+            None when the tokens were taken, else ('client_rate', retry_after_seconds)
+        """
+        if self.client_rate > 0:
+            bucket = self.buckets.get(client_id)
+            if bucket is None:
+                if len(self.buckets) >= self.MAX_BUCKETS:
+                    self.buckets = {key: value for key, value in self.buckets.items() if not value.full}
+                bucket = self.buckets[client_id] = TokenBucket(self.client_rate, self.client_burst)
+            wait = bucket.take(cost)
+            if wait:
+                return 'client_rate', self._retry_after(wait)
+
+        # Count the admitted tasks until the next refresh so a burst cannot overshoot
+        self.backlog += cost
+        return None
@@ -1,39 +1,155 @@
 import asyncio
-import aiohttp
 from aiohttp import web
 import redis.asyncio as redis
 from aiolimiter import AsyncLimiter
 import uuid
+import os
+import time
 from contextlib import suppress
-import datetime
 import json
+import functools
 import numpy as np
 import utils.pkl_save as utils
 from pathlib import Path
-from handlers.client_handler import ClientHandler
+from handlers.client_handler import ClientHandler, client_identity, task_websocket_urls
+from concurrent.futures import ThreadPoolExecutor
+from config.config import (
+    load_task_format, load_local_solver_config, load_result_cache_config, load_batch_config,
+    load_redis_pool_config, load_upload_config, load_ingest_config, load_log_config,
+    load_frame_stream_config, load_frame_dedup_config, load_progress_config, load_worker_registry_config,
+    load_scheduler_config, load_admission_config, load_tiling_config, load_progressive_config,
+    load_single_flight_config
+)
+import utils.cnn_solver as cnn_solver
+from utils.load_parameters import load_parameters_for_mode
+from utils.result_cache import ResultCache
+from utils.ingest_pool import IngestPool, IngestPoolFull
+from utils.async_logger import AsyncLogSink
+from utils.metrics import MetricsRegistry
+from server.result_router import ResultRouter
+from server.stream_result_reader import StreamResultReader
+from server.worker_registry import WorkerRegistry
+from server.fair_scheduler import FairScheduler, TASK_INFO_KEY
+from server.admission_control import AdmissionController
+from server.tiled_job import TiledJob
+from utils.tiling import halo_width
+from utils.result_frame import encode_result_frame, result_frame_payload, read_result_header
+from utils.progress_coalescer import ProgressCoalescer, PROGRESS_PREFIX, ERROR_PREFIX
+from utils.control_protocol import (
+    CONTROL_PREAMBLE, CONTROL_VERSION, MSG_LOG, MSG_PROGRESS, MSG_RESULT, MSG_HEARTBEAT, MSG_CAPACITY,
+    ProtocolError, read_preamble, read_message, decode_progress, decode_capacity
+)
 
 dist_path = Path(__file__).parent.parent / "dist"
+LOCAL_RESULT_TTL = 300  # seconds an unclaimed in-process result is kept
 
 class AsyncServer:
-    def __init__(self, host, port, julia_port, redis_host, redis_port):
+    def __init__(self, host, port, julia_port, redis_host, redis_port, reuse_port=False, control_owner=True,
+                 clear_log=True):
         if not host or not port or not julia_port or not redis_host or not redis_port:
             raise ValueError("All initialization parameters must be provided and non-empty.")
 
+        # With several front-end processes on one port only the control owner
+        # listens on julia_port; the launcher resets the shared log file before forking
+        self.reuse_port = reuse_port
+        self.control_owner = control_owner
+        self.clear_log = clear_log
+
         self.host = host
         self.port = port
         self.julia_port = julia_port
         self.redis_host = redis_host
         self.redis_port = redis_port
         self.redis_client = None
+        self.redis_pool = None
         self.rate_limiter = AsyncLimiter(10, 1)  # 10 requests per second
-        self.results_cache = {}
+        cache_size, cache_ttl = load_result_cache_config()
+        self.results_cache = ResultCache(max_entries=cache_size, ttl=cache_ttl)
         self.julia_clients = set()
+        self.julia_workers = {}  # peer address -> worker_id, last_seen and capacity of a framed worker connection
+        heartbeat_timeout, registry_refresh = load_worker_registry_config()
+        self.worker_registry = WorkerRegistry(heartbeat_timeout=heartbeat_timeout, refresh_interval=registry_refresh)
+        self.worker_sweeper = None
+        weights, cost_unit, prefetch, poll_interval = load_scheduler_config()
+        self.scheduler = FairScheduler(registry=self.worker_registry, weights=weights, cost_unit=cost_unit,
+                                       prefetch=prefetch, poll_interval=poll_interval, info_ttl=cache_ttl)
+        self.scheduler.on_dispatch = self.record_dispatch
+        self.scheduler.log = self.log_to_file
+        self.dispatcher = None
         self.running = False
         self.app_runner = None
         self.julia_server = None
         self.shutdown_event = asyncio.Event()
-        self.log_lock = asyncio.Lock()
+        log_path, log_level, log_queue_size, log_max_bytes, log_backup_count = load_log_config()
+        # Only the control owner rotates, so several processes never rename the file at once
+        self.log_sink = AsyncLogSink(
+            path=log_path,
+            level=log_level,
+            max_queue=log_queue_size,
+            max_bytes=log_max_bytes if control_owner else 0,
+            backup_count=log_backup_count,
+        )
         self.connected_websockets = set()
+        self.result_router = ResultRouter()
+        self.stream_results = StreamResultReader()
+        self.task_format = load_task_format()
+        self.local_solver_mode, self.local_solver_max_pixels, solver_workers = load_local_solver_config()
+        self.solver_executor = ThreadPoolExecutor(max_workers=solver_workers, thread_name_prefix='cnn-solver')
+        self.local_tasks = {}
+        self.local_results = {}  # task_id -> cache key of a finished in-process task, kept without Redis
+        self.preview_max_pixels, self.preview_max_pending = load_progressive_config()
+        self.previews_pending = 0
+        self.single_flight_ttl = load_single_flight_config()
+        self.previews = {}  # task_id -> preview frame, kept for clients that connect after it was solved
+        (self.tile_size, self.tile_halo_per_time, self.tile_dir, self.tile_max_pixels,
+         self.tile_decode_max_pixels, self.tile_timeout) = load_tiling_config()
+        self.tiled_jobs = {}
+        self.batch_max_images = load_batch_config()
+        self.upload_max_bytes = load_upload_config()
+        self.ingest_pool = IngestPool(*load_ingest_config())
+        max_backlog, client_rate, client_burst, max_retry_after = load_admission_config()
+        self.admission = AdmissionController(ingest_pool=self.ingest_pool, max_backlog=max_backlog,
+                                             client_rate=client_rate, client_burst=client_burst,
+                                             max_retry_after=max_retry_after)
+        self.frame_stream_maxlen, self.frame_stream_ttl = load_frame_stream_config()
+        self.frame_dedup_threshold, self.frame_dedup_size = load_frame_dedup_config()
+        progress_rate = load_progress_config()
+        self.progress_interval = 1.0 / progress_rate if progress_rate > 0 else 0.0
+
+        # Per-process metrics exposed on /metrics
+        self.metrics = MetricsRegistry()
+        self.request_latency = self.metrics.histogram(
+            'cnn_http_request_duration_seconds', 'HTTP and WebSocket handler latency per route', ('route', 'method'))
+        self.requests_total = self.metrics.counter(
+            'cnn_http_requests_total', 'Handled requests per route and status', ('route', 'method', 'status'))
+        self.redis_rtt = self.metrics.histogram(
+            'cnn_redis_command_duration_seconds', 'Redis round trip time per operation', ('operation',))
+        self.queue_length = self.metrics.gauge(
+            'cnn_queue_length', 'Entries waiting in a Redis work queue', ('queue',))
+        self.websocket_connections = self.metrics.gauge(
+            'cnn_websocket_connections', 'Currently connected WebSockets')
+        self.ingest_pending = self.metrics.gauge(
+            'cnn_ingest_pending_jobs', 'Jobs queued or running on the ingest pool')
+        self.admission_rejections = self.metrics.counter(
+            'cnn_admission_rejections_total', 'Requests refused with 429 per reason', ('reason',))
+        self.task_duration = self.metrics.histogram(
+            'cnn_task_duration_seconds', 'Submission to result time per mode and backend', ('mode', 'backend'))
+        self.stream_frames = self.metrics.counter(
+            'cnn_stream_frames_total', 'Video frames received per admission outcome', ('outcome',))
+        self.progress_messages = self.metrics.counter(
+            'cnn_progress_messages_total', 'Solver progress messages relayed or coalesced away', ('outcome',))
+        self.workers_alive = self.metrics.gauge(
+            'cnn_workers_alive', 'Julia workers with a recent heartbeat')
+        self.worker_evictions = self.metrics.counter(
+            'cnn_worker_evictions_total', 'Workers evicted for missed heartbeats or a closed connection')
+        self.tasks_requeued = self.metrics.counter(
+            'cnn_tasks_requeued_total', 'Tasks moved back to the shared queue from an evicted worker')
+        self.tasks_dispatched = self.metrics.counter(
+            'cnn_tasks_dispatched_total', 'Tasks moved from client sub-queues to worker queues', ('priority',))
+        self.schedule_wait = self.metrics.histogram(
+            'cnn_schedule_wait_seconds', 'Time a task waited in its client sub-queue', ('priority',))
+        self.tasks_coalesced = self.metrics.counter(
+            'cnn_tasks_coalesced_total', 'Submissions attached to an identical in-flight task')
 
     async def handle_index(self, request):
         client_ip = request.remote
@@ -43,31 +159,71 @@ class AsyncServer:
         
     async def start(self):
         self.running = True
-        await self.clear_log_file()
+        if self.clear_log:
+            await self.clear_log_file()
+        self.log_sink.start()
         
         try:
-            self.redis_client = await redis.Redis(host=self.redis_host, port=self.redis_port)
+            max_connections, pool_timeout, health_check_interval = load_redis_pool_config()
+            # Blocking pool: callers wait for a free connection instead of opening unbounded new ones
+            self.redis_pool = redis.BlockingConnectionPool(
+                host=self.redis_host,
+                port=self.redis_port,
+                max_connections=max_connections,
+                timeout=pool_timeout,
+                health_check_interval=health_check_interval,
+            )
+            self.redis_client = await redis.Redis(connection_pool=self.redis_pool)
             await self.redis_client.ping()
+            self.results_cache.redis_client = self.redis_client
+            self.result_router.redis_client = self.redis_client
+            self.stream_results.redis_client = self.redis_client
+            self.worker_registry.redis_client = self.redis_client
+            self.scheduler.redis_client = self.redis_client
+            self.admission.redis_client = self.redis_client
             await self.log_to_file(f"Connected to Redis at {self.redis_host}:{self.redis_port}")
         except redis.ConnectionError:
-            await self.log_to_file(f"Failed to connect to Redis at {self.redis_host}:{self.redis_port}. Using in-memory queue.")
+            await self.log_to_file(f"Failed to connect to Redis at {self.redis_host}:{self.redis_port}. Solving tasks in-process.")
             self.redis_client = None
+            if self.redis_pool is not None:
+                await self.redis_pool.disconnect()
+                self.redis_pool = None
+        await self.result_router.start()
+        await self.stream_results.start()
 
-        app = web.Application(client_max_size=10 * 1024 * 1024)
+        app = web.Application(client_max_size=10 * 1024 * 1024, middlewares=[self.metrics_middleware])
         app.router.add_static('/assets', path=dist_path / 'assets', name='assets')
         app.add_routes([
             web.post('/offer', self.handle_offer),
             web.post('/tasks', self.handle_request),
+            web.post('/tasks/batch', self.handle_batch_request),
+            web.post('/tasks/upload', self.handle_upload_request),
+            web.post('/tasks/tiled', self.handle_tiled_request),
+            web.get('/tasks/{task_id}/tiled', self.handle_tiled_result),
+            web.get('/tasks/{task_id}', self.handle_task_status),
+            web.get('/tasks/{task_id}/result', self.handle_task_result),
             web.post('/api/sparam', self.save_parameters),
+            web.get('/ws/stream/{stream_id}', self.stream_websocket_handler),
             web.get('/ws/{task_id}', self.websocket_handler),  
+            web.get('/metrics', self.handle_metrics),
             web.get('/', self.handle_index)          
         ])        
         self.app_runner = web.AppRunner(app)
 
         await self.app_runner.setup()
-        site = web.TCPSite(self.app_runner, self.host, self.port)       
+        site = web.TCPSite(self.app_runner, self.host, self.port, reuse_port=self.reuse_port or None)
         await site.start()
-        await self.log_to_file(f"Async HTTP server started on {self.host}:{self.port}")
+        await self.log_to_file(f"Async HTTP server started on {self.host}:{self.port} (pid {os.getpid()})")
+
+        if not self.control_owner:
+            return
+
+        if self.redis_client is not None:
+            # Tasks leave the client sub-queues only through the dispatcher, so it runs
+            # even without the control socket; workers then drain the shared queue
+            self.worker_sweeper = asyncio.create_task(self.sweep_workers())
+            # A single dispatcher keeps the round robin state consistent across front-ends
+            self.dispatcher = asyncio.create_task(self.scheduler.run())
 
         try:
             self.julia_server = await asyncio.start_server(
@@ -75,10 +231,9 @@ class AsyncServer:
             )
             await self.log_to_file(f"Julia socket server started on {self.host}:{self.julia_port}")
         except Exception as e:
-            await self.log_to_file(f"Failed to start Julia socket server on {self.host}:{self.julia_port}: {e}")
-            return
+            await self.log_to_file(f"Failed to start Julia socket server on {self.host}:{self.julia_port}: {e}", 'ERROR')
 
-     async def save_parameters(self, request):
+    async def save_parameters(self, request):
         try:
             json_data = await request.json()
         except Exception as e:
@@ -135,11 +290,461 @@ class AsyncServer:
         handler = ClientHandler(self, request, task_id)
         return await handler.handle_websocket()
 
+    async def stream_websocket_handler(self, request):
+        """
+        Video stream WebSocket announced by POST /offer.
+
+        The mode comes from the stream's configuration unless the query string
+        overrides it; fps, dedup_threshold, dynamic_frame_skipping and
+        threshold_ms may be given in the query string too.
+        """
+        if self.redis_client is None:
+            return web.Response(status=503, text='Streaming needs Redis')
+        stream_id = request.match_info['stream_id']
+        data = dict(request.query, stream_id=stream_id)
+        if not data.get('mode'):
+            stream_config = await self.redis_client.get(f'stream:config:{stream_id}')
+            if stream_config is None:
+                return web.Response(status=404, text='Unknown stream')
+            data['mode'] = json.loads(stream_config).get('mode')
+        if load_parameters_for_mode(data['mode']) is None:
+            return web.Response(status=400, text='Parameters for mode not found')
+        data['dynamic_frame_skipping'] = data.get('dynamic_frame_skipping', '').lower() in ('1', 'true', 'yes')
+        try:
+            for name, convert in (('fps', int), ('threshold_ms', float), ('dedup_threshold', float)):
+                if name in data:
+                    data[name] = convert(data[name])
+        except ValueError:
+            return web.Response(status=400, text=f'{name} must be a number')
+        handler = ClientHandler(self, request, stream_id)
+        return await handler.handle_offer_ws(str(request.url), None, data)
+
     async def handle_offer(self, request):
         data = await request.json()
         handler = ClientHandler(self, request, None)
         return await handler.handle_offer_http(data)
 
+    def should_solve_locally(self, image):
+        """Decide whether a task skips the Redis queue and runs on the NumPy solver."""
+        if self.local_solver_mode == 'off':
+            return False
+        if self.redis_client is None:
+            return True
+        return self.local_solver_mode == 'small' and image.size <= self.local_solver_max_pixels
+
+    def submit_local_task(self, task_id, image, params, cache_key=None, mode=None):
+        """Run the NumPy solver in the executor and keep the future until the client claims it."""
+        future = asyncio.ensure_future(self._solve_local(task_id, image, params, cache_key, mode))
+        self._track_local_task(task_id, future)
+        return future
+
+    @property
+    def preview_capacity(self):
+        """Whether another preview may be queued on the local solver."""
+        return self.previews_pending < self.preview_max_pending
+
+    def submit_preview(self, task_id, preview, params, level):
+        """
+        Solve a progressive task's downscaled preview in-process and send it ahead of the full result.
+
+        Returns:
+            The solve's future, or None when preview_max_pending previews are already waiting
+        """
+        if not self.preview_capacity:
+            return None
+        self.previews_pending += 1
+        return asyncio.ensure_future(self._solve_preview(task_id, preview, params, level))
+
+    async def _solve_preview(self, task_id, preview, params, level):
+        loop = asyncio.get_running_loop()
+        try:
+            png = await loop.run_in_executor(self.solver_executor, cnn_solver.solve_to_png, preview, params)
+        except Exception as e:
+            await self.log_to_file(f"Preview of task {task_id} failed: {e}", 'WARNING')
+            return
+        finally:
+            self.previews_pending -= 1
+        frame = encode_result_frame(task_id, png, level=level)
+        # Local sockets get the preview now, or from previews once they connect; other front-ends via Redis
+        if not await self.result_router.deliver(task_id, frame):
+            self.previews[task_id] = frame
+            loop.call_later(LOCAL_RESULT_TTL, self.previews.pop, task_id, None)
+        with suppress(Exception):
+            await self.result_router.publish(task_id, frame, local=False)
+
+    def publish_local_result(self, task_id, png, cache_key=None):
+        """Make an already known result (e.g. a cache hit) claimable on /ws/{task_id}."""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(encode_result_frame(task_id, png))
+        self._track_local_task(task_id, future)
+        self._remember_local_result(task_id, cache_key)
+        return future
+
+    def _remember_local_result(self, task_id, cache_key):
+        """Without Redis, keep where a finished task's result is cached for GET /tasks/{id}."""
+        if self.redis_client is not None or cache_key is None:
+            return
+        self.local_results[task_id] = cache_key
+        asyncio.get_running_loop().call_later(self.results_cache.ttl, self.local_results.pop, task_id, None)
+
+    def _track_local_task(self, task_id, future):
+        self.local_tasks[task_id] = future
+        asyncio.get_running_loop().call_later(LOCAL_RESULT_TTL, self.local_tasks.pop, task_id, None)
+
+    async def _solve_local(self, task_id, image, params, cache_key, mode):
+        loop = asyncio.get_running_loop()
+        with suppress(Exception):
+            started_at = time.time()
+            await self.update_task_info(task_id, mode=mode or 'unknown', submitted_at=started_at, started_at=started_at)
+        with self.task_duration.time(mode=mode or 'unknown', backend='local'):
+            png = await loop.run_in_executor(self.solver_executor, cnn_solver.solve_to_png, image, params)
+        frame = encode_result_frame(task_id, png)
+        if cache_key is not None:
+            await self.results_cache.put(cache_key, png)
+            self._remember_local_result(task_id, cache_key)
+        with suppress(Exception):
+            await self.update_task_info(task_id, finished_at=time.time(), cache_key=cache_key)
+        # A client whose socket landed on another front-end gets the result through the router;
+        # a local client claims the future from local_tasks instead
+        with suppress(Exception):
+            await self.result_router.publish(task_id, frame, local=False)
+        return frame
+
+    def queue_task_info(self, pipe, task_id, mode):
+        """Record when and under which mode a queued task was submitted."""
+        key = TASK_INFO_KEY.format(task_id)
+        pipe.hset(key, mapping={'mode': mode or 'unknown', 'submitted_at': time.time()})
+        pipe.expire(key, self.results_cache.ttl)
+
+    async def observe_task_completion(self, task_id, cache_key=None):
+        """
+        Mark a queued task done and feed its end-to-end duration into the per-mode histogram.
+
+        Args:
+            task_id: Task whose result arrived
+            cache_key: ResultCache key the result was stored under, served by GET /tasks/{id}/result
+        """
+        if self.redis_client is None:
+            return
+        key = TASK_INFO_KEY.format(task_id)
+        finished_at = time.time()
+        with self.redis_rtt.time(operation='task_info'):
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hmget(key, 'mode', 'submitted_at')
+                self.queue_task_fields(pipe, task_id, finished_at=finished_at, cache_key=cache_key)
+                if cache_key is not None:
+                    # The result is cached by now, so later duplicates hit the cache instead
+                    self.results_cache.queue_release(pipe, cache_key)
+                (mode, submitted_at), *_ = await pipe.execute()
+        if submitted_at is None:
+            return
+        self.task_duration.observe(finished_at - float(submitted_at), mode=mode.decode(), backend='worker')
+
+    async def fail_task(self, task_id, error):
+        """
+        Mark a queued task failed and drop its single-flight claim.
+
+        Duplicates attached to the task got the worker's error along with its
+        other subscribers; ones connecting later read it from the task info,
+        and new submissions of the same input are queued afresh.
+        """
+        if self.redis_client is None:
+            return
+        if await self.redis_client.hexists(TASK_INFO_KEY.format(task_id), 'finished_at'):
+            # An error after the result, e.g. the worker's WebSocket failing to close
+            return
+        cache_key = await self.results_cache.take_task_key(task_id)
+        with self.redis_rtt.time(operation='task_info'):
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                self.queue_task_fields(pipe, task_id, failed_at=time.time(), error=error)
+                if cache_key is not None:
+                    self.results_cache.queue_release(pipe, cache_key)
+                await pipe.execute()
+
+    def queue_task_fields(self, pipe, task_id, **fields):
+        """Add the commands that set fields of a task's info hash (None values are skipped) to a pipeline."""
+        key = TASK_INFO_KEY.format(task_id)
+        pipe.hset(key, mapping={name: value for name, value in fields.items() if value is not None})
+        pipe.expire(key, self.results_cache.ttl)
+
+    async def update_task_info(self, task_id, **fields):
+        if self.redis_client is None:
+            return
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            self.queue_task_fields(pipe, task_id, **fields)
+            await pipe.execute()
+
+    async def mark_tasks_started(self, task_ids):
+        """Record when workers started the given tasks; later reports keep the first time."""
+        if not task_ids or self.redis_client is None:
+            return
+        started_at = time.time()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for task_id in task_ids:
+                key = TASK_INFO_KEY.format(task_id)
+                pipe.hsetnx(key, 'started_at', started_at)
+                pipe.expire(key, self.results_cache.ttl)
+            await pipe.execute()
+
+    async def task_status(self, task_id):
+        """
+        Collect what is known about a task.
+
+        Returns:
+            dict with at least task_id and state ('queued', 'running', 'done', 'failed' or,
+            for tiled tasks, 'receiving', 'solving'), or None for an unknown task
+        """
+        job = self.tiled_jobs.get(task_id)
+        if job is not None:
+            return dict(job.status(), result_url=f'/tasks/{task_id}/tiled')
+
+        info = {}
+        if self.redis_client is not None:
+            with self.redis_rtt.time(operation='task_info'):
+                info = await self.redis_client.hgetall(TASK_INFO_KEY.format(task_id))
+            info = {name.decode(): value.decode() for name, value in info.items()}
+        if not info:
+            # Solved in-process without Redis: the future until a WebSocket claims it, then the cached result
+            local_task = self.local_tasks.get(task_id)
+            if local_task is not None and not local_task.done():
+                return {'task_id': task_id, 'state': 'running'}
+            cache_key = self.local_results.get(task_id)
+            if cache_key is not None:
+                return {'task_id': task_id, 'state': 'done', 'cache_key': cache_key,
+                        'result_url': f'/tasks/{task_id}/result'}
+            if local_task is None:
+                return None
+            return {'task_id': task_id, 'state': 'done'}
+
+        if 'tiled' in info:
+            return dict(json.loads(info['tiled']), result_url=f'/tasks/{task_id}/tiled')
+
+        status = {'task_id': task_id, 'mode': info.get('mode')}
+        for name in ('submitted_at', 'dispatched_at', 'started_at', 'finished_at', 'failed_at'):
+            if name in info:
+                status[name] = float(info[name])
+        if 'failed_at' in info:
+            status['state'] = 'failed'
+            status['error'] = info.get('error')
+        elif 'finished_at' in info:
+            status['state'] = 'done'
+            if 'cache_key' in info:
+                status['cache_key'] = info['cache_key']
+                status['result_url'] = f'/tasks/{task_id}/result'
+        elif 'started_at' in info:
+            status['state'] = 'running'
+        else:
+            status['state'] = 'queued'
+            status['queue'] = 'worker' if 'dispatched_at' in info else 'client'
+            if 'queue' in info:
+                # Tasks ahead of it: in the client's own sub-queue before dispatch, in the worker queue after
+                status['position'] = await self.redis_client.lpos(info['queue'], info['entry'])
+        return status
+
+    async def handle_task_status(self, request):
+        status = await self.task_status(request.match_info['task_id'])
+        if status is None:
+            return web.Response(status=404, text='Unknown task')
+        status.pop('cache_key', None)
+        return web.json_response(status, headers={'Cache-Control': 'no-store'})
+
+    async def handle_task_result(self, request):
+        """
+        Serve a finished task's PNG from the result cache.
+
+        The ETag is the result's cache key, i.e. the hash of the input pixels
+        and template, so it changes exactly when the result would. Clients
+        polling with If-None-Match get 304 without the image; unfinished
+        tasks answer 202 with their status.
+        """
+        task_id = request.match_info['task_id']
+        status = await self.task_status(task_id)
+        if status is None:
+            return web.Response(status=404, text='Unknown task')
+        if status['state'] not in ('done', 'failed'):
+            return web.json_response(status, status=202, headers={'Cache-Control': 'no-store'})
+        if 'tiles_total' in status:
+            raise web.HTTPSeeOther(status['result_url'])
+        if status['state'] == 'failed':
+            status.pop('cache_key', None)
+            return web.json_response(status, status=500, headers={'Cache-Control': 'no-store'})
+
+        cache_key = status.get('cache_key')
+        if cache_key is None:
+            local_task = self.local_tasks.get(task_id)
+            if local_task is None or not local_task.done() or local_task.exception() is not None:
+                return web.Response(status=404, text='Task result is not stored')
+            png = result_frame_payload(local_task.result())
+        else:
+            headers = {'ETag': f'"{cache_key}"', 'Cache-Control': 'private, no-cache'}
+            # A result that expired from the cache must not be confirmed with a 304
+            if any(etag.value in (cache_key, '*') for etag in request.if_none_match or ()):
+                if not await self.results_cache.contains(cache_key):
+                    return web.Response(status=410, text='Task result expired')
+                return web.Response(status=304, headers=headers)
+            png = await self.results_cache.get(cache_key)
+            if png is None:
+                return web.Response(status=410, text='Task result expired')
+
+        response = web.Response(body=png, content_type='image/png')
+        if cache_key is not None:
+            response.headers.update(headers)
+        return response
+
+    def create_tiled_job(self, job_id, shape, params, mode):
+        """Create the work directory and memory-mapped input of a tiled task."""
+        workdir = os.path.join(self.tile_dir, job_id)
+        os.makedirs(workdir)
+        job = TiledJob(self, job_id, workdir, shape, params, mode, self.tile_size,
+                       halo_width(params, self.tile_halo_per_time),
+                       lambda tile_id: task_websocket_urls(tile_id)[0])
+        self.tiled_jobs[job_id] = job
+        return job
+
+    def expire_tiled_job(self, job_id):
+        """Keep a finished tiled job's result or error as long as cached results, then delete it."""
+        asyncio.get_running_loop().call_later(
+            self.results_cache.ttl, lambda: asyncio.ensure_future(self.discard_tiled_job(job_id)))
+
+    async def discard_tiled_job(self, job_id):
+        job = self.tiled_jobs.pop(job_id, None)
+        if job is not None:
+            await job.close()
+
+    async def save_tiled_status(self, job_id, status):
+        key = TASK_INFO_KEY.format(job_id)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping={'tiled': json.dumps(status)})
+            pipe.expire(key, self.results_cache.ttl)
+            await pipe.execute()
+
+    async def sweep_workers(self):
+        """Periodically evict workers that stopped sending heartbeats (control owner only)."""
+        while self.running:
+            await asyncio.sleep(self.worker_registry.heartbeat_timeout / 3)
+            try:
+                for worker_id, requeued in (await self.worker_registry.sweep()).items():
+                    await self.record_eviction(worker_id, requeued, 'missed heartbeats')
+            except Exception as e:
+                await self.log_to_file(f"Worker sweep failed: {e}", 'WARNING')
+
+    def record_dispatch(self, priority, waited):
+        self.tasks_dispatched.inc(priority=priority)
+        self.schedule_wait.observe(waited, priority=priority)
+
+    async def record_eviction(self, worker_id, requeued, reason):
+        self.worker_evictions.inc()
+        self.tasks_requeued.inc(len(requeued))
+        await self.log_to_file(f"Evicted Julia worker {worker_id} ({reason}), requeued {len(requeued)} tasks", 'WARNING')
+        await self.release_requeued(worker_id, requeued)
+
+    async def release_requeued(self, worker_id, task_ids):
+        """
+        Drop the single-flight claims of tasks requeued from an evicted worker and tell their clients.
+
+        The tasks run again on another worker, but one of them may be what
+        brought the worker down, so new submissions of the same input no
+        longer attach to them.
+        """
+        if not task_ids:
+            return
+        cache_keys = await self.results_cache.task_keys(task_ids)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for cache_key in cache_keys:
+                if cache_key is not None:
+                    self.results_cache.queue_release(pipe, cache_key)
+            await pipe.execute()
+        for task_id in task_ids:
+            await self.publish_status(task_id, f"Worker {worker_id} was lost, task requeued")
+
+    async def publish_status(self, task_id, message, exclude=None):
+        """Route a worker status text to the clients of task_id as a JSON status message."""
+        await self.result_router.publish(task_id, json.dumps({
+            "type": "status",
+            "message": message  # e.g., "WebSocket connection established!"
+        }), exclude=exclude)
+
+    async def deliver_result_frame(self, task_id, frame, exclude=None):
+        """Forward a worker's result frame untouched, then cache its PNG and record the task's duration."""
+        await self.result_router.publish(task_id, frame, exclude=exclude)
+        cache_key = await self.results_cache.take_task_key(task_id)
+        if cache_key is not None:
+            await self.results_cache.put(cache_key, result_frame_payload(frame))
+        await self.observe_task_completion(task_id, cache_key)
+
+    async def close_progress(self, coalescer):
+        await coalescer.close()
+        self.progress_messages.inc(coalescer.sent, outcome='relayed')
+        self.progress_messages.inc(coalescer.coalesced, outcome='coalesced')
+
+    async def admit(self, request, cost=1):
+        """
+        Admission control run before a task request's body is read.
+
+        Args:
+            cost: Client tokens the request takes; 0 only checks that the client is not in debt
+
+        Returns:
+            None when the request may proceed, else a 429 response with Retry-After
+        """
+        if not self.rate_limiter.has_capacity():
+            rejection = ('rate', 1)
+        else:
+            rejection = await self.admission.check(client_identity(request), cost)
+        if rejection is None:
+            # Has capacity, so this returns at once instead of queueing the request
+            await self.rate_limiter.acquire()
+            return None
+        return self.reject(*rejection)
+
+    def reject(self, reason, retry_after):
+        self.admission_rejections.inc(reason=reason)
+        return web.Response(
+            status=429,
+            text=f'Too many requests ({reason}), retry later',
+            headers={'Retry-After': str(retry_after)},
+        )
+
+    @web.middleware
+    async def metrics_middleware(self, request, handler):
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else 'unmatched'
+        status = 500
+        start = time.perf_counter()
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            self.request_latency.observe(time.perf_counter() - start, route=route, method=request.method)
+            self.requests_total.inc(route=route, method=request.method, status=status)
+
+    async def handle_metrics(self, request):
+        self.websocket_connections.set(len(self.connected_websockets))
+        self.ingest_pending.set(self.ingest_pool.pending)
+        if self.redis_client is not None:
+            try:
+                with self.redis_rtt.time(operation='queue_length'):
+                    async with self.redis_client.pipeline(transaction=False) as pipe:
+                        pipe.llen('queue:task_queue')
+                        pipe.llen('queue:stream_queue')
+                        task_queue, stream_queue = await pipe.execute()
+                self.queue_length.set(task_queue, queue='queue:task_queue')
+                self.queue_length.set(stream_queue, queue='queue:stream_queue')
+                await self.worker_registry.refresh()
+                self.workers_alive.set(len(self.worker_registry.workers))
+                for worker_id, worker in self.worker_registry.workers.items():
+                    self.queue_length.set(worker['queued'], queue=self.worker_registry.queue_key(worker_id))
+            except Exception as e:
+                await self.log_to_file(f"Failed to read queue lengths for metrics: {e}", 'WARNING')
+        return web.Response(
+            body=self.metrics.render().encode(),
+            headers={'Content-Type': f'{self.metrics.content_type}; charset=utf-8'},
+        )
+
     async def notify_websockets(self, message):
         for ws in self.connected_websockets:
             try:
@@ -148,26 +753,17 @@ class AsyncServer:
                 print(f"Error sending message to websocket: {e}")
 
     async def clear_log_file(self):
-        log_file_path = "server_logs.txt"
-        async with self.log_lock:
-            try:
-                with open(log_file_path, "w") as log_file:
-                    log_file.write("")
-            except Exception as e:
-                await self.log_to_file(f"An error occurred while clearing the log file {e}")
+        try:
+            await self.log_sink.clear()
+        except Exception as e:
+            await self.log_to_file(f"An error occurred while clearing the log file {e}")
 
-    async def log_to_file(self, message):
+    async def log_to_file(self, message, level='INFO'):
         if not message:
             raise ValueError("message is null or empty")
 
-        log_file_path = "server_logs.txt"
-        async with self.log_lock:
-            try:
-                with open(log_file_path, "a") as log_file:
-                    timestamp = datetime.datetime.now().isoformat()
-                    log_file.write(f"{timestamp} - {message}\n")
-            except Exception as e:
-                await self.log_to_file(f"An error occurred while logging to {log_file_path}: {e}")
+        # Only queues the record; the sink's background task does the file I/O
+        self.log_sink.log(message, level)
 
     async def shutdown(self):
         """Shutdown the server gracefully"""
@@ -175,6 +771,12 @@ class AsyncServer:
         self.running = False
         
         try:
+            for task in (self.worker_sweeper, self.dispatcher):
+                if task is not None:
+                    task.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await task
+
             if self.julia_clients:
                 for writer in list(self.julia_clients):
                     with suppress(Exception):
@@ -182,9 +784,22 @@ class AsyncServer:
                         await writer.wait_closed()
                 self.julia_clients.clear()
 
+            for job_id in list(self.tiled_jobs):
+                await self.discard_tiled_job(job_id)
+
+            await self.result_router.close()
+            await self.stream_results.close()
+
             if self.redis_client:
                 with suppress(Exception):
                     await self.redis_client.close()
+                with suppress(Exception):
+                    await self.redis_pool.disconnect()
+
+            self.solver_executor.shutdown(wait=False, cancel_futures=True)
+            self.ingest_pool.shutdown()
+            self.local_tasks.clear()
+            self.local_results.clear()
 
             if self.julia_server:
                 with suppress(Exception):
@@ -204,19 +819,31 @@ class AsyncServer:
             await self.log_to_file(f"Error during server shutdown: {e}")
         finally:
             await self.log_to_file(f"Server on {self.host}:{self.port} shut down complete")
+            await self.log_sink.close()
 
-    async def handle_request(self, request):
-        await self.rate_limiter.acquire()
+    def busy_response(self):
+        """503 returned when the ingest pool has no room for more work."""
+        return web.Response(
+            status=503,
+            text='Server busy, retry later',
+            headers={'Retry-After': '1'},
+        )
 
+    async def handle_request(self, request):
         if request.method == 'POST':
             try:
+                rejected = await self.admit(request)
+                if rejected is not None:
+                    return rejected
+
                 if request.content_type != 'application/json':
                     return web.Response(
                         status=415,
                         text='Invalid content type',
                     )
 
-                data = await request.json()
+                # Parse the (possibly multi-megabyte) body on the ingest pool
+                data = await self.ingest_pool.run(json.loads, await request.read())
                 if data is None:
                     raise ValueError("Request body is null or empty")
 
@@ -229,12 +856,117 @@ class AsyncServer:
                     status=400,
                     text='Invalid JSON format',
                 )
+            except IngestPoolFull:
+                return self.busy_response()
             except Exception as e:
                 return web.Response(
                     status=500,
                     text=f'Server error: {str(e)}',
                 )
 
+    async def handle_batch_request(self, request):
+        try:
+            # One limiter slot for the whole batch; client tokens are charged per image once it is parsed
+            rejected = await self.admit(request, cost=0)
+            if rejected is not None:
+                return rejected
+
+            if request.content_type != 'application/json':
+                return web.Response(
+                    status=415,
+                    text='Invalid content type',
+                )
+
+            data = await self.ingest_pool.run(json.loads, await request.read())
+            if data is None:
+                raise ValueError("Request body is null or empty")
+
+            images = data.get('images') if isinstance(data, dict) else None
+            if isinstance(images, list) and images:
+                rejection = self.admission.charge(client_identity(request), min(len(images), self.batch_max_images))
+                if rejection is not None:
+                    return self.reject(*rejection)
+
+            client_handler = ClientHandler(self, request, None)
+            return await client_handler.handle_batch(data)
+
+        except json.JSONDecodeError:
+            return web.Response(
+                status=400,
+                text='Invalid JSON format',
+            )
+        except IngestPoolFull:
+            return self.busy_response()
+        except Exception as e:
+            return web.Response(
+                status=500,
+                text=f'Server error: {str(e)}',
+            )
+
+    async def handle_upload_request(self, request):
+        try:
+            rejected = await self.admit(request)
+            if rejected is not None:
+                return rejected
+
+            task_id = str(uuid.uuid4())
+            client_handler = ClientHandler(self, request, task_id)
+            return await client_handler.handle_upload()
+
+        except IngestPoolFull:
+            return self.busy_response()
+        except Exception as e:
+            return web.Response(
+                status=500,
+                text=f'Server error: {str(e)}',
+            )
+
+    async def handle_tiled_request(self, request):
+        try:
+            rejected = await self.admit(request)
+            if rejected is not None:
+                return rejected
+
+            task_id = str(uuid.uuid4())
+            client_handler = ClientHandler(self, request, task_id)
+            return await client_handler.handle_tiled()
+
+        except IngestPoolFull:
+            return self.busy_response()
+        except Exception as e:
+            return web.Response(
+                status=500,
+                text=f'Server error: {str(e)}',
+            )
+
+    async def handle_tiled_result(self, request):
+        """Serve a tiled task's PNG once done, else its progress with 202."""
+        job_id = request.match_info['task_id']
+        try:
+            # Task ids are UUIDs; anything else must not reach the path below
+            uuid.UUID(job_id)
+        except ValueError:
+            return web.Response(status=404, text='Unknown tiled task')
+
+        result_path = os.path.join(self.tile_dir, job_id, 'result.png')
+        if os.path.exists(result_path):
+            return web.FileResponse(result_path, headers={'Content-Type': 'image/png'})
+
+        job = self.tiled_jobs.get(job_id)
+        saved = None
+        if job is None and self.redis_client is not None:
+            # The job may be running on another front-end
+            saved = await self.redis_client.hget(TASK_INFO_KEY.format(job_id), 'tiled')
+        if job is not None:
+            status = job.status()
+        elif saved is not None:
+            status = json.loads(saved)
+        else:
+            return web.Response(status=404, text='Unknown tiled task')
+        if status['state'] == 'failed':
+            return web.json_response(status, status=500)
+        return web.json_response(status, status=202)
+
     async def handle_julia_client(self, reader, writer):
         addr = writer.get_extra_info('peername')
         if addr is None:
@@ -245,8 +977,15 @@ class AsyncServer:
         
         try:
             self.julia_clients.add(writer)
+            # Framed workers open with the protocol preamble, anything else is the legacy text stream
+            framed, data = await read_preamble(reader)
+            if framed:
+                if data[len(CONTROL_PREAMBLE)] != CONTROL_VERSION:
+                    raise ProtocolError(f"Unsupported control protocol version {data[len(CONTROL_PREAMBLE)]}")
+                self.julia_workers[addr] = {'worker_id': None, 'last_seen': time.monotonic(), 'capacity': None}
+                await self.serve_control_connection(reader, writer, addr)
+                return
             while self.running:
-                data = await reader.read(1024)
                 if not data:
                     break
                 try:
@@ -259,12 +998,19 @@ class AsyncServer:
                 except Exception as e:
                     await self.log_to_file(f"Error processing message: {e}")
                     break
+                data = await reader.read(1024)
         except ConnectionResetError:
             await self.log_to_file(f"Julia connection from {addr} reset")
         except Exception as e:
             await self.log_to_file(f"Error handling Julia client: {e}")
         finally:
             self.julia_clients.discard(writer)
+            worker = self.julia_workers.pop(addr, None)
+            if worker is not None and worker['worker_id'] is not None and self.redis_client is not None:
+                # A worker whose connection dropped is gone; do not wait for its heartbeats to time out
+                with suppress(Exception):
+                    await self.record_eviction(
+                        worker['worker_id'], await self.worker_registry.evict(worker['worker_id']), 'connection closed')
             try:
                 writer.close()
                 await writer.wait_closed()
@@ -272,6 +1018,67 @@ class AsyncServer:
                 await self.log_to_file(f"Error cleaning up Julia client connection: {e}")
             await self.log_to_file(f"Julia connection from {addr} closed")
 
+    async def serve_control_connection(self, reader, writer, addr):
+        """
+        Handle the typed messages of a framed worker connection.
+
+        Progress and results are multiplexed over this one connection for
+        every task the worker runs, so they are routed by the task_id they
+        carry rather than by the socket they arrived on.
+        """
+        coalescers = {}
+        try:
+            while self.running:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                message_type, payload = message
+                self.julia_workers[addr]['last_seen'] = time.monotonic()
+
+                if message_type == MSG_LOG:
+                    await self.log_to_file(f"Received from Julia {addr}: {payload.decode(errors='replace')}")
+                elif message_type == MSG_PROGRESS:
+                    task_id, text = decode_progress(payload)
+                    if self.progress_interval > 0 and text.startswith(PROGRESS_PREFIX):
+                        coalescer = coalescers.get(task_id)
+                        if coalescer is None:
+                            if len(coalescers) >= 256:
+                                # Tasks that failed never send a result; forget their idle coalescers
+                                for stale in [key for key, value in coalescers.items() if value.idle]:
+                                    await self.close_progress(coalescers.pop(stale))
+                            coalescer = coalescers[task_id] = ProgressCoalescer(
+                                functools.partial(self.publish_status, task_id), self.progress_interval)
+                        await coalescer.offer(text)
+                    else:
+                        await self.publish_status(task_id, text)
+                        if text.startswith(ERROR_PREFIX):
+                            coalescer = coalescers.pop(task_id, None)
+                            if coalescer is not None:
+                                await self.close_progress(coalescer)
+                            await self.fail_task(task_id, text)
+                elif message_type == MSG_RESULT:
+                    task_id = read_result_header(payload)[0]
+                    coalescer = coalescers.pop(task_id, None)
+                    if coalescer is not None:
+                        await self.close_progress(coalescer)
+                    await self.deliver_result_frame(task_id, payload)
+                elif message_type == MSG_CAPACITY:
+                    worker = self.julia_workers[addr]
+                    capacity = worker['capacity'] = decode_capacity(payload)
+                    worker['worker_id'] = str(capacity.get('worker_id') or f"{addr[0]}:{addr[1]}")
+                    if self.redis_client is not None:
+                        await self.worker_registry.report(worker['worker_id'], capacity)
+                        # Workers report at every task start, which is when a task starts running
+                        await self.mark_tasks_started(capacity.get('in_flight') or [])
+                    await self.log_to_file(f"Julia worker {addr} capacity: {capacity}", 'DEBUG')
+                elif message_type == MSG_HEARTBEAT:
+                    worker_id = self.julia_workers[addr]['worker_id']
+                    if worker_id is not None and self.redis_client is not None:
+                        await self.worker_registry.heartbeat(worker_id)
+        finally:
+            for coalescer in coalescers.values():
+                await self.close_progress(coalescer)
+
     def process_julia_message(self, message):
         if message is None:
             raise ValueError("message cannot be null")
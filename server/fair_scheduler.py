@@ -0,0 +1,262 @@
+import asyncio
+import math
+import time
+from collections import deque
+from redis.exceptions import WatchError
+from server.worker_registry import SHARED_QUEUE
+
+PRIORITY_CLASSES = ('interactive', 'bulk')
+TASK_INFO_KEY = 'task:info:{}'
+
+
+class FairScheduler:
+    """
+    Per-client sub-queues drained into the worker queues by deficit round robin.
+
+    Front-ends append each task to queue:client:{priority}:{client_id} and
+    mark the client active. The control owner runs the dispatcher: when a
+    worker queue has room for another task, it picks a priority class by
+    smooth weighted round robin and, within the class, the next client by
+    deficit round robin with the task's pixel count as its cost. A client
+    submitting a thousand large images therefore gets its share of the
+    workers, not all of them, and interactive requests overtake bulk ones.
+    Worker queues are kept only prefetch deep so the choice is made late.
+    """
+
+    CLIENT_QUEUE = 'queue:client:{}:{}'
+    ACTIVE_KEY = 'queue:clients:{}'
+    BACKLOG_KEY = 'queue:backlog'  # tasks in all client sub-queues
+    DRAIN_RATE_KEY = 'queue:drain_rate'  # tasks dispatched per second while there was a backlog
+
+    def __init__(self, redis_client=None, registry=None, weights=None, cost_unit=65536, quantum=4,
+                 prefetch=1, shared_prefetch=4, poll_interval=0.05, info_ttl=3600):
+        self.redis_client = redis_client
+        self.registry = registry
+        self.weights = weights or {'interactive': 4, 'bulk': 1}
+        self.cost_unit = cost_unit
+        self.quantum = quantum
+        self.prefetch = prefetch
+        self.shared_prefetch = shared_prefetch
+        self.poll_interval = poll_interval
+        self.info_ttl = info_ttl
+        self.on_dispatch = None  # optional callback(priority, waited_seconds)
+        self.log = None  # optional coroutine function(message, level) dispatch errors are reported to
+        self._order = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._deficit = {}
+        self._heads = {}  # (priority, client_id) -> parsed head entry; only the dispatcher pops the sub-queues
+        self._credit = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.drain_rate = 0.0
+        self._window_start = time.monotonic()
+        self._window_dispatched = 0
+
+    @staticmethod
+    def normalize_priority(priority, default='interactive'):
+        priority = (priority or default).lower()
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITY_CLASSES)}")
+        return priority
+
+    def task_cost(self, pixels):
+        return max(1, math.ceil(pixels / self.cost_unit))
+
+    def queue_submit(self, pipe, task_id, client_id, priority, cost):
+        """
+        Add the commands that put a task on its client's sub-queue to a pipeline.
+
+        Args:
+            pipe: Redis pipeline the commands are appended to
+            task_id: Id of the stored task
+            client_id: Identity the fair share is computed for
+            priority: One of PRIORITY_CLASSES
+            cost: Scheduling cost from task_cost
+        """
+        queue_key = self.CLIENT_QUEUE.format(priority, client_id)
+        entry = f'{cost}|{time.time()}|{task_id}'
+        pipe.rpush(queue_key, entry)
+        pipe.sadd(self.ACTIVE_KEY.format(priority), client_id)
+        pipe.incr(self.BACKLOG_KEY)
+        # Where the task waits, so its queue position can be reported
+        pipe.hset(TASK_INFO_KEY.format(task_id), mapping={'queue': queue_key, 'entry': entry, 'priority': priority})
+
+    async def run(self):
+        while True:
+            try:
+                self._window_dispatched += await self.dispatch_once()
+                await self._publish_drain_rate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.log is None:
+                    print(f"Scheduler dispatch failed: {e}")
+                else:
+                    await self.log(f"Scheduler dispatch failed: {e}", 'ERROR')
+            await asyncio.sleep(self.poll_interval)
+
+    async def _publish_drain_rate(self, window=1.0, smoothing=0.3):
+        """Once per window, fold the dispatch rate into an EWMA and publish it for admission control."""
+        elapsed = time.monotonic() - self._window_start
+        if elapsed < window:
+            return
+        dispatched, self._window_dispatched = self._window_dispatched, 0
+        self._window_start = time.monotonic()
+        # Idle windows say nothing about how fast a backlog drains
+        if dispatched == 0 and int(await self.redis_client.get(self.BACKLOG_KEY) or 0) <= 0:
+            return
+        rate = dispatched / elapsed
+        self.drain_rate = rate if self.drain_rate == 0 else smoothing * rate + (1 - smoothing) * self.drain_rate
+        await self.redis_client.set(self.DRAIN_RATE_KEY, self.drain_rate, ex=max(10, int(10 * window)))
+
+    async def _room(self):
+        """Number of tasks the worker queues can take right now."""
+        await self.registry.refresh()
+        if not self.registry.workers:
+            return self.shared_prefetch - await self.redis_client.llen(SHARED_QUEUE)
+        return sum(
+            max(0, worker['slots'] + self.prefetch - worker['in_flight'] - worker['queued'])
+            for worker in self.registry.workers.values()
+        )
+
+    async def dispatch_once(self):
+        """
+        Move as many tasks from the client sub-queues as the worker queues have room for.
+
+        Returns:
+            Number of tasks dispatched
+        """
+        room = await self._room()
+        if room <= 0:
+            return 0
+        await self._sync_clients()
+
+        dispatched = 0
+        for _ in range(room):
+            # The room was counted on the same snapshot, so a worker queue is normally free
+            queue_key = await self.registry.choose_queue(self.prefetch) or SHARED_QUEUE
+            picked = await self._next_task(queue_key)
+            if picked is None:
+                break
+            priority, task_id, submitted_at = picked
+            dispatched += 1
+            if self.on_dispatch is not None:
+                self.on_dispatch(priority, time.time() - submitted_at)
+        return dispatched
+
+    async def _move(self, queue_key, target):
+        """
+        Move the head of a client sub-queue onto a worker queue in one transaction.
+
+        Popping, pushing and recording the task happen together, so a failed
+        command or a crash never loses a task that was already popped. WATCH
+        aborts the move if the sub-queue changed after its head was read,
+        e.g. because a task was withdrawn, so the task pushed is the one popped.
+
+        Returns:
+            (cost, submitted_at, task_id) of the moved task, or None if the sub-queue was empty or changed
+        """
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            await pipe.watch(queue_key)
+            entry = await pipe.lindex(queue_key, 0)
+            if entry is None:
+                return None
+            cost, submitted_at, task_id = self._parse_entry(entry)
+            info_key = TASK_INFO_KEY.format(task_id)
+            pipe.multi()
+            pipe.lpop(queue_key)
+            # RPUSH: workers BLPOP from the head, so dispatched tasks run in order
+            pipe.rpush(target, task_id)
+            pipe.hset(info_key, mapping={'queue': target, 'entry': task_id, 'dispatched_at': time.time()})
+            pipe.expire(info_key, self.info_ttl)
+            pipe.decr(self.BACKLOG_KEY)
+            try:
+                await pipe.execute()
+            except WatchError:
+                return None
+        return cost, submitted_at, task_id
+
+    async def _sync_clients(self):
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for priority in PRIORITY_CLASSES:
+                pipe.smembers(self.ACTIVE_KEY.format(priority))
+            members = await pipe.execute()
+        for priority, clients in zip(PRIORITY_CLASSES, members):
+            order = self._order[priority]
+            known = set(order)
+            for client_id in clients:
+                client_id = client_id.decode() if isinstance(client_id, bytes) else client_id
+                if client_id not in known:
+                    order.append(client_id)
+                    self._deficit[(priority, client_id)] = 0
+
+    def _pick_class(self):
+        """Smooth weighted round robin over the classes that have active clients."""
+        active = [priority for priority in PRIORITY_CLASSES if self._order[priority]]
+        if not active:
+            return None
+        total = sum(self.weights[priority] for priority in active)
+        for priority in active:
+            self._credit[priority] += self.weights[priority]
+        chosen = max(active, key=lambda priority: self._credit[priority])
+        self._credit[chosen] -= total
+        return chosen
+
+    async def _next_task(self, target):
+        while True:
+            priority = self._pick_class()
+            if priority is None:
+                return None
+            picked = await self._next_in_class(priority, target)
+            if picked is not None:
+                return (priority,) + picked
+
+    @staticmethod
+    def _parse_entry(entry):
+        cost, submitted_at, task_id = (entry.decode() if isinstance(entry, bytes) else entry).split('|', 2)
+        return int(cost), float(submitted_at), task_id
+
+    async def _next_in_class(self, priority, target):
+        """Deficit round robin over the class's clients, moving the chosen task to target; None once the class ran dry."""
+        order = self._order[priority]
+        while order:
+            client_id = order[0]
+            key = (priority, client_id)
+            queue_key = self.CLIENT_QUEUE.format(priority, client_id)
+            head = self._heads.get(key)
+            if head is None:
+                # Read once per dispatched task; the head only changes when it is popped here
+                entry = await self.redis_client.lindex(queue_key, 0)
+                if entry is None:
+                    order.popleft()
+                    self._deficit.pop(key, None)
+                    await self._retire(priority, client_id, queue_key)
+                    continue
+                head = self._heads[key] = self._parse_entry(entry)
+            cost = head[0]
+            if self._deficit[key] < cost:
+                if len(order) == 1:
+                    # No one else to give a turn to: add all the quanta the task needs at once
+                    self._deficit[key] += math.ceil((cost - self._deficit[key]) / self.quantum) * self.quantum
+                else:
+                    # Not enough credit yet: top it up and give the next client its turn
+                    self._deficit[key] += self.quantum
+                    order.rotate(-1)
+                    continue
+            del self._heads[key]
+            moved = await self._move(queue_key, target)
+            if moved is None:
+                # The sub-queue changed since the head was read; read it again
+                continue
+            # Normally the cached head; a withdrawn head is replaced by the task behind it
+            cost, submitted_at, task_id = moved
+            # The client keeps its turn while its credit covers its next task
+            self._deficit[key] -= cost
+            return task_id, submitted_at
+        return None
+
+    async def _retire(self, priority, client_id, queue_key):
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.srem(self.ACTIVE_KEY.format(priority), client_id)
+            pipe.llen(queue_key)
+            _, remaining = await pipe.execute()
+        if remaining:
+            # A task arrived between the empty read and the SREM; keep the client active
+            await self.redis_client.sadd(self.ACTIVE_KEY.format(priority), client_id)
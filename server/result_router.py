@@ -0,0 +1,118 @@
+import asyncio
+import uuid
+from contextlib import suppress
+
+TASK_CHANNEL = 'channel:task:{}'
+
+
+class ResultRouter:
+    """
+    Delivers task messages to the WebSockets subscribed to that task.
+
+    Each process keeps a table of task_id -> sockets and, when Redis is
+    available, subscribes one shared pub/sub connection to a channel per
+    task with local subscribers. A message is sent to the local sockets
+    directly and published once; other front-end processes relay it to
+    their own subscribers, skipping messages that originated locally.
+    """
+
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self.node_id = uuid.uuid4().hex.encode()
+        self.subscribers = {}
+        self.pubsub = None
+        self._subscribed = asyncio.Event()
+        self._listener = None
+
+    async def start(self):
+        if self.redis_client is not None and self._listener is None:
+            self.pubsub = self.redis_client.pubsub()
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+        if self.pubsub is not None:
+            with suppress(Exception):
+                await self.pubsub.aclose()
+            self.pubsub = None
+        self.subscribers.clear()
+
+    async def subscribe(self, task_id, ws):
+        sockets = self.subscribers.setdefault(task_id, set())
+        sockets.add(ws)
+        if len(sockets) == 1 and self.pubsub is not None:
+            await self.pubsub.subscribe(TASK_CHANNEL.format(task_id))
+            self._subscribed.set()
+
+    async def unsubscribe(self, task_id, ws):
+        sockets = self.subscribers.get(task_id)
+        if sockets is None:
+            return
+        sockets.discard(ws)
+        if sockets:
+            return
+        del self.subscribers[task_id]
+        if self.pubsub is not None:
+            with suppress(Exception):
+                await self.pubsub.unsubscribe(TASK_CHANNEL.format(task_id))
+
+    async def publish(self, task_id, message, exclude=None, local=True):
+        """
+        Route a message to every subscriber of task_id on any front-end.
+
+        Args:
+            task_id: Task the message belongs to
+            message: str for a text frame, bytes for a binary frame
+            exclude: Local socket that must not receive it (usually the sender)
+            local: Deliver to this process's subscribers as well as publishing
+        """
+        if local:
+            await self.deliver(task_id, message, exclude)
+        if self.redis_client is not None:
+            kind = b'b' if isinstance(message, bytes) else b't'
+            payload = message if isinstance(message, bytes) else message.encode()
+            await self.redis_client.publish(TASK_CHANNEL.format(task_id), self.node_id + kind + payload)
+
+    async def deliver(self, task_id, message, exclude=None):
+        """Send a message concurrently to this process's subscribers of task_id."""
+        sockets = [ws for ws in self.subscribers.get(task_id, ()) if ws is not exclude and not ws.closed]
+        if not sockets:
+            return 0
+        if isinstance(message, bytes):
+            sends = [ws.send_bytes(message) for ws in sockets]
+        else:
+            sends = [ws.send_str(message) for ws in sockets]
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error sending task {task_id} message to websocket: {result}")
+        return len(sockets)
+
+    async def _listen(self):
+        prefix = len(TASK_CHANNEL.format(''))
+        node_length = len(self.node_id)
+        while True:
+            if not self.pubsub.subscribed:
+                self._subscribed.clear()
+                await self._subscribed.wait()
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Result router lost its pub/sub connection: {e}")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message['type'] != 'message':
+                continue
+            data = message['data']
+            if data[:node_length] == self.node_id:
+                continue
+            channel = message['channel']
+            task_id = (channel.decode() if isinstance(channel, bytes) else channel)[prefix:]
+            kind, payload = data[node_length:node_length + 1], data[node_length + 1:]
+            await self.deliver(task_id, payload if kind == b'b' else payload.decode())
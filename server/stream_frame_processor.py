@@ -0,0 +1,77 @@
+import asyncio
+import cv2
+import numpy as np
+from contextlib import suppress
+import utils.cnn_solver as cnn_solver
+from utils.frame_stream import read_frames, read_latest_frame, append_result
+
+
+class StreamFrameProcessor:
+    """
+    Solves the frames of one video stream and appends the results to its result stream.
+
+    The processor waits for new frames with a blocking XREAD on a connection
+    of its own and then always solves the newest frame kept, so a stream
+    whose frames arrive faster than they can be solved skips the stale ones
+    instead of falling further behind. Each result is XADDed as PNG bytes
+    to stream:results:{stream_id}, where StreamResultReader picks it up.
+    """
+
+    def __init__(self, server, stream_id, params, block_ms=1000):
+        self.server = server
+        self.stream_id = stream_id
+        self.params = params
+        self.block_ms = block_ms
+        self.connection = None
+        self._runner = None
+
+    def start(self):
+        if self._runner is None:
+            self.connection = self.server.redis_client.client()
+            self._runner = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._runner
+            self._runner = None
+        if self.connection is not None:
+            with suppress(Exception):
+                await self.connection.aclose()
+            self.connection = None
+
+    @staticmethod
+    def solve_frame(frame, params):
+        """Decode an encoded frame as grayscale and solve it to PNG bytes."""
+        image = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError("Frame could not be decoded")
+        return cnn_solver.solve_to_png(image, params)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_id = '$'
+        while True:
+            try:
+                if not await read_frames(self.connection, self.stream_id, last_id, block_ms=self.block_ms):
+                    continue
+                latest = await read_latest_frame(self.connection, self.stream_id)
+                if latest is None:
+                    continue
+                last_id, fields = latest
+                png = await loop.run_in_executor(
+                    self.server.solver_executor, self.solve_frame, fields['frame'], self.params)
+                async with self.server.redis_client.pipeline(transaction=False) as pipe:
+                    append_result(
+                        pipe, self.stream_id, fields['frame_number'], png,
+                        self.server.frame_stream_maxlen, self.server.frame_stream_ttl
+                    )
+                    await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except ValueError as e:
+                await self.server.log_to_file(f"Skipping frame of stream {self.stream_id}: {e}", 'WARNING')
+            except Exception as e:
+                await self.server.log_to_file(f"Frame processing of stream {self.stream_id} failed: {e}", 'ERROR')
+                await asyncio.sleep(1)
@@ -0,0 +1,81 @@
+import asyncio
+from contextlib import suppress
+from utils.frame_stream import result_stream_key, read_results
+
+
+class StreamResultReader:
+    """
+    Reads the result streams of every video stream open in this process.
+
+    A single task issues one blocking XREAD over all registered result
+    streams on a connection of its own, so open streams neither hold a
+    pooled connection each nor starve the request handlers of the shared
+    pool. Entries are handed to the callback the stream registered with.
+    A stream registered while a read is blocked joins the next read, at
+    most block_ms later; it starts after the last result already stored,
+    so nothing written in between is missed.
+    """
+
+    def __init__(self, redis_client=None, block_ms=1000, count=16):
+        self.redis_client = redis_client
+        self.block_ms = block_ms
+        self.count = count
+        self.streams = {}  # stream_id -> [last_id, callback]
+        self.connection = None
+        self._registered = asyncio.Event()
+        self._reader = None
+
+    async def start(self):
+        if self.redis_client is not None and self._reader is None:
+            self.connection = self.redis_client.client()
+            self._reader = asyncio.create_task(self._read())
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+        if self.connection is not None:
+            with suppress(Exception):
+                await self.connection.aclose()
+            self.connection = None
+        self.streams.clear()
+
+    async def subscribe(self, stream_id, callback):
+        """
+        Args:
+            stream_id: Id of the video stream
+            callback: Coroutine function called with a list of (entry_id, fields) pairs
+        """
+        newest = await self.redis_client.xrevrange(result_stream_key(stream_id), count=1)
+        last_id = newest[0][0] if newest else '0-0'
+        self.streams[stream_id] = [last_id.decode() if isinstance(last_id, bytes) else last_id, callback]
+        self._registered.set()
+
+    def unsubscribe(self, stream_id):
+        self.streams.pop(stream_id, None)
+
+    async def _read(self):
+        while True:
+            if not self.streams:
+                self._registered.clear()
+                await self._registered.wait()
+            streams = {stream_id: last_id for stream_id, (last_id, _) in self.streams.items()}
+            try:
+                entries = await read_results(self.connection, streams, count=self.count, block_ms=self.block_ms)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Stream result reader failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            for stream_id, stream_entries in entries.items():
+                stream = self.streams.get(stream_id)
+                if stream is None:
+                    continue
+                stream[0] = stream_entries[-1][0]
+                try:
+                    await stream[1](stream_entries)
+                except Exception as e:
+                    print(f"Error delivering results of stream {stream_id}: {e}")
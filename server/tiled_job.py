@@ -0,0 +1,317 @@
+import asyncio
+import json
+import os
+import shutil
+from contextlib import suppress
+import cv2
+import numpy as np
+import utils.cnn_solver as cnn_solver
+from utils.ingest_pool import IngestPoolFull
+from utils.progress_coalescer import ProgressCoalescer, ERROR_PREFIX
+from utils.result_frame import read_result_header
+from utils.task_codec import build_task_meta, encode_task, encode_task_json
+from utils.tiling import plan_tiles, create_memmap, read_tile, write_tile
+from server.fair_scheduler import TASK_INFO_KEY, FairScheduler
+
+ENQUEUE_CHUNK = 16  # tiles encoded and pushed per pipelined round trip
+
+
+class _TileSink:
+    """Stands in for a WebSocket in the result router so a tile's result frame reaches its job."""
+
+    def __init__(self, job, tile):
+        self.job = job
+        self.tile = tile
+        self.closed = False
+
+    async def send_bytes(self, frame):
+        await self.job.tile_solved(self, frame)
+
+    async def send_str(self, message):
+        # Status and progress of single tiles are not forwarded, but a tile that failed fails the job
+        with suppress(ValueError, AttributeError):
+            text = json.loads(message).get('message')
+            if isinstance(text, str) and text.startswith(ERROR_PREFIX):
+                await self.job.tile_failed(self, text)
+
+
+class TiledJob:
+    """
+    Solves one large image as independent tile subtasks.
+
+    The input and the output live in memory-mapped .npy files in the job's
+    work directory. Tiles are cut with a halo, encoded and queued a few at
+    a time, and the core of each solved tile is written straight into the
+    output map, so the process holds a handful of tiles rather than the
+    image. Tiles are ordinary tasks named {job_id}.{index}: they go through
+    the fair scheduler to any worker and their result frames come back
+    through the result router. Without Redis they run on the local solver.
+    Progress and the final result URL are published to the job id. A tile
+    reporting an error fails the job, as does not finishing within the
+    server's tile_timeout. Once the job is done or failed it is kept for
+    the result cache TTL; a job stopped before that withdraws its tiles
+    that are still queued.
+    """
+
+    def __init__(self, server, job_id, workdir, shape, params, mode, tile_size, halo, websocket_url):
+        """
+        Args:
+            server: AsyncServer the job runs on
+            job_id: Task id the client knows the job by
+            workdir: Directory for the memory maps and the result, removed by close
+            shape: (height, width) of the image
+            params: Template parameters as returned by load_parameters_for_mode
+            mode: Mode name the parameters were resolved from
+            tile_size: Edge length of a tile's core
+            halo: Pixels of context around every tile, see utils.tiling.halo_width
+            websocket_url: Function returning the worker WebSocket URL of a tile task id
+        """
+        self.server = server
+        self.job_id = job_id
+        self.workdir = workdir
+        self.shape = shape
+        self.params = params
+        self.mode = mode
+        self.halo = halo
+        self.websocket_url = websocket_url
+        self.tiles = plan_tiles(shape[0], shape[1], tile_size, halo)
+        self.input = create_memmap(os.path.join(workdir, 'input.npy'), shape)
+        self.output = None
+        self.result_path = os.path.join(workdir, 'result.png')
+        self.state = 'receiving'  # receiving, solving, done or failed
+        self.error = None
+        self.done = 0
+        self.sinks = {}
+        self.progress = ProgressCoalescer(self._send_progress, interval=server.progress_interval)
+        self._runner = None
+        self._deadline = None
+
+    def tile_id(self, tile):
+        return f"{self.job_id}.{tile['index']}"
+
+    def status(self):
+        status = {'task_id': self.job_id, 'state': self.state, 'tiles_done': self.done,
+                  'tiles_total': len(self.tiles), 'width': self.shape[1], 'height': self.shape[0]}
+        if self.error is not None:
+            status['error'] = self.error
+        return status
+
+    async def start(self, client_id, priority):
+        """Queue every tile, or start solving them in-process without Redis."""
+        self.input.flush()
+        self.output = create_memmap(os.path.join(self.workdir, 'output.npy'), self.shape)
+        self.state = 'solving'
+        self._deadline = asyncio.get_running_loop().call_later(
+            self.server.tile_timeout, lambda: asyncio.ensure_future(self._time_out()))
+        if self.server.redis_client is None:
+            self._runner = asyncio.ensure_future(self._solve_locally())
+            return
+        try:
+            await self._enqueue(client_id, priority)
+        except Exception as e:
+            await self.fail(f"Could not queue tiles: {e}")
+            raise
+        await self.progress.offer(self.status())
+
+    async def _enqueue(self, client_id, priority):
+        server = self.server
+        for start in range(0, len(self.tiles), ENQUEUE_CHUNK):
+            chunk = self.tiles[start:start + ENQUEUE_CHUNK]
+            for tile in chunk:
+                sink = self.sinks[self.tile_id(tile)] = _TileSink(self, tile)
+                await server.result_router.subscribe(self.tile_id(tile), sink)
+            while True:
+                try:
+                    blobs = await server.ingest_pool.map(self._encode_tile, chunk)
+                    break
+                except IngestPoolFull:
+                    # Tiles yield to interactive requests instead of failing the job
+                    await asyncio.sleep(0.1)
+            async with server.redis_client.pipeline(transaction=False) as pipe:
+                for tile, task_blob in zip(chunk, blobs):
+                    if isinstance(task_blob, Exception):
+                        raise task_blob
+                    tile_id = self.tile_id(tile)
+                    oy0, oy1, ox0, ox1 = tile['outer']
+                    pipe.set(f'task:data:{tile_id}', task_blob)
+                    server.scheduler.queue_submit(
+                        pipe, tile_id, client_id, priority, server.scheduler.task_cost((oy1 - oy0) * (ox1 - ox0)))
+                    server.queue_task_info(pipe, tile_id, self.mode)
+                with server.redis_rtt.time(operation='enqueue_tiles'):
+                    await pipe.execute()
+
+    def _encode_tile(self, tile):
+        """Cut a tile out of the input map and encode it as a task (runs on the ingest pool)."""
+        meta = build_task_meta(self.params, mode=self.mode, websocket=self.websocket_url(self.tile_id(tile)))
+        if self.server.task_format == 'json':
+            return encode_task_json(read_tile(self.input, tile), meta)
+        return encode_task(read_tile(self.input, tile), meta)
+
+    async def tile_solved(self, sink, frame):
+        """Called by a tile's sink with the tile's result frame."""
+        if sink.closed or self.state != 'solving':
+            return
+        try:
+            _, _, _, offset = read_result_header(frame)
+        except ValueError:
+            return
+        sink.closed = True
+        tile_id = self.tile_id(sink.tile)
+        self.sinks.pop(tile_id, None)
+        await self.server.result_router.unsubscribe(tile_id, sink)
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self.server.solver_executor, self._store_tile, sink.tile, frame, offset)
+        except Exception as e:
+            await self.fail(f"Tile {sink.tile['index']} could not be stored: {e}")
+            return
+        await self._tile_done()
+
+    async def tile_failed(self, sink, error):
+        """Called by a tile's sink when the worker reports the tile failed."""
+        if sink.closed or self.state != 'solving':
+            return
+        await self.fail(f"Tile {sink.tile['index']} failed: {error}")
+
+    async def _time_out(self):
+        await self.fail(f"Not solved within {self.server.tile_timeout:g} seconds")
+
+    def _store_tile(self, tile, frame, offset):
+        result = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8, offset=offset), cv2.IMREAD_GRAYSCALE)
+        if result is None:
+            raise ValueError("result is not a decodable image")
+        write_tile(self.output, tile, result)
+
+    async def _solve_locally(self):
+        loop = asyncio.get_running_loop()
+        try:
+            for tile in self.tiles:
+                await loop.run_in_executor(self.server.solver_executor, self._solve_tile, tile)
+                await self._tile_done()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.fail(f"Tile solve failed: {e}")
+
+    def _solve_tile(self, tile):
+        state = cnn_solver.solve(read_tile(self.input, tile), self.params)
+        write_tile(self.output, tile, cnn_solver.render_output(state))
+
+    async def _tile_done(self):
+        if self.state != 'solving':
+            return
+        self.done += 1
+        if self.done < len(self.tiles):
+            await self.progress.offer(self.status())
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.server.solver_executor, self._write_result)
+        except Exception as e:
+            await self.fail(f"Result could not be written: {e}")
+            return
+        if self.state != 'solving':
+            return
+        self.state = 'done'
+        self._cancel_deadline()
+        self.server.expire_tiled_job(self.job_id)
+        self.progress.discard()
+        await self._send_progress(self.status())
+        await self.server.result_router.publish(self.job_id, json.dumps({
+            'type': 'tiled_result',
+            'task_id': self.job_id,
+            'url': f'/tasks/{self.job_id}/tiled',
+            'width': self.shape[1],
+            'height': self.shape[0],
+        }))
+
+    def _write_result(self):
+        self.output.flush()
+        partial = self.result_path + '.partial.png'
+        if not cv2.imwrite(partial, self.output):
+            raise ValueError("PNG encoding failed")
+        # The result only appears under its final name once complete
+        os.replace(partial, self.result_path)
+        self._remove_maps()
+
+    def _remove_maps(self):
+        """Delete the memory-mapped input and output, which can be as large as the image."""
+        self.input = self.output = None
+        for name in ('input.npy', 'output.npy'):
+            with suppress(OSError):
+                os.remove(os.path.join(self.workdir, name))
+
+    async def fail(self, error):
+        if self.state in ('done', 'failed'):
+            return
+        self.state = 'failed'
+        self.error = error
+        self._cancel_deadline()
+        if self._runner is not None and self._runner is not asyncio.current_task():
+            # Stop solving the remaining tiles in-process
+            self._runner.cancel()
+        self.server.expire_tiled_job(self.job_id)
+        await self._release_sinks()
+        # Only the error is kept until the job expires
+        await asyncio.get_running_loop().run_in_executor(None, self._remove_maps)
+        self.progress.discard()
+        await self._send_progress(self.status())
+        await self.server.log_to_file(f"Tiled task {self.job_id} failed: {error}", 'ERROR')
+
+    def _cancel_deadline(self):
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self._deadline = None
+
+    async def _send_progress(self, status):
+        message = json.dumps(dict(status, type='tile_progress'))
+        await self.server.result_router.publish(self.job_id, message)
+        if self.server.redis_client is not None:
+            # Lets any front-end answer GET /tasks/{id}/tiled, not only this one
+            await self.server.save_tiled_status(self.job_id, status)
+
+    async def _release_sinks(self):
+        """Stop waiting for the unsolved tiles and withdraw those still queued."""
+        if self.sinks and self.server.redis_client is not None:
+            try:
+                await self._withdraw_tiles(list(self.sinks))
+            except Exception as e:
+                await self.server.log_to_file(f"Could not withdraw the tiles of {self.job_id}: {e}", 'WARNING')
+        for tile_id, sink in list(self.sinks.items()):
+            sink.closed = True
+            await self.server.result_router.unsubscribe(tile_id, sink)
+        self.sinks.clear()
+
+    async def _withdraw_tiles(self, tile_ids):
+        """
+        Remove tiles from the client sub-queue or worker queue they wait in and drop their data.
+
+        Tiles a worker already took are left to finish; their results are ignored.
+        """
+        redis_client = self.server.redis_client
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for tile_id in tile_ids:
+                pipe.hmget(TASK_INFO_KEY.format(tile_id), 'queue', 'entry')
+            locations = await pipe.execute()
+        waiting = [(queue_key, entry) for queue_key, entry in locations if queue_key is not None and entry is not None]
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for queue_key, entry in waiting:
+                pipe.lrem(queue_key, 1, entry)
+            pipe.delete(*[f'task:data:{tile_id}' for tile_id in tile_ids])
+            removed = (await pipe.execute())[:len(waiting)]
+        # Tiles taken off a client sub-queue no longer count towards the dispatch backlog
+        client_queue = FairScheduler.CLIENT_QUEUE.format('', '')[:-1].encode()
+        undispatched = sum(count for (queue_key, _), count in zip(waiting, removed) if queue_key.startswith(client_queue))
+        if undispatched:
+            await redis_client.decrby(FairScheduler.BACKLOG_KEY, undispatched)
+
+    async def close(self):
+        """Stop the job and delete its work directory."""
+        self._cancel_deadline()
+        if self._runner is not None:
+            self._runner.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._runner
+        await self._release_sinks()
+        await self.progress.close()
+        self.input = self.output = None
+        await asyncio.get_running_loop().run_in_executor(None, shutil.rmtree, self.workdir, True)
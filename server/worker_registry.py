@@ -0,0 +1,150 @@
+import json
+import time
+
+SHARED_QUEUE = 'queue:task_queue'
+DEFAULT_SOLVE_MS = 1000.0  # assumed solve time of a worker that has not finished a task yet
+
+
+class WorkerRegistry:
+    """
+    Redis-backed view of the Julia workers and load-aware task placement.
+
+    Workers report their id, slots, in-flight tasks and average solve time
+    over the control connection; the control owner records them under
+    worker:{id} and keeps workers:alive scored by the last heartbeat. Tasks
+    are placed on the per-worker queue with the shortest expected wait,
+    using a snapshot of the registry refreshed at most once per
+    refresh_interval. Without live workers, tasks go to the shared queue
+    that every worker also drains.
+    """
+
+    ALIVE_KEY = 'workers:alive'
+    WORKER_KEY = 'worker:{}'
+    QUEUE_KEY = 'queue:worker:{}'
+
+    def __init__(self, redis_client=None, heartbeat_timeout=15.0, refresh_interval=1.0):
+        self.redis_client = redis_client
+        self.heartbeat_timeout = heartbeat_timeout
+        self.refresh_interval = refresh_interval
+        self.workers = {}
+        self._refreshed_at = 0.0
+
+    @classmethod
+    def queue_key(cls, worker_id):
+        return cls.QUEUE_KEY.format(worker_id)
+
+    async def report(self, worker_id, capacity):
+        """
+        Record a worker's capacity message.
+
+        Args:
+            worker_id: Id the worker announced itself with
+            capacity: Decoded capacity message (slots, in_flight task ids, avg_solve_ms)
+        """
+        in_flight = capacity.get('in_flight') or []
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(self.WORKER_KEY.format(worker_id), mapping={
+                'slots': int(capacity.get('slots', 1)),
+                'in_flight': json.dumps(in_flight),
+                'avg_solve_ms': float(capacity.get('avg_solve_ms') or 0.0),
+            })
+            pipe.zadd(self.ALIVE_KEY, {worker_id: time.time()})
+            await pipe.execute()
+
+    async def heartbeat(self, worker_id):
+        await self.redis_client.zadd(self.ALIVE_KEY, {worker_id: time.time()})
+
+    async def refresh(self):
+        """Reload the snapshot of live workers and the length of their queues."""
+        worker_ids = await self.redis_client.zrangebyscore(
+            self.ALIVE_KEY, time.time() - self.heartbeat_timeout, '+inf')
+        worker_ids = [w.decode() if isinstance(w, bytes) else w for w in worker_ids]
+        workers = {}
+        if worker_ids:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for worker_id in worker_ids:
+                    pipe.hmget(self.WORKER_KEY.format(worker_id), 'slots', 'in_flight', 'avg_solve_ms')
+                    pipe.llen(self.queue_key(worker_id))
+                replies = await pipe.execute()
+            for index, worker_id in enumerate(worker_ids):
+                (slots, in_flight, avg_solve_ms), queued = replies[2 * index], replies[2 * index + 1]
+                workers[worker_id] = {
+                    'slots': max(1, int(slots or 1)),
+                    'in_flight': len(json.loads(in_flight)) if in_flight else 0,
+                    'avg_solve_ms': float(avg_solve_ms or 0.0) or DEFAULT_SOLVE_MS,
+                    'queued': queued,
+                }
+        self.workers = workers
+        self._refreshed_at = time.monotonic()
+
+    @staticmethod
+    def expected_wait_ms(worker):
+        """Time until a task queued now would start, assuming the reported average solve time."""
+        backlog = worker['in_flight'] + worker['queued'] - worker['slots'] + 1
+        return max(0, backlog) * worker['avg_solve_ms'] / worker['slots']
+
+    async def choose_queue(self, prefetch=None):
+        """
+        Pick the queue the next task is pushed to.
+
+        Args:
+            prefetch: If set, only workers with fewer than slots + prefetch tasks running or queued qualify
+
+        Returns:
+            Key of the least loaded live worker's queue, the shared queue when no worker is
+            alive, or None when prefetch is set and every worker is full
+        """
+        if self.redis_client is None:
+            return SHARED_QUEUE
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            await self.refresh()
+        if not self.workers:
+            return SHARED_QUEUE
+        candidates = [
+            worker_id for worker_id, worker in self.workers.items()
+            if prefetch is None or worker['in_flight'] + worker['queued'] < worker['slots'] + prefetch
+        ]
+        if not candidates:
+            return None
+        worker_id = min(candidates, key=lambda w: (self.expected_wait_ms(self.workers[w]), self.workers[w]['queued']))
+        # Count the task until the next refresh so a burst spreads over the workers
+        self.workers[worker_id]['queued'] += 1
+        return self.queue_key(worker_id)
+
+    async def evict(self, worker_id):
+        """
+        Remove a worker and put its queued and in-flight tasks back on the shared queue.
+
+        Returns:
+            list of the requeued task ids
+        """
+        worker_key = self.WORKER_KEY.format(worker_id)
+        queue_key = self.queue_key(worker_id)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.lrange(queue_key, 0, -1)
+            pipe.hget(worker_key, 'in_flight')
+            pipe.delete(queue_key, worker_key)
+            pipe.zrem(self.ALIVE_KEY, worker_id)
+            queued, in_flight, _, _ = await pipe.execute()
+        self.workers.pop(worker_id, None)
+
+        # The head of the worker queue stays at the head of the shared queue; tasks it
+        # was running go in front of those
+        tasks = list(reversed(queued)) + (json.loads(in_flight) if in_flight else [])
+        if tasks:
+            await self.redis_client.lpush(SHARED_QUEUE, *tasks)
+        return [task.decode() if isinstance(task, bytes) else task for task in tasks]
+
+    async def sweep(self):
+        """
+        Evict every worker whose last heartbeat is older than heartbeat_timeout.
+
+        Returns:
+            dict of evicted worker id -> list of requeued task ids
+        """
+        stale = await self.redis_client.zrangebyscore(self.ALIVE_KEY, '-inf', time.time() - self.heartbeat_timeout)
+        evicted = {}
+        for worker_id in stale:
+            worker_id = worker_id.decode() if isinstance(worker_id, bytes) else worker_id
+            evicted[worker_id] = await self.evict(worker_id)
+        return evicted
@@ -0,0 +1,99 @@
+import asyncio
+import fakeredis
+import pytest
+import server.admission_control as admission_control
+from server.admission_control import AdmissionController, TokenBucket
+from server.fair_scheduler import FairScheduler
+from server.worker_registry import SHARED_QUEUE
+from utils.ingest_pool import IngestPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission_control.time, 'monotonic', clock)
+    return clock
+
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2.0, burst=4)
+    assert [bucket.take() for _ in range(4)] == [0, 0, 0, 0]
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.take() == 0
+    clock.now += 100
+    assert bucket.full
+
+
+def test_large_cost_leaves_the_bucket_in_debt(clock):
+    bucket = TokenBucket(rate=1.0, burst=5)
+    assert bucket.take(12) == 0
+    assert bucket.tokens == -7
+    # Cost 0 only checks that the debt is paid off
+    assert bucket.take(0) == pytest.approx(7)
+    clock.now += 8
+    assert bucket.take(0) == 0
+    assert bucket.take(5) == pytest.approx(4)
+
+
+def test_client_rate_gives_retry_after(clock):
+    controller = AdmissionController(client_rate=0.5, client_burst=2, max_retry_after=60)
+
+    async def scenario():
+        return [await controller.check('client') for _ in range(3)], await controller.check('other')
+
+    results, other = asyncio.run(scenario())
+    assert results == [None, None, ('client_rate', 2)]
+    assert other is None
+
+
+def test_retry_after_is_clamped(clock):
+    controller = AdmissionController(client_rate=0.01, client_burst=1, max_retry_after=30)
+    assert controller.charge('client', 1) is None
+    assert controller.charge('client', 1) == ('client_rate', 30)
+
+
+def test_charge_counts_the_backlog(clock):
+    controller = AdmissionController(client_rate=0)
+    assert controller.charge('client', 25) is None
+    assert controller.backlog == 25
+
+
+def test_full_ingest_pool_is_rejected_first():
+    pool = IngestPool(max_workers=1, max_pending=0)
+    controller = AdmissionController(ingest_pool=pool)
+    try:
+        assert asyncio.run(controller.check('client')) == ('ingest', 1)
+    finally:
+        pool.shutdown()
+
+
+def test_backlog_retry_after_follows_the_drain_rate(clock):
+    async def scenario():
+        redis_client = fakeredis.aioredis.FakeRedis()
+        await redis_client.set(FairScheduler.BACKLOG_KEY, 100)
+        await redis_client.rpush(SHARED_QUEUE, *range(10))
+        await redis_client.set(FairScheduler.DRAIN_RATE_KEY, 5.0)
+        controller = AdmissionController(redis_client, max_backlog=80, client_rate=0)
+        draining = await controller.check('client')
+        await redis_client.delete(FairScheduler.DRAIN_RATE_KEY)
+        clock.now += 1
+        stalled = await controller.check('client')
+        await redis_client.set(FairScheduler.BACKLOG_KEY, 0)
+        await redis_client.delete(SHARED_QUEUE)
+        clock.now += 1
+        return draining, stalled, await controller.check('client')
+
+    draining, stalled, admitted = asyncio.run(scenario())
+    # 110 waiting, 31 over the limit at 5 tasks per second
+    assert draining == ('backlog', 7)
+    assert stalled == ('backlog', 60)
+    assert admitted is None
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import utils.cnn_solver as cnn_solver
+
+# vertical_line_detect_ from utils/pkl_save.py: B is a vertical column, so it is
+# not symmetric under transposition and a backend that mixes up the
+# orientation detects horizontal lines instead
+VERTICAL_LINE = {
+    'A': np.array([[0.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 0.0]]),
+    'B': np.array([[0.0, 1.0, 0.0], [0.0, 1.0, 0.0], [0.0, 1.0, 0.0]]),
+    't': np.arange(1.0, 3.0 + 0.01, 0.01),
+    'Ib': -3.0,
+    'init': 0.0,
+}
+
+
+def fftconvolve2d(in1, in2):
+    """Port of JuliaWorker LinearConvolution.fftconvolve2d: full FFT convolution cropped to in1's size."""
+    shape = (in1.shape[0] + in2.shape[0] - 1, in1.shape[1] + in2.shape[1] - 1)
+    full = np.real(np.fft.ifft2(np.fft.fft2(in1, shape) * np.fft.fft2(in2, shape)))
+    row, col = (in2.shape[0] - 1) // 2, (in2.shape[1] - 1) // 2
+    return full[row:row + in1.shape[0], col:col + in1.shape[1]]
+
+
+def worker_solve(image, params, monkeypatch):
+    """
+    Solve the way the Julia worker lays out its data.
+
+    RedisQueueWatcher.decode_task reshapes the row-major pixels into a
+    width x height matrix, the templates are built with hcat(rows...),
+    both convolutions go through fftconvolve2d and ODESolver transposes
+    the final state back before encoding it.
+    """
+    monkeypatch.setattr(cnn_solver, 'convolve2d', fftconvolve2d)
+    transposed = dict(params, A=np.asarray(params['A']).T, B=np.asarray(params['B']).T)
+    return cnn_solver.solve(np.ascontiguousarray(image.T), transposed).T
+
+
+@pytest.fixture
+def image():
+    return (np.random.RandomState(3).rand(24, 17) * 255).astype(np.uint8)
+
+
+def test_convolve2d_matches_worker_fft_convolution():
+    rng = np.random.RandomState(0)
+    data = rng.rand(9, 13)
+    kernel = rng.rand(3, 5)
+    np.testing.assert_allclose(cnn_solver.convolve2d(data, kernel), fftconvolve2d(data, kernel), atol=1e-12)
+
+
+def test_backends_agree_on_asymmetric_template(image, monkeypatch):
+    local = cnn_solver.solve(image, VERTICAL_LINE)
+    worker = worker_solve(image, VERTICAL_LINE, monkeypatch)
+    np.testing.assert_allclose(local, worker, atol=1e-8)
+    assert (cnn_solver.render_output(local) == cnn_solver.render_output(worker)).all()
+
+
+def test_template_orientation_matters(image):
+    transposed = dict(VERTICAL_LINE, B=VERTICAL_LINE['B'].T)
+    assert not np.allclose(cnn_solver.solve(image, VERTICAL_LINE), cnn_solver.solve(image, transposed))
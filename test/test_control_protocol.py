@@ -0,0 +1,89 @@
+import asyncio
+import json
+import struct
+import pytest
+from utils.control_protocol import (
+    CONTROL_HEADER, CONTROL_PREAMBLE, CONTROL_VERSION, MAX_PAYLOAD, MSG_CAPACITY, MSG_HEARTBEAT, MSG_LOG, MSG_PROGRESS,
+    ProtocolError, decode_capacity, decode_progress, read_message, read_preamble
+)
+
+
+def message(message_type, payload=b''):
+    return CONTROL_HEADER.pack(len(payload), message_type) + payload
+
+
+def progress(task_id, text):
+    task = task_id.encode()
+    return struct.pack('<H', len(task)) + task + text.encode()
+
+
+def read_all(data):
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        messages = []
+        while (received := await read_message(reader)) is not None:
+            messages.append(received)
+        return messages
+    return asyncio.run(scenario())
+
+
+def test_messages_are_split_on_their_length():
+    data = message(MSG_LOG, b'hello') + message(MSG_HEARTBEAT) + message(MSG_PROGRESS, progress('t-1', '50%'))
+    assert read_all(data) == [(MSG_LOG, b'hello'), (MSG_HEARTBEAT, b''), (MSG_PROGRESS, progress('t-1', '50%'))]
+
+
+def test_truncated_message_is_an_error():
+    with pytest.raises(asyncio.IncompleteReadError):
+        read_all(message(MSG_LOG, b'hello')[:-1])
+    with pytest.raises(asyncio.IncompleteReadError):
+        read_all(message(MSG_LOG, b'hello')[:3])
+
+
+@pytest.mark.parametrize('header', [CONTROL_HEADER.pack(0, 99), CONTROL_HEADER.pack(MAX_PAYLOAD + 1, MSG_LOG)])
+def test_invalid_headers_are_rejected(header):
+    with pytest.raises(ProtocolError):
+        read_all(header)
+
+
+def test_progress_payload():
+    assert decode_progress(progress('task-7', 'Image processing error: boom')) == (
+        'task-7', 'Image processing error: boom')
+    with pytest.raises(ProtocolError):
+        decode_progress(b'\x01')
+    with pytest.raises(ProtocolError):
+        decode_progress(struct.pack('<H', 10) + b'short')
+
+
+def test_capacity_payload():
+    assert decode_capacity(json.dumps({'slots': 4}).encode()) == {'slots': 4}
+    assert read_all(message(MSG_CAPACITY, b'{}')) == [(MSG_CAPACITY, b'{}')]
+    with pytest.raises(ProtocolError):
+        decode_capacity(b'[1, 2]')
+
+
+def preamble(*chunks, eof=True, timeout=0.05):
+    async def scenario():
+        reader = asyncio.StreamReader()
+        for chunk in chunks:
+            reader.feed_data(chunk)
+        if eof:
+            reader.feed_eof()
+        return await read_preamble(reader, timeout)
+    return asyncio.run(scenario())
+
+
+def test_preamble_is_recognised():
+    opening = CONTROL_PREAMBLE + bytes([CONTROL_VERSION])
+    assert preamble(opening + message(MSG_HEARTBEAT)) == (True, opening)
+    assert preamble(opening[:2], opening[2:], eof=False) == (True, opening)
+
+
+def test_legacy_stream_is_not_held_back():
+    # Shorter than the preamble and the client waits for a reply
+    assert preamble(b'hi', eof=False) == (False, b'hi')
+    assert preamble(b'CN', eof=False) == (False, b'CN')
+    assert preamble(b'CNX log line') == (False, b'CNX l')
+    assert preamble(CONTROL_PREAMBLE) == (False, CONTROL_PREAMBLE)
+    assert preamble() == (False, b'')
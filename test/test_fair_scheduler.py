@@ -0,0 +1,121 @@
+import asyncio
+import fakeredis
+import pytest
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError
+from server.fair_scheduler import FairScheduler, TASK_INFO_KEY
+from server.worker_registry import WorkerRegistry, SHARED_QUEUE
+
+
+def make_scheduler(shared_prefetch=64, **kwargs):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    registry = WorkerRegistry(redis_client)
+    return FairScheduler(redis_client, registry, shared_prefetch=shared_prefetch, **kwargs)
+
+
+async def submit(scheduler, client_id, count, priority='interactive', cost=1, prefix=None):
+    async with scheduler.redis_client.pipeline(transaction=False) as pipe:
+        for index in range(count):
+            scheduler.queue_submit(pipe, f'{prefix or client_id}-{index}', client_id, priority, cost)
+        await pipe.execute()
+
+
+async def dispatched(scheduler):
+    return [task_id.decode() for task_id in await scheduler.redis_client.lrange(SHARED_QUEUE, 0, -1)]
+
+
+def test_clients_share_the_workers():
+    async def scenario():
+        scheduler = make_scheduler(shared_prefetch=4, quantum=1)
+        await submit(scheduler, 'heavy', 10)
+        await submit(scheduler, 'light', 2)
+        assert await scheduler.dispatch_once() == 4
+        return await dispatched(scheduler), int(await scheduler.redis_client.get(scheduler.BACKLOG_KEY))
+
+    order, backlog = asyncio.run(scenario())
+    assert sorted(order) == ['heavy-0', 'heavy-1', 'light-0', 'light-1']
+    assert backlog == 8
+
+
+def test_cost_is_charged_per_pixel():
+    async def scenario():
+        scheduler = make_scheduler(shared_prefetch=12, quantum=4)
+        await submit(scheduler, 'large', 3, cost=8)
+        await submit(scheduler, 'small', 20, cost=1)
+        await scheduler.dispatch_once()
+        return await dispatched(scheduler)
+
+    order = asyncio.run(scenario())
+    # Both clients earn 4 units per turn: one large task per eight small ones
+    assert order.count('large-0') == 1
+    assert sum(task.startswith('small') for task in order) == 11
+
+
+def test_interactive_overtakes_bulk():
+    async def scenario():
+        scheduler = make_scheduler(shared_prefetch=5)
+        await submit(scheduler, 'batch', 10, priority='bulk')
+        await submit(scheduler, 'user', 10, priority='interactive')
+        await scheduler.dispatch_once()
+        return await dispatched(scheduler)
+
+    order = asyncio.run(scenario())
+    assert sum(task.startswith('user') for task in order) == 4
+    assert sum(task.startswith('batch') for task in order) == 1
+
+
+def test_dispatch_records_where_the_task_went():
+    async def scenario():
+        scheduler = make_scheduler()
+        await submit(scheduler, 'client', 1)
+        await scheduler.dispatch_once()
+        info = await scheduler.redis_client.hgetall(TASK_INFO_KEY.format('client-0'))
+        remaining = await scheduler.redis_client.exists(FairScheduler.CLIENT_QUEUE.format('interactive', 'client'))
+        return info, remaining
+
+    info, remaining = asyncio.run(scenario())
+    assert info[b'queue'] == SHARED_QUEUE.encode()
+    assert info[b'entry'] == b'client-0'
+    assert b'dispatched_at' in info
+    assert not remaining
+
+
+def test_failed_dispatch_keeps_the_tasks(monkeypatch):
+    async def scenario():
+        scheduler = make_scheduler()
+        await submit(scheduler, 'client', 3)
+
+        async def fail(pipe, *args, **kwargs):
+            raise ConnectionError("connection lost")
+        with monkeypatch.context() as patch:
+            patch.setattr(Pipeline, 'execute', fail)
+            with pytest.raises(ConnectionError):
+                await scheduler.dispatch_once()
+
+        queue_key = FairScheduler.CLIENT_QUEUE.format('interactive', 'client')
+        left = await scheduler.redis_client.llen(queue_key)
+        backlog = int(await scheduler.redis_client.get(scheduler.BACKLOG_KEY))
+        shared = await dispatched(scheduler)
+        # The dispatcher picks up where it left off
+        await scheduler.dispatch_once()
+        return left, backlog, shared, await dispatched(scheduler)
+
+    left, backlog, shared, after = asyncio.run(scenario())
+    assert (left, backlog, shared) == (3, 3, [])
+    assert after == ['client-0', 'client-1', 'client-2']
+
+
+def test_withdrawn_head_is_skipped():
+    async def scenario():
+        scheduler = make_scheduler(shared_prefetch=1)
+        await submit(scheduler, 'client', 3)
+        queue_key = FairScheduler.CLIENT_QUEUE.format('interactive', 'client')
+        await scheduler.dispatch_once()
+        # A queued task is withdrawn between two dispatches
+        head = await scheduler.redis_client.lindex(queue_key, 0)
+        await scheduler.redis_client.lrem(queue_key, 1, head)
+        await scheduler.redis_client.delete(SHARED_QUEUE)
+        await scheduler.dispatch_once()
+        return await dispatched(scheduler)
+
+    assert asyncio.run(scenario()) == ['client-2']
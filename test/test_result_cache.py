@@ -0,0 +1,94 @@
+import asyncio
+import fakeredis
+import numpy as np
+from utils.result_cache import ResultCache
+
+PARAMS = {'A': np.eye(3), 'B': np.ones((3, 3)), 't': np.arange(0.0, 1.0, 0.5), 'Ib': 0.0, 'init': 0.0}
+
+
+def make_caches(count=2, **kwargs):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    return [ResultCache(redis_client, **kwargs) for _ in range(count)]
+
+
+def test_key_depends_on_pixels_and_template():
+    image = np.zeros((4, 4), dtype=np.uint8)
+    key = ResultCache.make_key(image, PARAMS)
+    assert key == ResultCache.make_key(image.copy(), dict(PARAMS))
+    assert key != ResultCache.make_key(image.reshape(2, 8), PARAMS)
+    assert key != ResultCache.make_key(image, dict(PARAMS, Ib=-1.0))
+
+
+def test_one_of_several_identical_submissions_wins():
+    async def scenario():
+        first, second = make_caches()
+        owners = await asyncio.gather(
+            first.claim([('key-a', 'task-1'), ('key-b', 'task-2')], ttl=60),
+            second.claim([('key-a', 'task-3'), ('key-c', 'task-4')], ttl=60),
+        )
+        return owners, await first.redis_client.ttl(ResultCache.INFLIGHT_KEY.format('key-a'))
+
+    (first, second), ttl = asyncio.run(scenario())
+    winner = first[0]
+    assert winner in ('task-1', 'task-3')
+    assert second[0] == winner
+    assert (first[1], second[1]) == ('task-2', 'task-4')
+    assert 0 < ttl <= 60
+
+
+def test_released_claim_can_be_won_again():
+    async def scenario():
+        first, second = make_caches()
+        await first.claim([('key', 'task-1')], ttl=60)
+        attached = await second.claim([('key', 'task-2')], ttl=60)
+        await first.release('key')
+        after_release = await second.claim([('key', 'task-3')], ttl=60)
+        async with first.redis_client.pipeline(transaction=False) as pipe:
+            first.queue_release(pipe, 'key')
+            await pipe.execute()
+        after_queued_release = await first.claim([('key', 'task-4')], ttl=60)
+        return attached, after_release, after_queued_release
+
+    assert asyncio.run(scenario()) == (['task-1'], ['task-3'], ['task-4'])
+
+
+def test_claims_without_redis_are_always_won():
+    cache = ResultCache()
+    assert asyncio.run(cache.claim([('key', 'task-1'), ('key', 'task-2')], ttl=60)) == ['task-1', 'task-2']
+
+
+def test_result_is_stored_under_the_bound_key():
+    async def scenario():
+        first, second = make_caches()
+        await first.bind_task('task-1', 'key')
+        keys = await second.task_keys(['task-1', 'task-2'])
+        stored_under = await second.put_for_task('task-1', b'png')
+        # The binding is consumed by the first result
+        return keys, stored_under, await second.take_task_key('task-1'), await first.get('key')
+
+    keys, stored_under, again, result = asyncio.run(scenario())
+    assert keys == ['key', None]
+    assert stored_under == 'key'
+    assert again is None
+    assert result == b'png'
+
+
+def test_memory_tier_is_bounded():
+    async def scenario():
+        cache = ResultCache(max_entries=2)
+        for key in ('a', 'b', 'c'):
+            await cache.put(key, key.encode())
+        return await cache.get_many(['a', 'b', 'c'])
+
+    assert asyncio.run(scenario()) == {'b': b'b', 'c': b'c'}
+
+
+def test_contains_checks_both_tiers():
+    async def scenario():
+        first, second = make_caches()
+        await first.put('key', b'png')
+        found = await first.contains('key'), await second.contains('key')
+        await first.redis_client.delete(ResultCache.RESULT_KEY.format('key'))
+        return found, await first.contains('key'), await second.contains('key')
+
+    assert asyncio.run(scenario()) == ((True, True), True, False)
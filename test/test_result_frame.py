@@ -0,0 +1,35 @@
+import base64
+import pytest
+from utils.result_frame import (
+    RESULT_HEADER, encode_result_frame, read_result_header, result_frame_payload, data_url_payload,
+    payload_to_data_url
+)
+
+PNG = b'\x89PNG\r\n\x1a\nnot really a png'
+
+
+def test_frame_round_trip():
+    frame = encode_result_frame('task-42', PNG, level=2)
+    task_id, frame_type, encoding, offset = read_result_header(frame)
+    assert (task_id, frame_type, encoding) == ('task-42', 'image', 'png')
+    assert offset == RESULT_HEADER.size + len('task-42')
+    assert result_frame_payload(frame) == PNG
+    assert RESULT_HEADER.unpack_from(frame)[4] == 2
+
+
+def test_header_is_read_from_a_memoryview():
+    frame = memoryview(encode_result_frame('abc', PNG))
+    assert read_result_header(frame)[0] == 'abc'
+    assert result_frame_payload(frame) == PNG
+
+
+@pytest.mark.parametrize('frame', [b'CNNR', b'JUNK' + bytes(RESULT_HEADER.size), encode_result_frame('task', b'')[:-2]])
+def test_invalid_frames_are_rejected(frame):
+    with pytest.raises(ValueError):
+        read_result_header(frame)
+
+
+def test_data_url_round_trip():
+    data_url = payload_to_data_url(PNG)
+    assert data_url == 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+    assert data_url_payload(data_url) == ('png', PNG)
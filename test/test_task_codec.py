@@ -0,0 +1,54 @@
+import json
+import numpy as np
+import pytest
+from utils.task_codec import TASK_HEADER, TASK_MAGIC, build_task_meta, encode_task, encode_task_json, decode_task
+
+
+@pytest.fixture
+def meta():
+    params = {
+        'A': np.array([[0.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 0.0]]),
+        'B': np.array([[-1.0, -1.0, -1.0], [-1.0, 8.0, -1.0], [-1.0, -1.0, -1.0]]),
+        't': np.arange(1.0, 2.0 + 0.5, 0.5),
+        'Ib': -0.5,
+        'init': 0.0,
+    }
+    return build_task_meta(params, mode='edge_detect_', websocket='ws://localhost:9000/ws/task')
+
+
+def test_binary_round_trip(meta):
+    image = (np.random.RandomState(1).rand(7, 11) * 255).astype(np.uint8)
+    blob = encode_task(image, meta)
+    assert blob.startswith(TASK_MAGIC)
+    assert len(blob) == TASK_HEADER.size + len(json.dumps(meta).encode()) + image.size
+
+    decoded, decoded_meta = decode_task(blob)
+    assert decoded.shape == (7, 11)
+    np.testing.assert_array_equal(decoded, image)
+    assert decoded_meta == meta
+
+
+def test_non_contiguous_image_is_encoded_row_major(meta):
+    image = np.arange(48, dtype=np.uint8).reshape(6, 8)[:, ::2]
+    decoded, _ = decode_task(encode_task(image, meta))
+    np.testing.assert_array_equal(decoded, image)
+
+
+def test_legacy_json_is_decoded(meta):
+    image = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    decoded, decoded_meta = decode_task(encode_task_json(image, meta))
+    np.testing.assert_array_equal(decoded, image)
+    assert decoded_meta['feedbackA'] == meta['feedbackA']
+
+
+@pytest.mark.parametrize('image', [np.zeros((2, 2, 3), dtype=np.uint8), np.zeros((2, 2), dtype=np.float32)])
+def test_unsupported_images_are_rejected(image, meta):
+    with pytest.raises(ValueError):
+        encode_task(image, meta)
+
+
+def test_unknown_version_is_rejected(meta):
+    blob = bytearray(encode_task(np.zeros((2, 2), dtype=np.uint8), meta))
+    blob[len(TASK_MAGIC)] = 99
+    with pytest.raises(ValueError, match='version'):
+        decode_task(bytes(blob))
@@ -0,0 +1,74 @@
+import zlib
+import cv2
+import numpy as np
+import pytest
+import utils.cnn_solver as cnn_solver
+from utils.tiling import halo_width, image_shape, plan_tiles, read_tile, write_tile
+
+
+def params(size_a=3, size_b=3, t=(0.0, 1.0)):
+    return {'A': np.zeros((size_a, size_a)), 'B': np.zeros((size_b, size_b)), 't': np.array(t), 'Ib': 0.0, 'init': 0.0}
+
+
+@pytest.mark.parametrize('template, expected', [
+    (params(), 1 + 1 * 2),
+    (params(size_a=5, t=(1.0, 3.0)), 1 + 2 * 4),
+    (params(size_b=7, t=(0.0, 0.25)), 3 + 1 * 1),
+    (params(t=()), 1),
+])
+def test_halo_width(template, expected):
+    assert halo_width(template) == expected
+
+
+def test_tiles_cover_the_image_once():
+    tiles = plan_tiles(10, 7, 4, 2)
+    assert [tile['index'] for tile in tiles] == list(range(6))
+    covered = np.zeros((10, 7), dtype=int)
+    for tile in tiles:
+        y0, y1, x0, x1 = tile['core']
+        covered[y0:y1, x0:x1] += 1
+    assert (covered == 1).all()
+    assert tiles[0]['outer'] == (0, 6, 0, 6)
+    assert tiles[4] == {'index': 4, 'core': (8, 10, 0, 4), 'outer': (6, 10, 0, 6)}
+
+
+def test_tiled_solve_matches_the_full_solve():
+    template = {
+        'A': np.array([[0.0, 1.0, 0.0], [1.0, 2.0, 1.0], [0.0, 1.0, 0.0]]) * 0.25,
+        'B': np.array([[-1.0, -1.0, -1.0], [-1.0, 8.0, -1.0], [-1.0, -1.0, -1.0]]),
+        't': np.arange(0.0, 1.0 + 0.1, 0.1),
+        'Ib': -0.5,
+        'init': 0.0,
+    }
+    image = (np.random.RandomState(5).rand(40, 33) * 255).astype(np.uint8)
+    expected = cnn_solver.render_output(cnn_solver.solve(image, template))
+    output = np.zeros_like(image)
+    halo = halo_width(template, per_time=8.0)
+    for tile in plan_tiles(*image.shape, 16, halo):
+        write_tile(output, tile, cnn_solver.render_output(cnn_solver.solve(read_tile(image, tile), template)))
+    np.testing.assert_array_equal(output, expected)
+
+
+def test_write_tile_checks_the_result_shape():
+    tile = plan_tiles(8, 8, 4, 1)[0]
+    with pytest.raises(ValueError):
+        write_tile(np.zeros((8, 8), dtype=np.uint8), tile, np.zeros((4, 4), dtype=np.uint8))
+
+
+@pytest.mark.parametrize('extension', ['.png', '.jpg', '.bmp'])
+def test_image_shape_reads_the_header(extension):
+    encoded = cv2.imencode(extension, np.zeros((21, 13), dtype=np.uint8))[1].tobytes()
+    assert image_shape(encoded) == (21, 13)
+
+
+def test_image_shape_ignores_the_bomb_guard():
+    # A PNG header claiming 100000 x 100000 pixels, far beyond Pillow's limit
+    encoded = cv2.imencode('.png', np.zeros((1, 1), dtype=np.uint8))[1].tobytes()
+    ihdr = b'IHDR' + (100000).to_bytes(4, 'big') * 2 + encoded[24:29]
+    encoded = encoded[:12] + ihdr + zlib.crc32(ihdr).to_bytes(4, 'big') + encoded[33:]
+    assert image_shape(encoded) == (100000, 100000)
+
+
+def test_image_shape_rejects_unknown_formats():
+    with pytest.raises(ValueError):
+        image_shape(b'definitely not an image')
@@ -0,0 +1,153 @@
+import asyncio
+import datetime
+import os
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+
+def truncate_log(path):
+    """Empty the log file, creating it if needed."""
+    with open(path, 'w'):
+        pass
+
+
+class AsyncLogSink:
+    """
+    Background log writer fed by a bounded in-memory queue.
+
+    log() never blocks the caller: records are queued and a single task
+    writes them in batches from a worker thread, keeping the file open
+    between batches and rotating it by size. A file renamed by another
+    process's rotation is noticed by its inode and reopened before the next
+    batch. Once the queue is filled past its high watermark, DEBUG and INFO
+    records are sampled; when it is full, records are dropped. Both are
+    counted and reported in the log.
+    """
+
+    def __init__(self, path='server_logs.txt', level='INFO', max_queue=10000, batch_size=256,
+                 max_bytes=10 * 1024 * 1024, backup_count=3, sample_rate=10, high_watermark=0.8):
+        self.path = path
+        self.level = LEVELS[level.upper()]
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.sample_rate = sample_rate
+        self.high_watermark = int(max_queue * high_watermark)
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.sampled = 0
+        self._sample_counter = 0
+        self._file = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def log(self, message, level='INFO'):
+        """
+        Queue a message for writing; returns False if it was filtered, sampled out or dropped.
+
+        Args:
+            message: Text of the record
+            level: One of DEBUG, INFO, WARNING, ERROR
+        """
+        levelno = LEVELS.get(level, LEVELS['INFO'])
+        if levelno < self.level:
+            return False
+
+        if levelno < LEVELS['WARNING'] and self.queue.qsize() >= self.high_watermark:
+            self._sample_counter += 1
+            if self._sample_counter % self.sample_rate:
+                self.sampled += 1
+                return False
+
+        # INFO keeps the original "timestamp - message" layout
+        prefix = '' if level == 'INFO' else f"{level} - "
+        record = f"{datetime.datetime.now().isoformat()} - {prefix}{message}\n"
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def clear(self):
+        """Truncate the log file (used once at startup)."""
+        await asyncio.to_thread(self._truncate)
+
+    async def close(self):
+        """Write everything still queued, then stop the writer and close the file."""
+        if self._task is not None:
+            # None is the stop marker; it is queued behind the pending records
+            await self.queue.put(None)
+            await self._task
+            self._task = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _drain(self):
+        records = []
+        while not self.queue.empty() and len(records) < self.batch_size:
+            records.append(self.queue.get_nowait())
+        if self.dropped or self.sampled:
+            records.append(
+                f"{datetime.datetime.now().isoformat()} - WARNING - Log sink under pressure: "
+                f"dropped {self.dropped}, sampled out {self.sampled} messages\n"
+            )
+            self.dropped = 0
+            self.sampled = 0
+        return records
+
+    async def _run(self):
+        while True:
+            records = [await self.queue.get()] + self._drain()
+            closing = None in records
+            records = [record for record in records if record is not None]
+            try:
+                await asyncio.to_thread(self._write_batch, records)
+            except Exception as e:
+                print(f"Error writing log batch to {self.path}: {e}")
+            if closing:
+                return
+
+    def _truncate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        truncate_log(self.path)
+
+    def _reopen_if_rotated(self):
+        """Close the file if another process renamed or removed it since it was opened."""
+        try:
+            rotated = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self._file.close()
+            self._file = None
+
+    def _write_batch(self, records):
+        if not records:
+            return
+        if self._file is not None:
+            self._reopen_if_rotated()
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(''.join(records))
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
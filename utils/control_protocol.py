@@ -0,0 +1,101 @@
+import asyncio
+import json
+import struct
+
+# Framed protocol spoken by Julia workers on julia_port.
+#
+# A connection starts with the 5 byte preamble 'CNNC' + version. After it,
+# every message is
+#   payload length u32 | message type u8 | payload
+# with integers little endian. Connections that do not open with the
+# preamble are treated as the legacy raw text log stream.
+CONTROL_PREAMBLE = b'CNNC'
+CONTROL_VERSION = 1
+CONTROL_HEADER = struct.Struct('<IB')
+MAX_PAYLOAD = 64 * 1024 * 1024
+PREAMBLE_TIMEOUT = 2.0  # seconds a connection may stall inside what could still be the preamble
+
+MSG_LOG = 1        # utf-8 log text
+MSG_PROGRESS = 2   # task status: task_id length u16 | task_id | utf-8 text
+MSG_RESULT = 3     # binary result frame, see utils/result_frame.py
+MSG_HEARTBEAT = 4  # empty; keeps the worker marked alive
+MSG_CAPACITY = 5   # JSON object describing the worker's slots
+
+MESSAGE_TYPES = {
+    MSG_LOG: 'log',
+    MSG_PROGRESS: 'progress',
+    MSG_RESULT: 'result',
+    MSG_HEARTBEAT: 'heartbeat',
+    MSG_CAPACITY: 'capacity',
+}
+
+_TASK_LENGTH = struct.Struct('<H')
+
+
+class ProtocolError(Exception):
+    """Raised when a peer sends something that is not a valid control message."""
+
+
+async def read_preamble(reader, timeout=PREAMBLE_TIMEOUT):
+    """
+    Read the opening bytes of a connection as far as they can be the preamble.
+
+    Reading stops at the first byte that cannot belong to the preamble, at
+    EOF, or when no data arrives for timeout seconds, so a legacy client
+    whose first message is shorter than the preamble is not left waiting.
+
+    Returns:
+        (framed, data): framed is True when data is the preamble and its
+        version byte, else data is the start of the legacy text stream
+    """
+    size = len(CONTROL_PREAMBLE) + 1
+    data = b''
+    while len(data) < size and CONTROL_PREAMBLE.startswith(data[:len(CONTROL_PREAMBLE)]):
+        try:
+            chunk = await asyncio.wait_for(reader.read(size - len(data)), timeout)
+        except asyncio.TimeoutError:
+            break
+        if not chunk:
+            break
+        data += chunk
+    return len(data) == size and data.startswith(CONTROL_PREAMBLE), data
+
+
+async def read_message(reader):
+    """
+    Read one message from an asyncio StreamReader.
+
+    Returns:
+        (message_type, payload) or None when the peer closed the connection cleanly
+    """
+    try:
+        header = await reader.readexactly(CONTROL_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    length, message_type = CONTROL_HEADER.unpack(header)
+    if message_type not in MESSAGE_TYPES:
+        raise ProtocolError(f"Unknown message type {message_type}")
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"Message of {length} bytes exceeds the {MAX_PAYLOAD} byte limit")
+    payload = await reader.readexactly(length) if length else b''
+    return message_type, payload
+
+
+def decode_progress(payload):
+    """Split a progress payload into (task_id, text)."""
+    if len(payload) < _TASK_LENGTH.size:
+        raise ProtocolError("Progress message is too short")
+    (task_length,) = _TASK_LENGTH.unpack_from(payload)
+    offset = _TASK_LENGTH.size + task_length
+    if len(payload) < offset:
+        raise ProtocolError("Progress message is truncated")
+    return payload[_TASK_LENGTH.size:offset].decode(), payload[offset:].decode(errors='replace')
+
+
+def decode_capacity(payload):
+    capacity = json.loads(payload)
+    if not isinstance(capacity, dict):
+        raise ProtocolError("Capacity message must be a JSON object")
+    return capacity
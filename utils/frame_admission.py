@@ -0,0 +1,77 @@
+import time
+
+
+class FrameAdmissionController:
+    """
+    Adjusts a stream's admitted frame rate from its measured processing latency.
+
+    Latency is the time from storing a frame to delivering its result,
+    smoothed with an exponential moving average. The rate is cut
+    multiplicatively when latency exceeds the target or too many frames
+    are still waiting for a result, and raised by one frame per second
+    when both have headroom, never above the client's requested rate.
+    Until the first result arrives nothing is known about the processor,
+    so the requested rate is admitted unchanged.
+    """
+
+    def __init__(self, target_ms=100, max_fps=30, min_fps=1, max_in_flight=8,
+                 smoothing=0.2, decrease=0.7, interval=0.5):
+        self.target_ms = target_ms
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.max_in_flight = max_in_flight
+        self.smoothing = smoothing
+        self.decrease = decrease
+        self.interval = interval
+        self.fps = float(max_fps)
+        self.latency_ms = None
+        self._sent = {}
+        self._last_update = time.monotonic()
+
+    @property
+    def in_flight(self):
+        return len(self._sent)
+
+    def frame_stored(self, frame_number, now=None):
+        self._sent[frame_number] = time.monotonic() if now is None else now
+        # Results that never arrive must not pin the backlog forever
+        while len(self._sent) > self.max_in_flight * 4:
+            self._sent.pop(next(iter(self._sent)))
+
+    def result_delivered(self, frame_number, now=None):
+        """Record the result of a frame; returns its latency in milliseconds, or None if unknown."""
+        sent = self._sent.pop(frame_number, None)
+        if sent is None:
+            return None
+        # Older frames still pending were overtaken and will not get a result
+        for stale in [number for number in self._sent if number < frame_number]:
+            del self._sent[stale]
+        latency = ((time.monotonic() if now is None else now) - sent) * 1000
+        if self.latency_ms is None:
+            self.latency_ms = latency
+        else:
+            self.latency_ms += self.smoothing * (latency - self.latency_ms)
+        return latency
+
+    def set_max_fps(self, fps):
+        self.max_fps = fps
+        self.fps = min(self.fps, float(fps))
+
+    def update(self, now=None):
+        """
+        Re-evaluate the admitted rate at most once per interval.
+
+        Returns:
+            True if the admitted rate changed
+        """
+        now = time.monotonic() if now is None else now
+        if self.latency_ms is None or now - self._last_update < self.interval:
+            return False
+        self._last_update = now
+
+        previous = self.fps
+        if self.in_flight > self.max_in_flight or self.latency_ms > self.target_ms:
+            self.fps = max(self.min_fps, self.fps * self.decrease)
+        elif self.latency_ms < self.target_ms * 0.8:
+            self.fps = min(self.max_fps, self.fps + 1)
+        return round(self.fps, 1) != round(previous, 1)
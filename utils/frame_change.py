@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+
+
+class FrameChangeDetector:
+    """
+    Per-stream detector for frames that barely differ from the last kept one.
+
+    Each frame is decoded at reduced resolution and shrunk to a small
+    grayscale signature; a frame is a duplicate when the mean absolute
+    difference between its signature and the last kept frame's is below
+    threshold (on the 0-255 pixel scale). Duplicates never replace the
+    reference, so a slow drift is still caught once it adds up.
+    """
+
+    def __init__(self, threshold=0.0, size=32):
+        self.threshold = float(threshold)
+        self.size = size
+        self.reference = None
+        self.reference_frame = None
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def signature(self, frame_bytes):
+        """Return the small float32 grayscale signature of an encoded frame, or None if it cannot be decoded."""
+        image = cv2.imdecode(np.frombuffer(frame_bytes, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if image is None:
+            return None
+        return cv2.resize(image, (self.size, self.size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def difference(self, signature):
+        """Mean absolute difference to the reference, or None if there is nothing to compare against."""
+        if signature is None or self.reference is None:
+            return None
+        return float(np.mean(np.abs(signature - self.reference)))
+
+    def is_duplicate(self, signature):
+        difference = self.difference(signature)
+        return difference is not None and difference < self.threshold
+
+    def keep(self, signature, frame_number):
+        """Make a stored frame the new reference."""
+        if signature is not None:
+            self.reference = signature
+            self.reference_frame = frame_number
+
+    def reset(self):
+        self.reference = None
+        self.reference_frame = None
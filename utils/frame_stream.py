@@ -0,0 +1,123 @@
+FRAME_STREAM_KEY = 'stream:frames:{}'
+RESULT_STREAM_KEY = 'stream:results:{}'
+
+
+def frame_stream_key(stream_id):
+    return FRAME_STREAM_KEY.format(stream_id)
+
+
+def result_stream_key(stream_id):
+    return RESULT_STREAM_KEY.format(stream_id)
+
+
+def append_frame(pipe, stream_id, frame, frame_number, timestamp, maxlen, ttl):
+    """
+    Queue an XADD of one frame onto the stream's capped ring buffer.
+
+    The stream is trimmed with MAXLEN ~maxlen on every append, so it never
+    holds much more than maxlen frames whatever the consumer does, and its
+    TTL is refreshed so an abandoned stream disappears on its own.
+
+    Args:
+        pipe: Redis pipeline the commands are added to
+        stream_id: Id of the video stream
+        frame: Raw frame bytes
+        frame_number: Sequence number of the frame within the stream
+        timestamp: Capture timestamp as a string
+        maxlen: Approximate number of frames kept per stream
+        ttl: Seconds the stream key lives after its last frame
+    """
+    key = frame_stream_key(stream_id)
+    pipe.xadd(
+        key,
+        {'frame': frame, 'frame_number': frame_number, 'timestamp': timestamp},
+        maxlen=maxlen,
+        approximate=True
+    )
+    pipe.expire(key, ttl)
+
+
+def _decode_entry(entry_id, fields):
+    fields = {k.decode() if isinstance(k, bytes) else k: v for k, v in fields.items()}
+    for name in ('frame_number', 'timestamp'):
+        if isinstance(fields.get(name), bytes):
+            fields[name] = fields[name].decode()
+    fields['frame_number'] = int(fields.get('frame_number', 0))
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    return entry_id, fields
+
+
+async def read_frames(redis_client, stream_id, last_id='$', count=1, block_ms=1000):
+    """
+    Block until frames newer than last_id are available.
+
+    A consumer that falls behind the ring buffer simply resumes at the
+    oldest frame still kept; it never sees frames that were trimmed.
+
+    Args:
+        redis_client: Redis client
+        stream_id: Id of the video stream
+        last_id: Entry id of the last frame already seen, '$' for only new frames
+        count: Maximum number of frames returned
+        block_ms: How long to wait for a frame, in milliseconds
+
+    Returns:
+        list of (entry_id, fields) pairs, empty if the wait timed out
+    """
+    response = await redis_client.xread({frame_stream_key(stream_id): last_id}, count=count, block=block_ms)
+    if not response:
+        return []
+    _, entries = response[0]
+    return [_decode_entry(entry_id, fields) for entry_id, fields in entries]
+
+
+async def read_latest_frame(redis_client, stream_id):
+    """Return the newest (entry_id, fields) pair of the stream, or None if it is empty."""
+    entries = await redis_client.xrevrange(frame_stream_key(stream_id), count=1)
+    if not entries:
+        return None
+    return _decode_entry(*entries[0])
+
+
+def append_result(pipe, stream_id, frame_number, result, maxlen, ttl):
+    """
+    Queue an XADD of a processed frame's result for the stream's front-end.
+
+    Args:
+        pipe: Redis pipeline the commands are added to
+        stream_id: Id of the video stream
+        frame_number: Sequence number of the frame the result belongs to
+        result: Encoded result (PNG bytes)
+        maxlen: Approximate number of results kept per stream
+        ttl: Seconds the result stream lives after its last entry
+    """
+    key = result_stream_key(stream_id)
+    pipe.xadd(key, {'frame_number': frame_number, 'result': result}, maxlen=maxlen, approximate=True)
+    pipe.expire(key, ttl)
+
+
+async def read_results(redis_client, streams, count=16, block_ms=1000):
+    """
+    Block until results newer than the given ids arrive on any of the streams.
+
+    The frame processor XADDs one entry with frame_number and result
+    fields to stream:results:{stream_id} per processed frame.
+
+    Args:
+        redis_client: Redis client
+        streams: Mapping of stream id to the entry id of the last result already seen
+        count: Maximum number of results returned per stream
+        block_ms: How long to wait for a result, in milliseconds
+
+    Returns:
+        dict of stream id to a list of (entry_id, fields) pairs, empty if the wait timed out
+    """
+    prefix = len(result_stream_key(''))
+    keys = {result_stream_key(stream_id): last_id for stream_id, last_id in streams.items()}
+    response = await redis_client.xread(keys, count=count, block=block_ms)
+    results = {}
+    for key, entries in response or ():
+        stream_id = (key.decode() if isinstance(key, bytes) else key)[prefix:]
+        results[stream_id] = [_decode_entry(entry_id, fields) for entry_id, fields in entries]
+    return results
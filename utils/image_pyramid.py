@@ -0,0 +1,31 @@
+import cv2
+
+# Gaussian image pyramid used for progressive results: level n is the input
+# downscaled by 2**n. A coarse level is solved first and sent as a preview
+# while the full resolution task is still queued.
+
+
+def build_pyramid(image, max_pixels):
+    """
+    Halve the image until a level has at most max_pixels pixels.
+
+    Returns:
+        list of levels, the full resolution image first
+    """
+    levels = [image]
+    while levels[-1].size > max_pixels and min(levels[-1].shape) >= 2:
+        levels.append(cv2.pyrDown(levels[-1]))
+    return levels
+
+
+def preview_level(image, max_pixels):
+    """
+    Pick the preview of a progressive task.
+
+    Returns:
+        (level, downscaled image), or None when the image is already small enough
+    """
+    levels = build_pyramid(image, max_pixels)
+    if len(levels) == 1:
+        return None
+    return len(levels) - 1, levels[-1]
@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class IngestPoolFull(Exception):
+    """Raised when the ingest pool already holds its maximum number of pending jobs."""
+
+
+class IngestPool:
+    """
+    Bounded worker pool for the CPU-heavy parts of ingest.
+
+    JSON parsing, base64 and PNG decoding, content hashing and task
+    encoding run here so the event loop only does I/O. The number of
+    threads and the number of jobs allowed to wait for them are limited
+    separately; once max_pending jobs are queued or running, new work is
+    rejected with IngestPoolFull instead of piling up in memory.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+
+    def _admit(self, count):
+        if self.pending + count > self.max_pending:
+            raise IngestPoolFull(f"{self.pending} ingest jobs pending (limit {self.max_pending})")
+        self.pending += count
+
+    async def run(self, func, *args):
+        """Run func(*args) on the pool and return its result."""
+        self._admit(1)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def map(self, func, iterable, chunk_size=None):
+        """
+        Run func over every item, admitting the whole group at once.
+
+        Args:
+            chunk_size: Admit and run at most this many items at a time instead, so a
+                group larger than what is free in the pool does not fail as a whole
+
+        Returns:
+            list of results in input order; failed items hold their exception
+        """
+        items = list(iterable)
+        if chunk_size is not None and len(items) > chunk_size:
+            results = []
+            for start in range(0, len(items), chunk_size):
+                results.extend(await self.map(func, items[start:start + chunk_size]))
+            return results
+        self._admit(len(items))
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.gather(
+                *(loop.run_in_executor(self.executor, func, item) for item in items),
+                return_exceptions=True
+            )
+        finally:
+            self.pending -= len(items)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
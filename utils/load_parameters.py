@@ -1,16 +1,97 @@
+import os
 import pickle
-import gc
+import threading
 import numpy as np
 
+SETTINGS_PATH = 'settings.pkl'
+TEMPLATE_FIELDS = ('A', 'B', 't', 'Ib', 'init')
+
+
+class TemplateRegistry:
+    """
+    Process-wide cache of the CNN templates stored in settings.pkl.
+
+    The pickle is read once and split into per-mode parameter sets whose
+    arrays are marked read-only, so every request can share them without
+    copying. The file is only reloaded when its mtime or size changes, or
+    when invalidate() is called after the file has been rewritten.
+    """
+
+    def __init__(self, path=SETTINGS_PATH):
+        self.path = path
+        self.version = 0
+        self._modes = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, stamp):
+        with open(self.path, 'rb') as f:
+            settings = pickle.load(f)
+
+        modes = {}
+        for mode in (key[:-1] for key in settings if key.endswith('_A')):
+            try:
+                raw = {field: settings[f'{mode}{field}'] for field in TEMPLATE_FIELDS}
+            except KeyError:
+                continue
+            modes[mode] = self._freeze(raw)
+
+        self._modes = modes
+
+        self._stamp = stamp
+        self.version += 1
+
+    @staticmethod
+    def _freeze(raw):
+        parameters = {}
+        for field, value in raw.items():
+            if field in ('A', 'B', 't'):
+                array = np.array(value, dtype=np.float64)
+                array.setflags(write=False)
+                parameters[field] = array
+            else:
+                parameters[field] = float(value)
+        return parameters
+
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._load(stamp)
+
+    def get(self, mode):
+        """
+        Return the parameters for a mode, or None if the mode is unknown.
+
+        Args:
+            mode: Mode prefix as used in settings.pkl (e.g. 'edge_detect_')
+
+        Returns:
+            dict with read-only 'A', 'B', 't' arrays and float 'Ib', 'init'
+        """
+        self._refresh()
+        parameters = self._modes.get(mode)
+        if parameters is None:
+            return None
+        return dict(parameters)
+
+    def modes(self):
+        self._refresh()
+        return list(self._modes)
+
+    def invalidate(self):
+        """Force a reload on the next lookup (e.g. after settings.pkl was rewritten)."""
+        with self._lock:
+            self._stamp = None
+
+
+registry = TemplateRegistry()
+
+
 def load_parameters_for_mode(mode):
-    with open('settings.pkl', 'rb') as f:
-        settings = pickle.load(f)
-    parameters = {
-        'A': settings[f'{mode}A'],
-        'B': settings[f'{mode}B'],
-        't': settings[f'{mode}t'],
-        'Ib': settings[f'{mode}Ib'],
-        'init': settings[f'{mode}init']
-    }
-    gc.collect()
-    return parameters
+    return registry.get(mode)
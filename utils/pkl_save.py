@@ -2,6 +2,7 @@ import numpy as np
 import gc
 import os 
 import pickle
+from utils.load_parameters import registry
 
 # Creating the basic cnn parameters
 # parameters source: https://github.com/ankitaggarwal011/PyCNN
@@ -455,6 +456,7 @@ def process_saving(radius, fdb, ctrl, bias, initial, tspan, stepsize):
         # Save the updated settings back to the pickle file
         with open(settings_path, "wb") as f:
             pickle.dump(saved, f)
+        registry.invalidate()
 
         return (
             200,
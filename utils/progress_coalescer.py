@@ -0,0 +1,76 @@
+import asyncio
+import time
+from contextlib import suppress
+
+PROGRESS_PREFIX = 'Solving at '  # Sent by the Julia right-hand side on every evaluation
+ERROR_PREFIX = 'Image processing error'  # Sent by the Julia worker instead of a result when a solve fails
+
+
+class ProgressCoalescer:
+    """
+    Rate limits a task's progress messages, keeping only the latest value.
+
+    The first message after a quiet period is sent at once; messages that
+    arrive within the interval overwrite each other and the newest one is
+    sent when the interval ends. A solve therefore produces at most one
+    progress message per interval no matter how often the solver reports.
+    """
+
+    def __init__(self, send, interval=0.25):
+        """
+        Args:
+            send: Coroutine function called with the message to deliver
+            interval: Minimum seconds between two delivered messages
+        """
+        self.send = send
+        self.interval = interval
+        self.sent = 0
+        self.coalesced = 0
+        self._pending = None
+        self._last_sent = 0.0
+        self._flush_task = None
+
+    @property
+    def idle(self):
+        return self._pending is None and self._flush_task is None
+
+    async def offer(self, message):
+        if self._pending is not None:
+            self.coalesced += 1
+        self._pending = message
+        if self._flush_task is not None:
+            return
+        wait = self._last_sent + self.interval - time.monotonic()
+        if wait <= 0:
+            await self._send_pending()
+        else:
+            self._flush_task = asyncio.create_task(self._flush_later(wait))
+
+    def discard(self):
+        """Drop any pending message, e.g. once the result made it obsolete."""
+        if self._pending is not None:
+            self.coalesced += 1
+            self._pending = None
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+    async def close(self):
+        task = self._flush_task
+        self.discard()
+        if task is not None:
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _flush_later(self, wait):
+        await asyncio.sleep(wait)
+        self._flush_task = None
+        await self._send_pending()
+
+    async def _send_pending(self):
+        message, self._pending = self._pending, None
+        if message is None:
+            return
+        self._last_sent = time.monotonic()
+        self.sent += 1
+        await self.send(message)
@@ -0,0 +1,173 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+
+class ResultCache:
+    """
+    Two-tier cache of solver results keyed by image content and template.
+
+    The first tier is a bounded in-process LRU, the second a Redis tier
+    shared by every front-end with a TTL on each entry. Results are the
+    encoded PNG bytes, stored and returned as they are. Redis is optional;
+    without it the cache degrades to the in-memory tier only.
+    """
+
+    RESULT_KEY = 'result:png:{}'
+    TASK_KEY = 'task:cachekey:{}'
+    INFLIGHT_KEY = 'task:inflight:{}'  # cache key -> id of the task currently computing it
+
+    def __init__(self, redis_client=None, max_entries=256, ttl=3600):
+        self.redis_client = redis_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def make_key(image, params):
+        """
+        Hash the decoded pixels together with the resolved template.
+
+        Args:
+            image: Decoded grayscale image as an ndarray
+            params: Template parameters as returned by load_parameters_for_mode
+
+        Returns:
+            Hex digest identifying the (image, template) pair
+        """
+        digest = hashlib.sha256()
+        digest.update(f'{image.dtype.str}{image.shape}'.encode())
+        digest.update(np.ascontiguousarray(image).data)
+        for field in ('A', 'B', 't'):
+            array = np.ascontiguousarray(params[field], dtype=np.float64)
+            digest.update(f'{field}{array.shape}'.encode())
+            digest.update(array.data)
+        digest.update(np.array([params['Ib'], params['init']], dtype=np.float64).data)
+        return digest.hexdigest()
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key):
+        """Return the cached result for key, or None on a miss in both tiers."""
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            return result
+
+        if self.redis_client is None:
+            return None
+        result = await self.redis_client.get(self.RESULT_KEY.format(key))
+        if result is None:
+            return None
+        self._remember(key, result)
+        return result
+
+    async def contains(self, key):
+        """Whether a result is cached for key, checked without fetching it from Redis."""
+        if key in self._entries:
+            return True
+        return self.redis_client is not None and bool(await self.redis_client.exists(self.RESULT_KEY.format(key)))
+
+    async def get_many(self, keys):
+        """
+        Look up several keys, fetching all memory misses with one MGET.
+
+        Returns:
+            dict mapping each key that hit in either tier to its result
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                found[key] = result
+            else:
+                missing.append(key)
+
+        if missing and self.redis_client is not None:
+            values = await self.redis_client.mget([self.RESULT_KEY.format(key) for key in missing])
+            for key, result in zip(missing, values):
+                if result is None:
+                    continue
+                self._remember(key, result)
+                found[key] = result
+        return found
+
+    async def put(self, key, result):
+        self._remember(key, result)
+        if self.redis_client is not None:
+            await self.redis_client.set(self.RESULT_KEY.format(key), result, ex=self.ttl)
+
+    async def bind_task(self, task_id, key):
+        """Remember which cache key a queued task will fill once its result arrives."""
+        if self.redis_client is not None:
+            await self.redis_client.set(self.TASK_KEY.format(task_id), key, ex=self.ttl)
+
+    def queue_bind_task(self, pipe, task_id, key):
+        """Pipeline variant of bind_task; the command runs when the pipeline executes."""
+        pipe.set(self.TASK_KEY.format(task_id), key, ex=self.ttl)
+
+    async def take_task_key(self, task_id):
+        """Return and forget the cache key bound to task_id, or None if none was bound."""
+        if self.redis_client is None:
+            return None
+        key = await self.redis_client.getdel(self.TASK_KEY.format(task_id))
+        if isinstance(key, bytes):
+            key = key.decode()
+        return key
+
+    async def task_keys(self, task_ids):
+        """Return the cache keys bound to task_ids (None where unbound) without forgetting them."""
+        if self.redis_client is None or not task_ids:
+            return [None] * len(task_ids)
+        keys = await self.redis_client.mget([self.TASK_KEY.format(task_id) for task_id in task_ids])
+        return [key.decode() if isinstance(key, bytes) else key for key in keys]
+
+    async def put_for_task(self, task_id, result):
+        """
+        Store the result of a queued task under the key bound by bind_task, if any.
+
+        Returns:
+            The cache key the result was stored under, or None
+        """
+        key = await self.take_task_key(task_id)
+        if key is not None:
+            await self.put(key, result)
+        return key
+
+    async def claim(self, claims, ttl):
+        """
+        Single-flight: claim cache keys for the tasks that are about to compute them.
+
+        Claims are SET NX in one transaction, so of several identical
+        submissions on any front-end exactly one wins; the others learn the
+        winner's task id and attach to it instead of queueing a duplicate.
+
+        Args:
+            claims: list of (cache_key, task_id)
+            ttl: Seconds after which an unreleased claim lapses, e.g. when its task was lost
+
+        Returns:
+            list with the owning task id per claim: the given task_id if the claim was won
+        """
+        if self.redis_client is None or not claims:
+            return [task_id for _, task_id in claims]
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            for key, task_id in claims:
+                pipe.set(self.INFLIGHT_KEY.format(key), task_id, nx=True, ex=ttl)
+                pipe.get(self.INFLIGHT_KEY.format(key))
+            replies = await pipe.execute()
+        return [owner.decode() if isinstance(owner, bytes) else owner for owner in replies[1::2]]
+
+    def queue_release(self, pipe, key):
+        """Pipeline command that drops the claim on key once its result is cached."""
+        pipe.delete(self.INFLIGHT_KEY.format(key))
+
+    async def release(self, key):
+        if self.redis_client is not None:
+            await self.redis_client.delete(self.INFLIGHT_KEY.format(key))
@@ -0,0 +1,85 @@
+import base64
+import struct
+
+# Binary WebSocket result frame:
+#   magic 'CNNR' | version u8 | frame type u8 | encoding u8 | level u8 | task_id length u16
+#   | task_id (utf-8) | encoded result bytes
+# All integers little endian. level is 0 for the full resolution result and
+# n for a progressive preview solved at 1/2**n of the input size; workers
+# always send 0. The relay only inspects the fixed header and forwards the
+# frame unchanged; status messages stay plain text.
+RESULT_HEADER = struct.Struct('<4sBBBBH')
+RESULT_MAGIC = b'CNNR'
+RESULT_VERSION = 1
+
+FRAME_TYPES = {'image': 1}
+ENCODINGS = {'png': 1}
+MIME_TYPES = {'png': 'image/png'}
+_FRAME_TYPE_NAMES = {code: name for name, code in FRAME_TYPES.items()}
+_ENCODING_NAMES = {code: name for name, code in ENCODINGS.items()}
+
+
+def encode_result_frame(task_id, payload, frame_type='image', encoding='png', level=0):
+    """
+    Build a binary result frame.
+
+    Args:
+        task_id: Id of the task the result belongs to
+        payload: Encoded result bytes (e.g. a PNG file)
+        frame_type: Kind of result, a key of FRAME_TYPES
+        encoding: Encoding of payload, a key of ENCODINGS
+        level: Pyramid level the result was solved at, 0 for full resolution
+
+    Returns:
+        bytes ready to send as one binary WebSocket message
+    """
+    task_bytes = (task_id or '').encode()
+    header = RESULT_HEADER.pack(
+        RESULT_MAGIC, RESULT_VERSION, FRAME_TYPES[frame_type], ENCODINGS[encoding], level, len(task_bytes)
+    )
+    return b''.join((header, task_bytes, payload))
+
+
+def read_result_header(frame):
+    """
+    Parse the header of a result frame without touching its payload.
+
+    Returns:
+        (task_id, frame_type, encoding, payload_offset)
+
+    Raises:
+        ValueError: If frame is not a result frame this version understands
+    """
+    if len(frame) < RESULT_HEADER.size:
+        raise ValueError("Result frame is shorter than its header")
+    magic, version, type_code, encoding_code, _, task_length = RESULT_HEADER.unpack_from(frame)
+    if magic != RESULT_MAGIC or version != RESULT_VERSION:
+        raise ValueError("Not a result frame")
+    offset = RESULT_HEADER.size + task_length
+    if len(frame) < offset:
+        raise ValueError("Result frame is truncated")
+    task_id = bytes(frame[RESULT_HEADER.size:offset]).decode()
+    return task_id, _FRAME_TYPE_NAMES.get(type_code), _ENCODING_NAMES.get(encoding_code), offset
+
+
+def result_frame_payload(frame):
+    """Return the encoded result bytes of a frame, the form kept in the result cache."""
+    return bytes(memoryview(frame)[read_result_header(frame)[3]:])
+
+
+def data_url_payload(data_url):
+    """
+    Split a 'data:image/png;base64,' result from a legacy worker.
+
+    Returns:
+        (encoding, payload bytes)
+    """
+    header, encoded = data_url.split(',', 1)
+    encoding = header[len('data:image/'):].split(';', 1)[0]
+    return encoding, base64.b64decode(encoded)
+
+
+def payload_to_data_url(payload, encoding='png'):
+    """Encode result bytes as a data URL for clients that only read JSON."""
+    mime_type = MIME_TYPES.get(encoding, 'application/octet-stream')
+    return f"data:{mime_type};base64,{base64.b64encode(payload).decode()}"
@@ -0,0 +1,95 @@
+import json
+import struct
+import numpy as np
+
+# Binary task layout (little endian):
+#   magic(4s) version(B) dtype(B) reserved(H) height(I) width(I) meta_len(I)
+#   meta: UTF-8 JSON with mode, templates, t_span, Ib, initialCondition, websocket
+#   pixels: height * width raw bytes, row-major
+TASK_MAGIC = b'CNNT'
+TASK_VERSION = 1
+TASK_HEADER = struct.Struct('<4sBBHIII')
+
+DTYPE_CODES = {np.dtype(np.uint8): 1}
+CODE_DTYPES = {code: dtype for dtype, code in DTYPE_CODES.items()}
+
+
+def build_task_meta(params, mode=None, websocket=None):
+    """
+    Collect the solver parameters the Julia worker needs next to the pixels.
+
+    Args:
+        params: Template parameters as returned by load_parameters_for_mode
+        mode: Mode name the parameters were resolved from
+        websocket: URL the worker should deliver the result to
+    """
+    return {
+        'mode': mode,
+        'feedbackA': params['A'].tolist(),
+        'controlB': params['B'].tolist(),
+        't_span': params['t'].tolist(),
+        'Ib': params['Ib'],
+        'initialCondition': params['init'],
+        'websocket': websocket,
+    }
+
+
+def encode_task(image, meta):
+    """
+    Encode a grayscale image and its task metadata into the binary task format.
+
+    Args:
+        image: 2D uint8 ndarray
+        meta: dict as produced by build_task_meta
+
+    Returns:
+        bytes ready to be stored under task:data:{id}
+    """
+    image = np.ascontiguousarray(image)
+    if image.ndim != 2:
+        raise ValueError("Only single channel images can be encoded")
+    if image.dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported image dtype: {image.dtype}")
+
+    meta_bytes = json.dumps(meta).encode()
+    height, width = image.shape
+    header = TASK_HEADER.pack(
+        TASK_MAGIC, TASK_VERSION, DTYPE_CODES[image.dtype], 0, height, width, len(meta_bytes)
+    )
+    return b''.join((header, meta_bytes, image.data))
+
+
+def encode_task_json(image, meta):
+    """Legacy nested-list JSON encoding, kept for workers that predate the binary format."""
+    data = dict(meta)
+    data['image'] = image.tolist()
+    data['mode'] = None
+    return json.dumps(data)
+
+
+def decode_task(blob):
+    """
+    Decode a stored task in either the binary or the legacy JSON format.
+
+    Returns:
+        (image, meta) where image is a 2D ndarray and meta a dict
+    """
+    if isinstance(blob, str):
+        blob = blob.encode()
+
+    if not blob.startswith(TASK_MAGIC):
+        data = json.loads(blob)
+        image = np.array(data.pop('image'), dtype=np.uint8)
+        return image, data
+
+    _, version, dtype_code, _, height, width, meta_len = TASK_HEADER.unpack_from(blob)
+    if version != TASK_VERSION:
+        raise ValueError(f"Unsupported task format version: {version}")
+    if dtype_code not in CODE_DTYPES:
+        raise ValueError(f"Unsupported task dtype code: {dtype_code}")
+
+    offset = TASK_HEADER.size
+    meta = json.loads(blob[offset:offset + meta_len])
+    offset += meta_len
+    image = np.frombuffer(blob, dtype=CODE_DTYPES[dtype_code], count=height * width, offset=offset)
+    return image.reshape(height, width), meta
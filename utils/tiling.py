@@ -0,0 +1,108 @@
+import io
+import math
+import struct
+import numpy as np
+from PIL import Image
+
+# Helpers for solving images too large to hold in memory. The image lives in
+# a memory-mapped .npy file and is cut into tiles; every tile is solved with
+# a halo of surrounding pixels so its core matches what the full-image solve
+# would produce, and only the core is written back into the memory-mapped
+# output.
+
+
+def halo_width(params, per_time=2.0):
+    """
+    Pixels of context a tile needs on each side.
+
+    The control template reaches rB pixels once; the feedback template
+    spreads information by rA pixels per interaction, and per_time such
+    interactions per unit of integration time are assumed to matter
+    before the -x decay term damps them.
+
+    Args:
+        params: Template parameters as returned by load_parameters_for_mode
+        per_time: Feedback interactions per unit time taken into account
+    """
+    radius_a = max(size // 2 for size in np.asarray(params['A']).shape)
+    radius_b = max(size // 2 for size in np.asarray(params['B']).shape)
+    t_span = np.asarray(params['t'], dtype=np.float64)
+    duration = float(np.ptp(t_span)) if t_span.size else 0.0
+    return radius_b + radius_a * math.ceil(per_time * duration)
+
+
+def image_shape(encoded):
+    """
+    Read (height, width) from an encoded image's header without decoding its pixels.
+
+    Works like Image.open minus its decompression bomb check, which would
+    reject large but permitted images; the caller checks the size against
+    its own limit instead. Pillow's global limit stays in place for every
+    other use.
+
+    Raises:
+        ValueError: If the format is not recognised
+    """
+    Image.init()
+    prefix = bytes(encoded[:16])
+    for format_id in Image.ID:
+        factory, accept = Image.OPEN[format_id]
+        # accept returns a warning string for formats it refuses to open
+        accepted = accept is None or accept(prefix)
+        if not accepted or isinstance(accepted, str):
+            continue
+        try:
+            image = factory(io.BytesIO(encoded), None)
+        except (OSError, SyntaxError, IndexError, TypeError, struct.error):
+            continue
+        width, height = image.size
+        image.close()
+        return height, width
+    raise ValueError("Image header could not be read: unsupported format")
+
+
+def plan_tiles(height, width, tile_size, halo):
+    """
+    Cut an image into tiles.
+
+    Returns:
+        list of dicts with 'index', 'core' and 'outer' as (y0, y1, x0, x1) bounds;
+        outer is core grown by halo and clipped to the image
+    """
+    tiles = []
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            y1, x1 = min(y0 + tile_size, height), min(x0 + tile_size, width)
+            tiles.append({
+                'index': len(tiles),
+                'core': (y0, y1, x0, x1),
+                'outer': (max(0, y0 - halo), min(height, y1 + halo), max(0, x0 - halo), min(width, x1 + halo)),
+            })
+    return tiles
+
+
+def create_memmap(path, shape, mode='w+'):
+    """Open (or create, with mode 'w+') a uint8 .npy file as a memory map."""
+    return np.lib.format.open_memmap(path, mode=mode, dtype=np.uint8, shape=shape if mode == 'w+' else None)
+
+
+def read_tile(source, tile):
+    """Copy a tile and its halo out of the source image."""
+    oy0, oy1, ox0, ox1 = tile['outer']
+    return np.ascontiguousarray(source[oy0:oy1, ox0:ox1])
+
+
+def write_tile(output, tile, result):
+    """
+    Write the core of a solved tile into the output image.
+
+    Args:
+        output: Output image (memory map) the size of the full image
+        tile: Tile as planned by plan_tiles
+        result: Solved tile, the shape of the tile's outer bounds
+    """
+    y0, y1, x0, x1 = tile['core']
+    oy0, oy1, ox0, ox1 = tile['outer']
+    if result.shape != (oy1 - oy0, ox1 - ox0):
+        raise ValueError(f"Tile {tile['index']} result has shape {result.shape}, expected {(oy1 - oy0, ox1 - ox0)}")
+    output[y0:y1, x0:x1] = result[y0 - oy0:y1 - oy0, x0 - ox0:x1 - ox0]